@@ -1,8 +1,14 @@
 import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
 
+
+@profiled
 def plot(json_stats_csv: str, result_dir: str):
     df = pd.read_csv(json_stats_csv)
 
@@ -33,7 +39,7 @@ def plot(json_stats_csv: str, result_dir: str):
 
     # Save plot
     plot_filename = os.path.join(result_dir, "json_curly_squary_percent.png")
-    plt.savefig(plot_filename)
+    save_figure(plot_filename)
     print(f"Generated: {plot_filename}")
     plt.close()
 
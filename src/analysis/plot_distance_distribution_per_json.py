@@ -1,9 +1,14 @@
 import os
+import sys
 
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
 
 def plot_binned_frequencies(df: pd.DataFrame, directory: str, file_base_name: str) -> None:
     # Build bins
@@ -47,7 +52,7 @@ def plot_binned_frequencies(df: pd.DataFrame, directory: str, file_base_name: st
     # Save plot
     plt.tight_layout()
     save_path = f"{directory}/{file_base_name}.png"
-    plt.savefig(save_path)
+    save_figure(save_path)
     print(f"Generated: {save_path}")
     plt.close()
 
@@ -87,7 +92,7 @@ def plot_binned_frequencies_short(df: pd.DataFrame, directory: str, file_base_na
 
     plt.tight_layout()
     save_path = f"{directory}/{file_base_name}.png"
-    plt.savefig(save_path)
+    save_figure(save_path)
     print(f"Generated: {save_path}")
     plt.close()
 
@@ -185,11 +190,12 @@ def plot_binned_frequencies_64(df: pd.DataFrame, directory: str, file_base_name:
 
     plt.tight_layout()
     save_path = os.path.join(directory, f"{file_base_name}_custom.png")
-    plt.savefig(save_path)
+    save_figure(save_path)
     print(f"Generated: {save_path}")
     plt.close()
 
 
+@profiled
 def plot_all(data_dir_path: str, result_dir_path: str):
     # Create output directories
     plots_dir_path = os.path.join(result_dir_path, "plots")
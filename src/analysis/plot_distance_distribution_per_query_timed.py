@@ -1,8 +1,13 @@
 import os
+import sys
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
 COLOR_1 = "#458AF5"
 COLOR_2 = "#F5BA45"
 
@@ -112,11 +117,12 @@ def plot_binned_frequencies_64(df: pd.DataFrame, result_dir_path: str, file_base
     # Save
     out_path = f"{result_dir_path}/{file_base_name}.png"
     plt.tight_layout()
-    plt.savefig(out_path)
+    save_figure(out_path)
     print(f"Generated: {out_path}")
     plt.close()
 
 
+@profiled
 def plot_all(data_dir_path: str, result_dir_path: str):
     plot_64_dir_path = os.path.join(result_dir_path, "plots_64")
     os.makedirs(plot_64_dir_path, exist_ok=True)
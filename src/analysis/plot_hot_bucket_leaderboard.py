@@ -0,0 +1,201 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_skip_type_cube import (COLOR_1, COLOR_2, NUM_BUCKETS, QUERY_FILE_PATTERN, SKIP_TYPES, bucket_labels,
+                                 list_cutoff_dirs)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+
+def reduce_file(file_path: str) -> np.ndarray:
+    """
+    Reduce one track_timed .csv to a (2, distance bucket, skip type) array holding the TIME_NANOS / REPETITIONS and the
+    number of jumps.
+    """
+    df = pd.read_csv(file_path)
+    totals = np.zeros((2, NUM_BUCKETS, len(SKIP_TYPES)))
+    if df.empty:
+        return totals
+    df.columns = df.columns.str.upper()
+
+    distance = np.maximum(df["DISTANCE"].to_numpy(dtype=float), 1)
+    bucket = np.minimum(np.floor(np.log2(distance)).astype(int), NUM_BUCKETS - 1)
+    skip_type = df["SKIP_TYPE"].astype(str).str.strip().str.lower().to_numpy()
+    known = np.isin(skip_type, SKIP_TYPES)
+    cell = bucket[known] * len(SKIP_TYPES) + np.searchsorted(SKIP_TYPES, skip_type[known])
+
+    repetitions = df["REPETITIONS"].to_numpy(dtype=float) if "REPETITIONS" in df.columns else 1.0
+    time_nanos = (df["TIME_NANOS"].to_numpy(dtype=float) / repetitions)[known]
+    frequency = df["FREQUENCY"].to_numpy(dtype=float)[known]
+
+    size = NUM_BUCKETS * len(SKIP_TYPES)
+    totals[0] = np.bincount(cell, weights=time_nanos, minlength=size).reshape(NUM_BUCKETS, len(SKIP_TYPES))
+    totals[1] = np.bincount(cell, weights=frequency, minlength=size).reshape(NUM_BUCKETS, len(SKIP_TYPES))
+    return totals
+
+
+def list_files(data_dir_path: str) -> pd.DataFrame:
+    """
+    All query .csv files of all cutoff folders with their CUTOFF and JSON.
+    """
+    rows = []
+    for cutoff, cutoff_dir in sorted(list_cutoff_dirs(data_dir_path).items()):
+        for filename in sorted(os.listdir(cutoff_dir)):
+            match = QUERY_FILE_PATTERN.match(filename)
+            if match:
+                rows.append({"CUTOFF": cutoff, "JSON": match.group("json"),
+                             "FILE_PATH": os.path.join(cutoff_dir, filename)})
+    return pd.DataFrame(rows, columns=["CUTOFF", "JSON", "FILE_PATH"])
+
+
+def reduce_all(files: pd.DataFrame, max_workers: int = None) -> pd.DataFrame:
+    """
+    Reduce every file in parallel and sum the results per (CUTOFF, JSON). One row per (CUTOFF, JSON, BUCKET) with the
+    time and jumps split by skip type.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        reduced = np.stack(list(executor.map(reduce_file, files["FILE_PATH"], chunksize=16)))
+
+    keys = files[["CUTOFF", "JSON"]].drop_duplicates().reset_index(drop=True)
+    group = files.merge(keys.reset_index(), on=["CUTOFF", "JSON"])["index"].to_numpy()
+    totals = np.zeros((len(keys),) + reduced.shape[1:])
+    np.add.at(totals, group, reduced)
+
+    ite, lut = SKIP_TYPES.index("ite"), SKIP_TYPES.index("lut")
+    num_keys = len(keys)
+    return pd.DataFrame({
+        "CUTOFF": np.repeat(keys["CUTOFF"].to_numpy(), NUM_BUCKETS),
+        "JSON": np.repeat(keys["JSON"].to_numpy(), NUM_BUCKETS),
+        "BUCKET": np.tile(np.arange(NUM_BUCKETS), num_keys),
+        "ITE_TIME_NANOS": totals[:, 0, :, ite].ravel(),
+        "LUT_TIME_NANOS": totals[:, 0, :, lut].ravel(),
+        "ITE_JUMPS": totals[:, 1, :, ite].ravel(),
+        "LUT_JUMPS": totals[:, 1, :, lut].ravel(),
+    })
+
+
+def rank_buckets(bucket_totals: pd.DataFrame, group_columns: list) -> pd.DataFrame:
+    """
+    Rank the distance buckets by their skip time within every group, with the share and cumulative share of the time.
+    """
+    table = bucket_totals.groupby(group_columns + ["BUCKET"], as_index=False)[[
+        "ITE_TIME_NANOS", "LUT_TIME_NANOS", "ITE_JUMPS", "LUT_JUMPS"
+    ]].sum()
+    table["TIME_NANOS"] = table["ITE_TIME_NANOS"] + table["LUT_TIME_NANOS"]
+    table["JUMPS"] = table["ITE_JUMPS"] + table["LUT_JUMPS"]
+    table = table[table["JUMPS"] > 0]
+
+    table["NANOS_PER_JUMP"] = table["TIME_NANOS"] / table["JUMPS"]
+    table["TIME_SHARE"] = table["TIME_NANOS"] / table.groupby(group_columns)["TIME_NANOS"].transform("sum")
+    table = table.sort_values(group_columns + ["TIME_NANOS"], ascending=[True] * len(group_columns) + [False])
+    table["CUMULATIVE_SHARE"] = table.groupby(group_columns)["TIME_SHARE"].cumsum()
+    table["RANK"] = table.groupby(group_columns).cumcount() + 1
+
+    table.insert(len(group_columns) + 1, "DISTANCE_FROM", 2 ** table["BUCKET"])
+    table.insert(len(group_columns) + 2, "DISTANCE_TO", 2 ** (table["BUCKET"] + 1) - 1)
+    return table.reset_index(drop=True)
+
+
+def plot_leaderboard(corpus_table: pd.DataFrame, cutoff: int, top: int, result_dir_path: str) -> None:
+    board = corpus_table[corpus_table["CUTOFF"] == cutoff].head(top).iloc[::-1]
+    labels = [f"#{rank} {bucket_labels()[bucket]}" for rank, bucket in zip(board["RANK"], board["BUCKET"])]
+    total = corpus_table.loc[corpus_table["CUTOFF"] == cutoff, "TIME_NANOS"].sum()
+
+    fig, ax = plt.subplots(figsize=(12, max(4, 0.5 * len(board) + 2)))
+    ax.barh(labels, board["LUT_TIME_NANOS"] / total * 100, color=COLOR_1, label="LUT")
+    ax.barh(labels, board["ITE_TIME_NANOS"] / total * 100, left=board["LUT_TIME_NANOS"] / total * 100,
+            color=COLOR_2, label="ITE")
+    for label, share, nanos_per_jump in zip(labels, board["TIME_SHARE"], board["NANOS_PER_JUMP"]):
+        ax.text(share * 100, label, f" {share * 100:.1f}% ({nanos_per_jump:.0f} ns/jump)", va="center", fontsize=9)
+
+    ax.set_xlim(0, board["TIME_SHARE"].max() * 100 * 1.3)
+    ax.set_xlabel("Share of the Total Skip Time (%)")
+    ax.set_ylabel("Distance Bucket")
+    ax.set_title(f"Hottest Distance Buckets over all JSONs and Queries (cutoff={cutoff})")
+    ax.grid(True, axis="x", alpha=0.5)
+    ax.legend(loc="lower right")
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, f"hot_buckets_cutoff={cutoff}.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+def plot_json_heatmap(json_table: pd.DataFrame, cutoff: int, result_dir_path: str) -> None:
+    shares = json_table[json_table["CUTOFF"] == cutoff].pivot_table(
+        index="JSON", columns="BUCKET", values="TIME_SHARE", fill_value=0)
+
+    fig, ax = plt.subplots(figsize=(14, max(4, 0.5 * len(shares) + 2)))
+    image = ax.imshow(shares.to_numpy() * 100, aspect="auto", cmap="magma_r")
+    fig.colorbar(image, ax=ax, label="Share of the Skip Time of the JSON (%)")
+    ax.set_xticks(range(len(shares.columns)), np.array(bucket_labels())[shares.columns], rotation=90)
+    ax.set_yticks(range(len(shares.index)), shares.index)
+    ax.set_xlabel("Distance Bucket")
+    ax.set_title(f"Skip Time per Distance Bucket and JSON (cutoff={cutoff})")
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, f"hot_buckets_per_json_cutoff={cutoff}.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot_all(data_dir_path: str, result_dir_path: str, top: int = 15, max_workers: int = None):
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    files = list_files(data_dir_path)
+    if files.empty:
+        print(f"No cutoff=<c> folders with query .csv files in {data_dir_path}")
+        return
+    print(f"Reducing {len(files)} files")
+    bucket_totals = reduce_all(files, max_workers)
+
+    json_table = rank_buckets(bucket_totals, ["CUTOFF", "JSON"])
+    json_csv_path = os.path.join(result_dir_path, "hot_buckets_per_json.csv")
+    json_table.to_csv(json_csv_path, index=False)
+    print(f"Saved per JSON leaderboard -> {json_csv_path}")
+
+    corpus_table = rank_buckets(bucket_totals, ["CUTOFF"])
+    corpus_csv_path = os.path.join(result_dir_path, "hot_buckets_corpus.csv")
+    corpus_table.to_csv(corpus_csv_path, index=False)
+    print(corpus_table.groupby("CUTOFF").head(5)[["CUTOFF", "RANK", "DISTANCE_FROM", "DISTANCE_TO", "TIME_SHARE",
+                                                  "NANOS_PER_JUMP"]].to_string(index=False))
+    print(f"Saved corpus leaderboard -> {corpus_csv_path}")
+
+    for cutoff in corpus_table["CUTOFF"].unique():
+        plot_leaderboard(corpus_table, cutoff, top, result_dir_path)
+        plot_json_heatmap(json_table, cutoff, result_dir_path)
+
+
+# Run with: python src/analysis/plot_hot_bucket_leaderboard.py
+#
+# Ranks the distance ranges by the skip time they consume, over all queries of a JSON and over the whole corpus, to see
+# where a faster skip primitive pays off most.
+#
+# "data_dir_path" is the track_timed folder with one subfolder per cutoff (see plot_skip_type_cube.py) holding one
+# .csv per query:
+#   DISTANCE,FREQUENCY,SKIP_TYPE,TIME_NANOS,REPETITIONS
+#   2165,75,ite,21678,1
+#   ...
+# The files are reduced in parallel on "max_workers" processes (default: one per CPU). Distances are grouped into
+# buckets [2^k, 2^(k+1)) and the time is TIME_NANOS / REPETITIONS.
+#
+# Output in "result_dir_path":
+#   hot_buckets_per_json.csv   ranked buckets per (CUTOFF, JSON) with time, jumps and ns per jump by skip type
+#   hot_buckets_corpus.csv     the same summed over all JSONs
+#   hot_buckets_cutoff=<c>.png, hot_buckets_per_json_cutoff=<c>.png
+if __name__ == "__main__":
+    # Input
+    data_dir_path = "res/data/analysis/distance_distribution_per_query/track_timed"
+    result_dir_path = "res/plots/analysis/distance_distribution_per_query/hot_buckets"
+
+    plot_all(data_dir_path, result_dir_path)
@@ -0,0 +1,266 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_hot_bucket_leaderboard import list_files
+from plot_skip_type_cube import COLOR_1, COLOR_2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# Cost model per skip type: nanos per jump = INTERCEPT + SLOPE * feature(DISTANCE)
+#   ite scans the bytes, so the cost grows linearly with the distance
+#   lut looks the closing bracket up, the distance only enters through the log term
+COST_FEATURES = {
+    "ite": lambda distance: distance,
+    "lut": lambda distance: np.log2(distance),
+}
+
+# Distances the crossover is searched on
+CROSSOVER_GRID = np.unique(np.round(np.geomspace(1, 2 ** 40, 20000)))
+
+
+def load_rows(data_dir_path: str) -> pd.DataFrame:
+    """
+    All rows of all track_timed .csv files of all cutoffs with TIME_NANOS scaled to one repetition.
+    """
+    all_data = []
+    for _, file in list_files(data_dir_path).iterrows():
+        df = pd.read_csv(file["FILE_PATH"])
+        if df.empty:
+            continue
+        df.columns = df.columns.str.upper()
+        repetitions = df["REPETITIONS"] if "REPETITIONS" in df.columns else 1
+        all_data.append(pd.DataFrame({
+            "JSON": file["JSON"],
+            "CUTOFF": file["CUTOFF"],
+            "DISTANCE": pd.to_numeric(df["DISTANCE"], errors="coerce"),
+            "SKIP_TYPE": df["SKIP_TYPE"].astype(str).str.strip().str.lower(),
+            "FREQUENCY": pd.to_numeric(df["FREQUENCY"], errors="coerce"),
+            "TIME_NANOS": pd.to_numeric(df["TIME_NANOS"], errors="coerce") / repetitions,
+        }))
+
+    if not all_data:
+        return pd.DataFrame(columns=["JSON", "CUTOFF", "DISTANCE", "SKIP_TYPE", "FREQUENCY", "TIME_NANOS"])
+    rows = pd.concat(all_data, ignore_index=True).dropna()
+    return rows[(rows["FREQUENCY"] > 0) & (rows["DISTANCE"] >= 1) & rows["SKIP_TYPE"].isin(list(COST_FEATURES))]
+
+
+def fit_cost_curves(rows: pd.DataFrame, group_columns: list) -> pd.DataFrame:
+    """
+    Weighted least squares of the nanos per jump (TIME_NANOS / FREQUENCY) on the feature of the skip type, weighted by
+    FREQUENCY, for every group and skip type at once: the normal equations of the two parameter model only need five
+    weighted sums per group.
+    """
+    rows = rows.copy()
+    rows["X"] = 0.0
+    for skip_type, feature in COST_FEATURES.items():
+        is_type = rows["SKIP_TYPE"] == skip_type
+        rows.loc[is_type, "X"] = feature(rows.loc[is_type, "DISTANCE"].to_numpy(dtype=float))
+
+    rows["Y"] = rows["TIME_NANOS"] / rows["FREQUENCY"]
+    weight = rows["FREQUENCY"]
+    rows["W"] = weight
+    rows["WX"] = weight * rows["X"]
+    rows["WXX"] = weight * rows["X"] ** 2
+    rows["WY"] = weight * rows["Y"]
+    rows["WXY"] = weight * rows["X"] * rows["Y"]
+    rows["WYY"] = weight * rows["Y"] ** 2
+
+    keys = group_columns + ["SKIP_TYPE"]
+    sums = rows.groupby(keys).agg(
+        W=("W", "sum"), WX=("WX", "sum"), WXX=("WXX", "sum"), WY=("WY", "sum"), WXY=("WXY", "sum"),
+        WYY=("WYY", "sum"), NUM_ROWS=("Y", "size"), MIN_DISTANCE=("DISTANCE", "min"),
+        MAX_DISTANCE=("DISTANCE", "max"),
+    ).reset_index()
+
+    determinant = sums["W"] * sums["WXX"] - sums["WX"] ** 2
+    # Only one distinct feature value: fall back to a constant cost
+    single = determinant.abs() <= 1e-12 * (sums["W"] * sums["WXX"]).abs().clip(lower=1e-300)
+    slope = (sums["W"] * sums["WXY"] - sums["WX"] * sums["WY"]) / determinant.where(~single)
+    sums["SLOPE"] = slope.fillna(0.0)
+    sums["INTERCEPT"] = (sums["WY"] - sums["SLOPE"] * sums["WX"]) / sums["W"]
+
+    # Weighted R^2 from the same sums
+    mean_y = sums["WY"] / sums["W"]
+    total = sums["WYY"] - sums["W"] * mean_y ** 2
+    residual = (sums["WYY"] - 2 * sums["INTERCEPT"] * sums["WY"] - 2 * sums["SLOPE"] * sums["WXY"]
+                + sums["INTERCEPT"] ** 2 * sums["W"] + 2 * sums["INTERCEPT"] * sums["SLOPE"] * sums["WX"]
+                + sums["SLOPE"] ** 2 * sums["WXX"])
+    sums["R2"] = 1 - residual / total.where(total > 0)
+    sums = sums.rename(columns={"W": "JUMPS"})
+
+    return sums[keys + ["INTERCEPT", "SLOPE", "R2", "JUMPS", "NUM_ROWS", "MIN_DISTANCE", "MAX_DISTANCE"]]
+
+
+def predict(fit, skip_type: str, distance: np.ndarray) -> np.ndarray:
+    return fit["INTERCEPT"] + fit["SLOPE"] * COST_FEATURES[skip_type](np.asarray(distance, dtype=float))
+
+
+def nearest_cutoff(distances: np.ndarray, cutoffs) -> np.ndarray:
+    """
+    The measured cutoff closest to every distance on the log2 scale, infinite distances stay infinite.
+    """
+    distances = np.asarray(distances, dtype=float)
+    cutoffs = np.unique(np.asarray(cutoffs, dtype=float))
+    if len(cutoffs) == 0:
+        return np.full(distances.shape, np.nan)
+    finite = np.isfinite(distances)
+    gaps = np.abs(np.log2(distances[finite, np.newaxis] + 1) - np.log2(cutoffs[np.newaxis, :] + 1))
+    nearest = np.full(distances.shape, np.inf)
+    nearest[finite] = cutoffs[np.argmin(gaps, axis=1)]
+    return nearest
+
+
+def find_crossovers(fits: pd.DataFrame, group_columns: list, measured_cutoffs) -> pd.DataFrame:
+    """
+    Smallest distance from which on a LUT lookup is predicted to be cheaper than scanning, for every group with both
+    fits. Infinite if scanning stays cheaper, 1 if the LUT is always cheaper. SUGGESTED_CUTOFF is the nearest of the
+    "measured_cutoffs".
+    """
+    wide = fits.pivot_table(index=group_columns, columns="SKIP_TYPE", values=["INTERCEPT", "SLOPE"])
+    wide = wide.dropna()
+    if wide.empty:
+        return pd.DataFrame(columns=group_columns + ["CROSSOVER_DISTANCE", "SUGGESTED_CUTOFF"])
+
+    grid = CROSSOVER_GRID[np.newaxis, :]
+    ite_cost = wide[("INTERCEPT", "ite")].to_numpy()[:, np.newaxis] + \
+        wide[("SLOPE", "ite")].to_numpy()[:, np.newaxis] * COST_FEATURES["ite"](grid)
+    lut_cost = wide[("INTERCEPT", "lut")].to_numpy()[:, np.newaxis] + \
+        wide[("SLOPE", "lut")].to_numpy()[:, np.newaxis] * COST_FEATURES["lut"](grid)
+
+    # First grid point after which the LUT stays cheaper
+    ite_cheaper = ite_cost <= lut_cost
+    last_ite_cheaper = np.where(ite_cheaper.any(axis=1),
+                                ite_cheaper.shape[1] - 1 - np.argmax(ite_cheaper[:, ::-1], axis=1), -1)
+    crossover = np.full(len(wide), np.inf)
+    found = last_ite_cheaper < ite_cheaper.shape[1] - 1
+    crossover[found] = CROSSOVER_GRID[last_ite_cheaper[found] + 1]
+
+    result = wide.index.to_frame(index=False)
+    result["CROSSOVER_DISTANCE"] = crossover
+    # Cutoffs are not restricted to powers of two (192, 320, 384, 448 are measured too), suggest one that was measured
+    result["SUGGESTED_CUTOFF"] = nearest_cutoff(crossover, measured_cutoffs)
+    return result
+
+
+def plot_curves(rows: pd.DataFrame, fits: pd.DataFrame, crossover: float, title: str, save_path: str) -> None:
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    for skip_type, color in [("ite", COLOR_2), ("lut", COLOR_1)]:
+        type_rows = rows[rows["SKIP_TYPE"] == skip_type]
+        fit = fits[fits["SKIP_TYPE"] == skip_type]
+        if type_rows.empty or fit.empty:
+            continue
+        fit = fit.iloc[0]
+
+        # Observed cost per jump averaged over log2 buckets
+        bucket = np.floor(np.log2(type_rows["DISTANCE"])).astype(int)
+        observed = type_rows.groupby(bucket).agg(TIME_NANOS=("TIME_NANOS", "sum"), FREQUENCY=("FREQUENCY", "sum"),
+                                                 DISTANCE=("DISTANCE", "median"))
+        ax.scatter(observed["DISTANCE"], observed["TIME_NANOS"] / observed["FREQUENCY"], color=color,
+                   s=20 + 80 * observed["FREQUENCY"] / observed["FREQUENCY"].max(), alpha=0.7,
+                   label=f"{skip_type.upper()} measured")
+
+        distance = np.geomspace(1, max(fit["MAX_DISTANCE"], crossover if np.isfinite(crossover) else 1) * 2, 300)
+        ax.plot(distance, predict(fit, skip_type, distance), color=color, linewidth=2,
+                label=f"{skip_type.upper()} fit (R²={fit['R2']:.2f})")
+
+    if np.isfinite(crossover):
+        ax.axvline(x=crossover, color="red", linestyle="--", label=f"Crossover at {crossover:.0f}")
+
+    ax.set_xscale("log", base=2)
+    ax.set_xlabel("Distance")
+    ax.set_ylabel("Nanoseconds per Jump")
+    ax.set_title(title)
+    ax.grid(True, which="both", alpha=0.4)
+    ax.legend()
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+def list_measured_cutoffs(cutoff_dir_path: str) -> list:
+    """
+    The cutoffs with a timing run, one subfolder per cutoff (e.g. res/data/speed/server/distance_cutoff/<cutoff>).
+    """
+    return sorted(int(name) for name in os.listdir(cutoff_dir_path)
+                  if name.isdigit() and os.path.isdir(os.path.join(cutoff_dir_path, name)))
+
+
+@profiled
+def plot_all(machine_dirs: dict, measured_cutoffs: dict, result_dir_path: str):
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    all_rows = []
+    for machine, data_dir_path in machine_dirs.items():
+        rows = load_rows(data_dir_path)
+        rows.insert(0, "MACHINE", machine)
+        all_rows.append(rows)
+    rows = pd.concat(all_rows, ignore_index=True)
+    if rows.empty:
+        print("No timed jumps found.")
+        return
+
+    # Per JSON and pooled over all JSONs of a machine
+    pooled = rows.assign(JSON="all")
+    fits = pd.concat([fit_cost_curves(rows, ["MACHINE", "JSON"]), fit_cost_curves(pooled, ["MACHINE", "JSON"])],
+                     ignore_index=True)
+    crossovers = pd.concat([
+        find_crossovers(machine_fits, ["MACHINE", "JSON"], measured_cutoffs.get(machine, []))
+        for machine, machine_fits in fits.groupby("MACHINE")
+    ], ignore_index=True)
+
+    fits_csv_path = os.path.join(result_dir_path, "jump_cost_fits.csv")
+    fits.to_csv(fits_csv_path, index=False)
+    print(f"Saved fits -> {fits_csv_path}")
+
+    crossover_csv_path = os.path.join(result_dir_path, "jump_cost_crossover.csv")
+    crossovers.to_csv(crossover_csv_path, index=False)
+    print(crossovers)
+    print(f"Saved crossovers -> {crossover_csv_path}")
+
+    crossover_by_key = crossovers.set_index(["MACHINE", "JSON"])["CROSSOVER_DISTANCE"]
+    for (machine, json_name), group_fits in fits.groupby(["MACHINE", "JSON"]):
+        group_rows = pooled if json_name == "all" else rows
+        group_rows = group_rows[(group_rows["MACHINE"] == machine) & (group_rows["JSON"] == json_name)]
+        plot_curves(group_rows, group_fits, crossover_by_key.get((machine, json_name), np.inf),
+                    f"Cost per Jump: {json_name} on {machine}",
+                    os.path.join(result_dir_path, f"{machine}_{json_name}_jump_cost.png"))
+
+
+# Run with: python src/analysis/plot_jump_cost_curves.py
+#
+# Derives the cost of a single jump from the timed tracks and computes the distance from which on a LUT lookup is
+# cheaper than scanning with ite, which is the cutoff the data suggests.
+#
+# "machine_dirs" maps a machine name to its track_timed folder with one subfolder per cutoff (see
+# plot_skip_type_cube.py) holding one .csv per query:
+#   DISTANCE,FREQUENCY,SKIP_TYPE,TIME_NANOS,REPETITIONS
+#   2165,75,ite,21678,1
+#   ...
+# "measured_cutoffs" maps a machine name to the cutoffs with a timing run, the track_timed folders usually hold fewer.
+# Rows of all cutoffs and queries are pooled. The nanos per jump (TIME_NANOS / REPETITIONS / FREQUENCY) are fitted
+# weighted by FREQUENCY with INTERCEPT + SLOPE * DISTANCE for ite and INTERCEPT + SLOPE * log2(DISTANCE) for lut.
+#
+# Output in "result_dir_path":
+#   jump_cost_fits.csv          fit per (MACHINE, JSON, SKIP_TYPE), JSON "all" pools every JSON of the machine
+#   jump_cost_crossover.csv     CROSSOVER_DISTANCE and the nearest measured cutoff of the machine SUGGESTED_CUTOFF
+#   <MACHINE>_<JSON>_jump_cost.png
+if __name__ == "__main__":
+    # Input
+    machine_dirs = {
+        "server": "res/data/analysis/distance_distribution_per_query/track_timed",
+    }
+    measured_cutoffs = {
+        "server": list_measured_cutoffs("res/data/speed/server/distance_cutoff"),
+    }
+    result_dir_path = "res/plots/analysis/distance_distribution_per_query/jump_cost"
+
+    plot_all(machine_dirs, measured_cutoffs, result_dir_path)
@@ -1,8 +1,13 @@
 import os
+import sys
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
 
 def plot(df: pd.DataFrame, directory: str, file_base_name: str) -> None:
     # Sort by ascending SKIP_PERCENTAGE
@@ -21,11 +26,12 @@ def plot(df: pd.DataFrame, directory: str, file_base_name: str) -> None:
     # Save plot
     output_path = os.path.join(directory, f"{file_base_name}_skip_percentage.png")
     plt.tight_layout()
-    plt.savefig(output_path)
+    save_figure(output_path)
     plt.close()
     print(f"Generated: {output_path}")
 
 
+@profiled
 def plot_all(data_dir_path: str, result_dir_path: str):
     os.makedirs(result_dir_path, exist_ok=True)
 
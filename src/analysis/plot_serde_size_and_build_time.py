@@ -1,9 +1,14 @@
 import os
+import sys
 import re
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
 
 def increment_filename(path: str) -> str:
     """If the file exists, add (1), (2), etc. before the extension."""
@@ -16,6 +21,7 @@ def increment_filename(path: str) -> str:
     return new_path
 
 
+@profiled
 def plot(
         csv_btree: str,
         csv_indexmap: str,
@@ -90,7 +96,7 @@ def plot(
     plt.tight_layout()
     result_png_path = f"{result_dir_path}/serde_size_and_build_time.png"
     result_png_path = increment_filename(result_png_path)
-    plt.savefig(result_png_path)
+    save_figure(result_png_path)
     print(f"Plot saved to: {result_png_path}")
 
 
@@ -0,0 +1,294 @@
+import os
+import re
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+COLOR_1 = "#458AF5"
+COLOR_2 = "#F5BA45"
+
+SKIP_TYPES = ["ite", "lut"]
+
+# Bucket k holds the distances in [2^k, 2^(k+1)). Cutoffs that are no power of two (192, 320, 384, 448, ...) split a
+# bucket; every jump keeps the SKIP_TYPE it was recorded with, so such a bucket holds both types and shows a LUT share
+# between 0 and 100 % instead of being attributed to one side
+NUM_BUCKETS = 41
+
+CUTOFF_DIR_PATTERN = re.compile(r"^cutoff=(\d+)")
+QUERY_FILE_PATTERN = re.compile(r"^(?P<json>.+)_query=(?P<query_id>[^_]+)\.csv$")
+
+
+def bucket_labels() -> list:
+    return ["1"] + [f"2^{k}" for k in range(1, NUM_BUCKETS)]
+
+
+def list_cutoff_dirs(data_dir_path: str) -> dict:
+    """
+    Map every "cutoff=<c>" (or "cutoff=<c>_repetitions=<r>") subfolder to its cutoff.
+    """
+    cutoff_dirs = {}
+    for entry in os.listdir(data_dir_path):
+        match = CUTOFF_DIR_PATTERN.match(entry)
+        if match and os.path.isdir(os.path.join(data_dir_path, entry)):
+            cutoff_dirs[int(match.group(1))] = os.path.join(data_dir_path, entry)
+    return cutoff_dirs
+
+
+def query_sort_key(query: tuple):
+    json_name, query_id = query
+    return json_name, (0, int(query_id), "") if query_id.isdigit() else (1, 0, query_id)
+
+
+def load_cube(data_dir_path: str) -> dict:
+    """
+    Read the per query .csv files of all cutoff subfolders into dense arrays of shape
+    (query, cutoff, distance bucket, skip type):
+      "frequency"   number of jumps
+      "time_nanos"  TIME_NANOS / REPETITIONS (all zero for untimed tracks)
+      "measured"    (query, cutoff) mask of the files that exist
+    """
+    cutoff_dirs = list_cutoff_dirs(data_dir_path)
+    cutoffs = sorted(cutoff_dirs)
+
+    query_indices = {}
+    columns = {"QUERY": [], "CUTOFF": [], "DISTANCE": [], "FREQUENCY": [], "SKIP_TYPE": [], "TIME_NANOS": []}
+    measured = []
+    timed = False
+
+    for cutoff_index, cutoff in enumerate(cutoffs):
+        for filename in os.listdir(cutoff_dirs[cutoff]):
+            match = QUERY_FILE_PATTERN.match(filename)
+            if not match:
+                continue
+
+            query_index = query_indices.setdefault((match.group("json"), match.group("query_id")), len(query_indices))
+            measured.append((query_index, cutoff_index))
+
+            df = pd.read_csv(os.path.join(cutoff_dirs[cutoff], filename))
+            if df.empty:
+                continue
+            # The older tracks use lower case headers
+            df.columns = df.columns.str.upper()
+
+            columns["QUERY"].append(np.full(len(df), query_index))
+            columns["CUTOFF"].append(np.full(len(df), cutoff_index))
+            columns["DISTANCE"].append(df["DISTANCE"].to_numpy(dtype=float))
+            columns["FREQUENCY"].append(df["FREQUENCY"].to_numpy(dtype=float))
+            columns["SKIP_TYPE"].append(df["SKIP_TYPE"].astype(str).str.strip().str.lower().to_numpy())
+            if "TIME_NANOS" in df.columns:
+                timed = True
+                repetitions = df["REPETITIONS"].to_numpy(dtype=float) if "REPETITIONS" in df.columns else 1.0
+                columns["TIME_NANOS"].append(df["TIME_NANOS"].to_numpy(dtype=float) / repetitions)
+            else:
+                columns["TIME_NANOS"].append(np.zeros(len(df)))
+
+    # Reorder the queries by JSON and numeric query id
+    queries = sorted(query_indices, key=query_sort_key)
+    new_index = np.empty(len(queries), dtype=int)
+    for position, query in enumerate(queries):
+        new_index[query_indices[query]] = position
+
+    shape = (len(queries), len(cutoffs), NUM_BUCKETS, len(SKIP_TYPES))
+    frequency = np.zeros(shape)
+    time_nanos = np.zeros(shape)
+    measured_mask = np.zeros(shape[:2], dtype=bool)
+    for query_index, cutoff_index in measured:
+        measured_mask[new_index[query_index], cutoff_index] = True
+
+    if columns["QUERY"]:
+        query = new_index[np.concatenate(columns["QUERY"])]
+        cutoff = np.concatenate(columns["CUTOFF"])
+        distance = np.maximum(np.concatenate(columns["DISTANCE"]), 1)
+        bucket = np.minimum(np.floor(np.log2(distance)).astype(int), NUM_BUCKETS - 1)
+        skip_type = np.concatenate(columns["SKIP_TYPE"])
+
+        known = np.isin(skip_type, SKIP_TYPES)
+        if not known.all():
+            print(f"Warning: ignoring {(~known).sum()} rows with unknown SKIP_TYPE {set(skip_type[~known])}")
+        skip_index = np.searchsorted(SKIP_TYPES, skip_type[known])
+        index = (query[known], cutoff[known], bucket[known], skip_index)
+
+        np.add.at(frequency, index, np.concatenate(columns["FREQUENCY"])[known])
+        np.add.at(time_nanos, index, np.concatenate(columns["TIME_NANOS"])[known])
+
+    return {
+        "json": np.array([json_name for json_name, _ in queries], dtype=str),
+        "query_id": np.array([query_id for _, query_id in queries], dtype=str),
+        "cutoffs": np.array(cutoffs, dtype=int),
+        "skip_types": np.array(SKIP_TYPES),
+        "frequency": frequency,
+        "time_nanos": time_nanos,
+        "measured": measured_mask,
+        "timed": np.array(timed),
+    }
+
+
+def save_cube(cube: dict, npz_path: str) -> None:
+    np.savez_compressed(npz_path, **cube)
+    print(f"Saved cube -> {npz_path}")
+
+
+def read_cube(npz_path: str) -> dict:
+    with np.load(npz_path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def summarize_cube(cube: dict) -> pd.DataFrame:
+    """
+    One row per (JSON, QUERY_ID, CUTOFF) with the jumps and time per skip type and the LUT share of both.
+    """
+    jumps = cube["frequency"].sum(axis=2)
+    time_nanos = cube["time_nanos"].sum(axis=2)
+    num_queries, num_cutoffs = jumps.shape[:2]
+    ite, lut = SKIP_TYPES.index("ite"), SKIP_TYPES.index("lut")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary = pd.DataFrame({
+            "JSON": np.repeat(cube["json"], num_cutoffs),
+            "QUERY_ID": np.repeat(cube["query_id"], num_cutoffs),
+            "CUTOFF": np.tile(cube["cutoffs"], num_queries),
+            "ITE_JUMPS": jumps[:, :, ite].ravel(),
+            "LUT_JUMPS": jumps[:, :, lut].ravel(),
+            "ITE_TIME_NANOS": time_nanos[:, :, ite].ravel(),
+            "LUT_TIME_NANOS": time_nanos[:, :, lut].ravel(),
+            "LUT_JUMP_SHARE": (jumps[:, :, lut] / jumps.sum(axis=2)).ravel(),
+            "LUT_TIME_SHARE": (time_nanos[:, :, lut] / time_nanos.sum(axis=2)).ravel(),
+        })
+
+    if not cube["timed"]:
+        summary = summary.drop(columns=["ITE_TIME_NANOS", "LUT_TIME_NANOS", "LUT_TIME_SHARE"])
+    return summary[cube["measured"].ravel()].reset_index(drop=True)
+
+
+def plot_query_shift(cube: dict, query_index: int, result_dir_path: str) -> None:
+    """
+    Heatmap of the LUT share of the jumps per distance bucket and cutoff, and the ITE / LUT split of all jumps (and of
+    the time for timed tracks) per cutoff.
+    """
+    json_name, query_id = cube["json"][query_index], cube["query_id"][query_index]
+    measured = cube["measured"][query_index]
+    cutoffs = cube["cutoffs"][measured]
+    frequency = cube["frequency"][query_index][measured]
+    time_nanos = cube["time_nanos"][query_index][measured]
+    if len(cutoffs) == 0 or frequency.sum() == 0:
+        print(f" - NO PLOT: {json_name} query {query_id} has no jumps")
+        return
+
+    lut = SKIP_TYPES.index("lut")
+    used_buckets = np.flatnonzero(frequency.sum(axis=(0, 2)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bucket_lut_share = frequency[:, used_buckets, lut] / frequency[:, used_buckets, :].sum(axis=2)
+        lut_jump_share = frequency[:, :, lut].sum(axis=1) / frequency.sum(axis=(1, 2))
+        lut_time_share = time_nanos[:, :, lut].sum(axis=1) / time_nanos.sum(axis=(1, 2))
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 12), gridspec_kw={"height_ratios": [3, 2]})
+    x = np.arange(len(cutoffs))
+
+    # --- Plot 1: LUT share per distance bucket ---
+    image = ax1.imshow(bucket_lut_share.T * 100, aspect="auto", origin="lower", cmap="coolwarm_r", vmin=0, vmax=100)
+    fig.colorbar(image, ax=ax1, label="LUT Share of Jumps (%)")
+    ax1.set_xticks(x, cutoffs.astype(str))
+    ax1.set_yticks(np.arange(len(used_buckets)), np.array(bucket_labels())[used_buckets])
+    ax1.set_xlabel("Cutoff")
+    ax1.set_ylabel("Distance Bucket")
+    ax1.set_title(f"LUT Share of the Jumps per Distance Bucket: {json_name} query {query_id}")
+
+    # --- Plot 2: ITE / LUT split of all jumps and of the time ---
+    ax2.bar(x, (1 - lut_jump_share) * 100, color=COLOR_2, label="ITE (Jumps %)")
+    ax2.bar(x, lut_jump_share * 100, bottom=(1 - lut_jump_share) * 100, color=COLOR_1, label="LUT (Jumps %)")
+    if cube["timed"]:
+        ax2.plot(x, lut_time_share * 100, marker="o", color="black", linewidth=2, label="LUT (Time %)")
+    ax2.set_xticks(x, cutoffs.astype(str))
+    ax2.set_xlabel("Cutoff")
+    ax2.set_ylabel("Percentage")
+    ax2.set_ylim(0, 105)
+    ax2.grid(True, axis="y", alpha=0.5)
+    ax2.legend(loc="upper right")
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, f"{json_name}_query={query_id}.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+def plot_json_shift(summary: pd.DataFrame, json_name: str, result_dir_path: str) -> None:
+    """
+    LUT share of the time (or of the jumps for untimed tracks) over the cutoff, one line per query of the JSON.
+    """
+    share_column = "LUT_TIME_SHARE" if "LUT_TIME_SHARE" in summary.columns else "LUT_JUMP_SHARE"
+    group = summary[summary["JSON"] == json_name]
+    cutoffs = np.sort(group["CUTOFF"].unique())
+    position = {cutoff: i for i, cutoff in enumerate(cutoffs)}
+
+    fig, ax = plt.subplots(figsize=(14, 8))
+    for query_id, query_df in group.groupby("QUERY_ID", sort=False):
+        ax.plot(query_df["CUTOFF"].map(position), query_df[share_column] * 100, marker="o", label=f"Q{query_id}")
+
+    ax.set_xticks(range(len(cutoffs)), cutoffs.astype(str))
+    ax.set_xlabel("Cutoff")
+    ax.set_ylabel(f"LUT Share of the {'Time' if share_column == 'LUT_TIME_SHARE' else 'Jumps'} (%)")
+    ax.set_title(f"Shift from ITE to LUT over the Cutoff: {json_name}")
+    ax.set_ylim(0, 105)
+    ax.grid(True, alpha=0.5)
+    ax.legend(fontsize=8, ncol=2, bbox_to_anchor=(1.02, 1), loc="upper left")
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, f"{json_name}_lut_share.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot_all(data_dir_path: str, result_dir_path: str):
+    queries_dir_path = os.path.join(result_dir_path, "queries")
+    os.makedirs(queries_dir_path, exist_ok=True)
+
+    cube = load_cube(data_dir_path)
+    if len(cube["json"]) == 0:
+        print(f"No cutoff=<c> folders with query .csv files in {data_dir_path}")
+        return
+    save_cube(cube, os.path.join(result_dir_path, "skip_type_cube.npz"))
+
+    summary = summarize_cube(cube)
+    summary_csv_path = os.path.join(result_dir_path, "skip_type_shift.csv")
+    summary.to_csv(summary_csv_path, index=False)
+    print(f"Saved summary -> {summary_csv_path}")
+
+    for json_name in summary["JSON"].unique():
+        plot_json_shift(summary, json_name, result_dir_path)
+
+    for query_index in range(len(cube["json"])):
+        plot_query_shift(cube, query_index, queries_dir_path)
+
+
+# Run with: python src/analysis/plot_skip_type_cube.py
+#
+# Compares the jumps of every query over all cutoffs at once, to see how the jumps and their time move from ITE to LUT
+# as the cutoff grows.
+#
+# "data_dir_path" is the track or track_timed folder that holds one subfolder per cutoff ("cutoff=0",
+# "cutoff=256_repetitions=20", ...) with the .csv files of plot_distance_distribution_per_query(_timed).py:
+#   DISTANCE,FREQUENCY,SKIP_TYPE,TIME_NANOS,REPETITIONS
+#   2165,75,ite,21678,1
+#   ...
+# named <JSON>_query=<QUERY_ID>.csv. TIME_NANOS and REPETITIONS are optional.
+#
+# Output in "result_dir_path":
+#   skip_type_cube.npz          the query x cutoff x distance bucket x skip type cube (read it with read_cube)
+#   skip_type_shift.csv         jumps, time and LUT share per (JSON, QUERY_ID, CUTOFF)
+#   <JSON>_lut_share.png        LUT share over the cutoff, one line per query
+#   queries/<JSON>_query=<QUERY_ID>.png   LUT share per distance bucket and cutoff
+if __name__ == "__main__":
+    # Input
+    data_dir_path = "res/data/analysis/distance_distribution_per_query/track_timed"
+    result_dir_path = "res/plots/analysis/distance_distribution_per_query/skip_type_cube"
+
+    plot_all(data_dir_path, result_dir_path)
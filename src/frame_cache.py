@@ -0,0 +1,165 @@
+import functools
+import os
+import sys
+from collections import OrderedDict
+
+import pandas as pd
+
+_config = {
+    "enabled": os.environ.get("PLOT_FRAME_CACHE", "1") != "0",
+    # Upper bound of the summed memory of all cached frames, least recently used ones are evicted first
+    "max_bytes": int(float(os.environ.get("PLOT_FRAME_CACHE_MB", "1024")) * 1024 * 1024),
+}
+
+# key -> (value, bytes), in order of use
+_entries = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+# With copy-on-write (default from pandas 3) a shallow copy is enough to keep callers from changing a cached frame
+_SHALLOW_COPY = int(pd.__version__.split(".")[0]) >= 3
+
+
+def configure(enabled: bool = None, max_bytes: int = None) -> None:
+    if enabled is not None:
+        _config["enabled"] = enabled
+    if max_bytes is not None:
+        _config["max_bytes"] = max_bytes
+    _evict()
+
+
+def clear() -> None:
+    _entries.clear()
+    _stats["bytes"] = 0
+
+
+def info() -> dict:
+    return {**_stats, "entries": len(_entries), "max_bytes": _config["max_bytes"]}
+
+
+def _file_key(path) -> tuple:
+    """
+    A file is identified by its path and stat, so a rewritten file is read again.
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _key_part(value):
+    if isinstance(value, (str, os.PathLike)) and os.path.isfile(value):
+        return ("file",) + _file_key(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_key_part(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _key_part(item)) for key, item in value.items()))
+    return value
+
+
+def _size(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, tuple):
+        return sum(_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not _SHALLOW_COPY)
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    return value
+
+
+def _evict() -> None:
+    while _entries and _stats["bytes"] > _config["max_bytes"]:
+        _, (_, size) = _entries.popitem(last=False)
+        _stats["bytes"] -= size
+        _stats["evictions"] += 1
+
+
+def cached(func):
+    """
+    Memoize a function returning frames (or tuples of them). The key is the function and its arguments, arguments that
+    are paths of existing files are replaced by their stat. Every call returns a copy, so callers can change it freely.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _config["enabled"]:
+            return func(*args, **kwargs)
+
+        key = (func.__module__, func.__qualname__, _key_part(args), _key_part(kwargs))
+        if key in _entries:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return _copy(_entries[key][0])
+
+        _stats["misses"] += 1
+        value = func(*args, **kwargs)
+        size = _size(value)
+        # Frames larger than the whole cache are not kept
+        if size <= _config["max_bytes"]:
+            _entries[key] = (value, size)
+            _stats["bytes"] += size
+            _evict()
+        return _copy(value)
+
+    return wrapper
+
+
+@cached
+def read_csv(path: str, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv that reads every file only once per process (as long as it is not changed or evicted).
+    """
+    return pd.read_csv(path, **kwargs)
+
+
+# Frames shared by the speed plots
+
+@cached
+def load_query_times(query_time_csv: str) -> pd.DataFrame:
+    """
+    Query time .csv with QUERY_ID as string, as all speed plots use it.
+    """
+    df = read_csv(query_time_csv)
+    df["QUERY_ID"] = df["QUERY_ID"].astype(str)
+    return df
+
+
+@cached
+def load_optimal_times(rq_legacy_time_csv: str, rq_legacy_skip_time: str) -> pd.DataFrame:
+    """
+    rq-legacy query times merged with the time spent skipping, OPTIMAL_TIME is the query time without the skipping.
+    """
+    legacy_df = load_query_times(rq_legacy_time_csv)
+    legacy_skip_df = load_query_times(rq_legacy_skip_time)
+
+    merged_data = pd.merge(
+        legacy_df,
+        legacy_skip_df[["JSON", "QUERY_ID", "SKIP_TIME_NANO_SECONDS"]],
+        on=["JSON", "QUERY_ID"],
+        how="left"
+    )
+    merged_data["OPTIMAL_TIME"] = merged_data["QUERY_TIME_SECONDS"] - (merged_data["SKIP_TIME_NANO_SECONDS"] / 1e9)
+    return merged_data
+
+
+@cached
+def load_counter(counter_file: str) -> pd.DataFrame:
+    """
+    Skip-counter .csv of one JSON sorted by SKIP_PERCENTAGE, the query order of the per-JSON speed plots.
+    """
+    counter_data = read_csv(counter_file)
+    counter_data["QUERY_ID"] = counter_data["QUERY_ID"].astype(str)
+    return counter_data.sort_values(by="SKIP_PERCENTAGE", ascending=True)
+
+
+# Switch the cache off or change its size from the environment:
+#   PLOT_FRAME_CACHE=0           read every file on every call again
+#   PLOT_FRAME_CACHE_MB=<MB>     memory cap of the cached frames (default 1024)
+#
+# The cache lives in the process, so it pays off when several plot functions run in one process, e.g. a report job
+# that imports plot_optimal, plot_optimal_node, plot_empty_list_opt and find_best_cutoff and calls them one after the
+# other. frame_cache.info() tells the hits, misses and evictions.
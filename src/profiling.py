@@ -0,0 +1,272 @@
+import atexit
+import functools
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+# Stages a profiled plot function is split into. Everything that is not spent in one of the hooked library calls is
+# accounted to "figure", which in the plot functions is mostly building the figure.
+STAGES = ["read_csv", "normalize", "merge", "figure", "tight_layout", "savefig"]
+
+LOG_COLUMNS = [
+    "TIMESTAMP", "SCRIPT", "FUNCTION", "STAGE", "CALLS", "WALL_SECONDS", "CPU_SECONDS", "PEAK_BYTES",
+]
+
+_config = {
+    "enabled": False,
+    "trace_memory": True,
+    "csv_path": None,
+    "summary": False,
+}
+
+_records = []
+_hooks_installed = False
+
+# State of the profiled function call that is currently running (None if there is none)
+_run = None
+
+
+class _Run:
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.stages = {}
+        self.in_stage = False
+        self.outside_peak = 0
+
+    def add(self, stage_name: str, wall: float, cpu: float, peak: int) -> None:
+        entry = self.stages.setdefault(stage_name, {"CALLS": 0, "WALL_SECONDS": 0.0, "CPU_SECONDS": 0.0,
+                                                    "PEAK_BYTES": 0})
+        entry["CALLS"] += 1
+        entry["WALL_SECONDS"] += wall
+        entry["CPU_SECONDS"] += cpu
+        entry["PEAK_BYTES"] = max(entry["PEAK_BYTES"], peak)
+
+
+def _traced_peak() -> int:
+    return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+
+def _reset_peak() -> None:
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+@contextmanager
+def stage(stage_name: str):
+    """
+    Account the enclosed block to "stage_name" of the running profiled function. Does nothing if profiling is off, no
+    profiled function is running, or the block is already inside another stage (the outermost stage wins, so library
+    calls made by pandas itself are not counted twice).
+    """
+    run = _run
+    if run is None or run.in_stage:
+        yield
+        return
+
+    run.outside_peak = max(run.outside_peak, _traced_peak())
+    _reset_peak()
+    run.in_stage = True
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        run.in_stage = False
+        run.add(stage_name, wall, cpu, _traced_peak())
+        _reset_peak()
+
+
+def _hook(owner, attribute_name: str, stage_name: str) -> None:
+    original = getattr(owner, attribute_name)
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        if _run is None or _run.in_stage:
+            return original(*args, **kwargs)
+        with stage(stage_name):
+            return original(*args, **kwargs)
+
+    setattr(owner, attribute_name, wrapper)
+
+
+def _install_hooks() -> None:
+    global _hooks_installed
+    if _hooks_installed:
+        return
+
+    _hook(pd, "read_csv", "read_csv")
+    _hook(pd, "to_numeric", "normalize")
+    _hook(pd, "cut", "normalize")
+    _hook(pd.Series, "astype", "normalize")
+    _hook(pd.DataFrame, "astype", "normalize")
+    _hook(pd, "merge", "merge")
+    _hook(pd, "concat", "merge")
+    _hook(pd.DataFrame, "merge", "merge")
+    _hook(pd.DataFrame, "join", "merge")
+    for groupby_class in [pd.api.typing.DataFrameGroupBy, pd.api.typing.SeriesGroupBy]:
+        for method in ["agg", "aggregate", "sum", "mean", "apply", "transform"]:
+            _hook(groupby_class, method, "merge")
+    _hook(plt, "tight_layout", "tight_layout")
+    _hook(plt, "savefig", "savefig")
+
+    _hooks_installed = True
+
+
+def enable(csv_path: str = None, summary: bool = True, trace_memory: bool = True) -> None:
+    """
+    Switch profiling on for this process. Records are appended to "csv_path" at exit (if given) and a hot-spot summary
+    is printed with "summary".
+    """
+    _config.update(enabled=True, csv_path=csv_path, summary=summary, trace_memory=trace_memory)
+    _install_hooks()
+
+
+def profiled(func):
+    """
+    Decorator for the plot functions: records wall time, CPU time and tracemalloc peak per stage of every call.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _run
+        if not _config["enabled"]:
+            return func(*args, **kwargs)
+        # A profiled function called by another one is accounted to the caller's stages
+        if _run is not None:
+            return func(*args, **kwargs)
+
+        started_tracing = False
+        if _config["trace_memory"] and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        _reset_peak()
+
+        run = _Run(func.__qualname__)
+        _run = run
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            run.outside_peak = max(run.outside_peak, _traced_peak())
+            _run = None
+            if started_tracing:
+                tracemalloc.stop()
+            _finish_run(run, func, wall, cpu)
+
+    return wrapper
+
+
+def _finish_run(run: _Run, func, wall: float, cpu: float) -> None:
+    staged_wall = sum(entry["WALL_SECONDS"] for entry in run.stages.values())
+    staged_cpu = sum(entry["CPU_SECONDS"] for entry in run.stages.values())
+    run.add("figure", max(wall - staged_wall, 0.0), max(cpu - staged_cpu, 0.0), run.outside_peak)
+
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    module_file = getattr(sys.modules.get(func.__module__), "__file__", None)
+    script = os.path.basename(module_file) if module_file else func.__module__
+    total_peak = max(entry["PEAK_BYTES"] for entry in run.stages.values())
+
+    for stage_name in STAGES + sorted(set(run.stages) - set(STAGES)):
+        if stage_name not in run.stages:
+            continue
+        _records.append({"TIMESTAMP": timestamp, "SCRIPT": script, "FUNCTION": run.function_name,
+                         "STAGE": stage_name, **run.stages[stage_name]})
+    _records.append({"TIMESTAMP": timestamp, "SCRIPT": script, "FUNCTION": run.function_name, "STAGE": "total",
+                     "CALLS": 1, "WALL_SECONDS": wall, "CPU_SECONDS": cpu, "PEAK_BYTES": total_peak})
+
+
+def records() -> pd.DataFrame:
+    return pd.DataFrame(_records, columns=LOG_COLUMNS)
+
+
+def write_log(csv_path: str) -> None:
+    """
+    Append the collected records to "csv_path", so the runs of several scripts end up in one log.
+    """
+    log_df = records()
+    if log_df.empty:
+        return
+
+    directory = os.path.dirname(csv_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    log_df.to_csv(csv_path, mode="a", header=not os.path.exists(csv_path), index=False)
+    print(f"Saved profiling log -> {csv_path}")
+
+
+def summarize(log_df: pd.DataFrame, top: int = 15) -> pd.DataFrame:
+    """
+    Hot spots over all recorded calls: time per (SCRIPT, FUNCTION, STAGE), sorted by wall time, with the share of the
+    total wall time of all profiled functions.
+    """
+    stages_df = log_df[log_df["STAGE"] != "total"]
+    summary = stages_df.groupby(["SCRIPT", "FUNCTION", "STAGE"]).agg(
+        CALLS=("CALLS", "sum"),
+        WALL_SECONDS=("WALL_SECONDS", "sum"),
+        CPU_SECONDS=("CPU_SECONDS", "sum"),
+        PEAK_BYTES=("PEAK_BYTES", "max"),
+    ).reset_index()
+    summary["WALL_SHARE"] = summary["WALL_SECONDS"] / summary["WALL_SECONDS"].sum()
+    return summary.sort_values("WALL_SECONDS", ascending=False).head(top).reset_index(drop=True)
+
+
+def print_summary(log_df: pd.DataFrame = None, top: int = 15) -> None:
+    log_df = records() if log_df is None else log_df
+    if log_df.empty:
+        return
+
+    summary = summarize(log_df, top)
+    summary["PEAK_MB"] = summary.pop("PEAK_BYTES") / (1024 * 1024)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(f"--- Profiling hot spots (top {top}) ---")
+        print(summary.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+
+
+def _at_exit() -> None:
+    if not _config["enabled"]:
+        return
+    if _config["csv_path"]:
+        write_log(_config["csv_path"])
+    if _config["summary"]:
+        print_summary()
+
+
+atexit.register(_at_exit)
+
+# Switch profiling on from the environment so the existing scripts do not need any change to be profiled:
+#   PLOT_PROFILE=1               print a hot-spot summary at exit
+#   PLOT_PROFILE_CSV=<path>      append the records to <path>
+#   PLOT_PROFILE_MEMORY=0        skip tracemalloc (it slows the plot functions down noticeably)
+if os.environ.get("PLOT_PROFILE") or os.environ.get("PLOT_PROFILE_CSV"):
+    enable(
+        csv_path=os.environ.get("PLOT_PROFILE_CSV"),
+        summary=os.environ.get("PLOT_PROFILE", "0") not in ("", "0"),
+        trace_memory=os.environ.get("PLOT_PROFILE_MEMORY", "1") != "0",
+    )
+
+
+# Run with: python src/profiling.py <profile.csv> [top]
+#
+# Prints the hot spots of a profiling log written by the plot scripts, e.g. after a nightly run of all of them with
+#   PLOT_PROFILE_CSV=res/profiling/profile.csv python src/speed/plot_optimal.py
+#
+# The log has this structure (one row per profiled call and stage, plus a "total" row per call):
+#   TIMESTAMP,SCRIPT,FUNCTION,STAGE,CALLS,WALL_SECONDS,CPU_SECONDS,PEAK_BYTES
+#   2025-10-19T02:00:01,plot_optimal.py,plot,read_csv,13,0.412,0.398,18874368
+#   ...
+if __name__ == "__main__":
+    # Input
+    profile_csv = sys.argv[1] if len(sys.argv) > 1 else "res/profiling/profile.csv"
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    print_summary(pd.read_csv(profile_csv), top)
@@ -0,0 +1,130 @@
+import atexit
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from profiling import stage
+
+# Defaults for every output, each call of save_figure can override them
+_config = {
+    # Threads encoding and writing the PNGs, 0 saves synchronously with plt.savefig
+    "workers": min(4, os.cpu_count() or 1),
+    # Figures rendered but not yet written before save_figure blocks (backpressure, every pending figure holds its
+    # whole RGBA buffer, e.g. 40 MB for a 14x8 figure at dpi=300)
+    "max_pending": 8,
+    # zlib level of the PNG, 6 is what plt.savefig uses
+    "compress_level": 6,
+    # None uses the rcParams["savefig.dpi"] like plt.savefig
+    "dpi": None,
+}
+
+_executor = None
+_slots = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def configure(workers: int = None, max_pending: int = None, compress_level: int = None, dpi: float = None) -> None:
+    """
+    Change the defaults. Waits for all pending figures first, so a new pool size takes effect immediately.
+    """
+    global _executor, _slots
+    flush()
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        _slots = None
+
+    for key, value in [("workers", workers), ("max_pending", max_pending), ("compress_level", compress_level),
+                       ("dpi", dpi)]:
+        if value is not None:
+            _config[key] = value
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _slots
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_config["workers"], thread_name_prefix="save_figure")
+        _slots = threading.BoundedSemaphore(max(_config["max_pending"], 1))
+    return _executor
+
+
+def _render(fig, dpi: float, savefig_kwargs: dict):
+    """
+    Draw the figure with Agg and return its RGBA pixels, the width and the height. Going through savefig with the raw
+    format keeps bbox_inches, facecolor, ... behaving exactly like plt.savefig.
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="raw", dpi=dpi, **savefig_kwargs)
+    # The renderer of the last draw has the size of the saved image (which differs from the figure with bbox_inches)
+    height, width = fig.canvas.renderer.buffer_rgba().shape[:2]
+    return buffer.getvalue(), width, height
+
+
+def _encode(path: str, rgba: bytes, width: int, height: int, dpi: float, compress_level: int) -> None:
+    metadata = PngInfo()
+    metadata.add_text("Software", f"Matplotlib version{matplotlib.__version__}, https://matplotlib.org/")
+    image = Image.frombuffer("RGBA", (width, height), rgba, "raw", "RGBA", 0, 1)
+    image.save(path, format="PNG", compress_level=compress_level, dpi=(dpi, dpi), pnginfo=metadata)
+
+
+def _done(future) -> None:
+    _slots.release()
+    # Failed saves stay in _pending so flush can raise their exception
+    if future.exception() is None:
+        with _pending_lock:
+            _pending.discard(future)
+
+
+def save_figure(path: str, fig=None, dpi: float = None, compress_level: int = None, **savefig_kwargs) -> None:
+    """
+    Drop-in replacement for plt.savefig(path, ...) for PNG outputs: the figure is rendered on the calling thread and
+    the PNG encoding and writing run on the pool, overlapping with building the next figure. The figure may be closed
+    right after the call. Blocks if "max_pending" figures are still waiting to be written.
+    """
+    fig = plt.gcf() if fig is None else fig
+    dpi = dpi if dpi is not None else _config["dpi"]
+    dpi = dpi if dpi is not None else matplotlib.rcParams["savefig.dpi"]
+    dpi = fig.dpi if dpi == "figure" else dpi
+    compress_level = compress_level if compress_level is not None else _config["compress_level"]
+
+    is_png = os.path.splitext(path)[1].lower() == ".png"
+    if _config["workers"] <= 0 or not is_png or not isinstance(fig.canvas, FigureCanvasAgg):
+        if is_png:
+            savefig_kwargs.setdefault("pil_kwargs", {"compress_level": compress_level})
+        with stage("savefig"):
+            fig.savefig(path, dpi=dpi, **savefig_kwargs)
+        return
+
+    executor = _get_executor()
+    with stage("savefig"):
+        rgba, width, height = _render(fig, dpi, savefig_kwargs)
+        _slots.acquire()
+
+    future = executor.submit(_encode, path, rgba, width, height, dpi, compress_level)
+    with _pending_lock:
+        _pending.add(future)
+    future.add_done_callback(_done)
+
+
+def flush() -> None:
+    """
+    Wait until every pending figure is written. Raises the first error of a failed save.
+    """
+    with _pending_lock:
+        pending = list(_pending)
+        _pending.clear()
+
+    with stage("savefig"):
+        for future in pending:
+            future.result()
+
+
+atexit.register(flush)
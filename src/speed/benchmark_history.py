@@ -0,0 +1,275 @@
+import os
+import sys
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from rank_speedups import config_label
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    RUN_ID INTEGER PRIMARY KEY,
+    KIND TEXT NOT NULL,
+    ENGINE TEXT NOT NULL,
+    ENGINE_VERSION TEXT NOT NULL,
+    MACHINE TEXT NOT NULL,
+    DATE TEXT NOT NULL,
+    SOURCE_PATH TEXT NOT NULL,
+    IMPORTED_AT TEXT NOT NULL,
+    UNIQUE (KIND, ENGINE, ENGINE_VERSION, MACHINE, DATE, SOURCE_PATH)
+);
+CREATE TABLE IF NOT EXISTS query_times (
+    RUN_ID INTEGER NOT NULL REFERENCES runs (RUN_ID),
+    JSON TEXT NOT NULL,
+    CUTOFF INTEGER NOT NULL,
+    QUERY_ID TEXT NOT NULL,
+    QUERY_TEXT TEXT,
+    MODE TEXT NOT NULL,
+    QUERY_TIME_SECONDS REAL,
+    REPETITIONS INTEGER
+);
+CREATE INDEX IF NOT EXISTS query_times_series ON query_times (JSON, QUERY_ID, CUTOFF, MODE);
+CREATE INDEX IF NOT EXISTS query_times_run ON query_times (RUN_ID);
+CREATE TABLE IF NOT EXISTS lut_builds (
+    RUN_ID INTEGER NOT NULL REFERENCES runs (RUN_ID),
+    JSON TEXT NOT NULL,
+    CUTOFF INTEGER NOT NULL,
+    BUILD_TIME_SECONDS REAL,
+    COLLECTION_TIME_SECONDS REAL,
+    SIZE_IN_BYTES INTEGER,
+    REPETITIONS INTEGER
+);
+CREATE INDEX IF NOT EXISTS lut_builds_series ON lut_builds (JSON, CUTOFF);
+CREATE TABLE IF NOT EXISTS serde_builds (
+    RUN_ID INTEGER NOT NULL REFERENCES runs (RUN_ID),
+    JSON TEXT NOT NULL,
+    BUILD_TIME_SECONDS REAL,
+    REPETITIONS INTEGER
+);
+CREATE INDEX IF NOT EXISTS serde_builds_series ON serde_builds (JSON);
+"""
+
+# Columns of the .csv schemas per table, missing optional ones are stored as NULL
+TABLE_COLUMNS = {
+    "query_times": ["JSON", "CUTOFF", "QUERY_ID", "QUERY_TEXT", "MODE", "QUERY_TIME_SECONDS", "REPETITIONS"],
+    "lut_builds": ["JSON", "CUTOFF", "BUILD_TIME_SECONDS", "COLLECTION_TIME_SECONDS", "SIZE_IN_BYTES", "REPETITIONS"],
+    "serde_builds": ["JSON", "BUILD_TIME_SECONDS", "REPETITIONS"],
+}
+
+PLOT_COLORS = ["red", "royalblue", "darkorange", "seagreen", "purple", "saddlebrown", "teal", "olive"]
+
+
+@contextmanager
+def connect(db_path: str):
+    """
+    Connection to the history (created with its tables if missing), committed and closed at the end of the block.
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.executescript(SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def normalize(df: pd.DataFrame, kind: str, mode: str) -> pd.DataFrame:
+    """
+    Bring a .csv of one of the known schemas into the columns of its table: CUTOFF=-1 for engines without a cutoff,
+    QUERY_ID as text, MODE "count" or "node".
+    """
+    df = df.copy()
+    df["JSON"] = df["JSON"].astype(str).str.strip()
+    if "CUTOFF" in TABLE_COLUMNS[kind]:
+        df["CUTOFF"] = pd.to_numeric(df["CUTOFF"], errors="coerce").fillna(-1) if "CUTOFF" in df.columns else -1
+        df["CUTOFF"] = df["CUTOFF"].astype(int)
+    if kind == "query_times":
+        df["QUERY_ID"] = df["QUERY_ID"].astype(str)
+        df["MODE"] = mode
+    for column in TABLE_COLUMNS[kind]:
+        if column not in df.columns:
+            df[column] = None
+    return df[TABLE_COLUMNS[kind]]
+
+
+def import_csv(db_path: str, kind: str, csv_path: str, engine: str, engine_version: str, machine: str,
+               date: str = None, mode: str = "count") -> int:
+    """
+    Bulk import one .csv ("query_times", "lut_builds" or "serde_builds") as a run tagged with engine, version,
+    machine and date (default: modification date of the file). Importing the same file with the same tags again is a
+    no-op. Returns the RUN_ID.
+    """
+    date = date or datetime.fromtimestamp(os.path.getmtime(csv_path)).date().isoformat()
+    source_path = os.path.normpath(csv_path)
+
+    with connect(db_path) as connection:
+        existing = connection.execute(
+            "SELECT RUN_ID FROM runs WHERE KIND = ? AND ENGINE = ? AND ENGINE_VERSION = ? AND MACHINE = ? AND DATE = ? "
+            "AND SOURCE_PATH = ?", (kind, engine, engine_version, machine, date, source_path)).fetchone()
+        if existing is not None:
+            print(f"Already imported: {csv_path} ({engine} {engine_version}, {machine}, {date})")
+            return existing[0]
+
+        cursor = connection.execute(
+            "INSERT INTO runs (KIND, ENGINE, ENGINE_VERSION, MACHINE, DATE, SOURCE_PATH, IMPORTED_AT) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, engine, engine_version, machine, date, source_path, datetime.now().isoformat(timespec="seconds")))
+        run_id = cursor.lastrowid
+
+        df = normalize(pd.read_csv(csv_path), kind, mode)
+        df.insert(0, "RUN_ID", run_id)
+        df.to_sql(kind, connection, if_exists="append", index=False)
+
+    print(f"Imported {len(df)} rows of {csv_path} as run {run_id} ({engine} {engine_version}, {machine}, {date})")
+    return run_id
+
+
+def time_series(db_path: str, json_name: str, query_id, cutoff: int = -1, engine: str = None,
+                mode: str = "count") -> pd.DataFrame:
+    """
+    Query time of query "query_id" on "json_name" at "cutoff" (-1 for engines without one) over all imported runs,
+    oldest first.
+    """
+    sql = ("SELECT r.RUN_ID, r.ENGINE, r.ENGINE_VERSION, r.MACHINE, r.DATE, q.QUERY_TIME_SECONDS, q.REPETITIONS "
+           "FROM query_times q JOIN runs r ON r.RUN_ID = q.RUN_ID "
+           "WHERE q.JSON = ? AND q.QUERY_ID = ? AND q.CUTOFF = ? AND q.MODE = ?")
+    parameters = [json_name, str(query_id), int(cutoff), mode]
+    if engine is not None:
+        sql += " AND r.ENGINE = ?"
+        parameters.append(engine)
+    sql += " ORDER BY r.DATE, r.RUN_ID"
+    with connect(db_path) as connection:
+        return pd.read_sql_query(sql, connection, params=parameters)
+
+
+def query_history(db_path: str, engine: str, cutoff: int = -1, mode: str = "count",
+                  machine: str = None) -> pd.DataFrame:
+    """
+    All query times of one engine and cutoff over all runs, with the version label "<ENGINE_VERSION> (<DATE>)". Runs
+    of the same date are ordered by import, so import older generations first.
+    """
+    sql = ("SELECT r.RUN_ID, r.ENGINE_VERSION, r.MACHINE, r.DATE, q.JSON, q.QUERY_ID, q.QUERY_TIME_SECONDS "
+           "FROM query_times q JOIN runs r ON r.RUN_ID = q.RUN_ID "
+           "WHERE r.ENGINE = ? AND q.CUTOFF = ? AND q.MODE = ?")
+    parameters = [engine, int(cutoff), mode]
+    if machine is not None:
+        sql += " AND r.MACHINE = ?"
+        parameters.append(machine)
+    with connect(db_path) as connection:
+        df = pd.read_sql_query(sql, connection, params=parameters)
+    df["VERSION"] = df["ENGINE_VERSION"] + " (" + df["DATE"] + ")"
+    return df
+
+
+@profiled
+def plot_versions(db_path: str, series: list, result_dir_path: str, mode: str = "count", machine: str = None) -> None:
+    """
+    Per JSON: query time per query across the versions of every (engine, cutoff) in "series", and the total query
+    time over the queries measured in every version.
+    """
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    history = pd.concat([query_history(db_path, engine, cutoff, mode, machine).assign(
+        SERIES=config_label(engine, cutoff)) for engine, cutoff in series],
+        ignore_index=True)
+    if history.empty:
+        print("No query times in the history for the given engines.")
+        return
+
+    version_order = history.sort_values(["DATE", "RUN_ID"])["VERSION"].drop_duplicates().tolist()
+
+    for json_name, json_df in history.groupby("JSON"):
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 12))
+
+        for i, (series_name, series_df) in enumerate(json_df.groupby("SERIES", sort=False)):
+            color = PLOT_COLORS[i % len(PLOT_COLORS)]
+            times = series_df.pivot_table(index="VERSION", columns="QUERY_ID", values="QUERY_TIME_SECONDS")
+            times = times.reindex([version for version in version_order if version in times.index])
+            # Positions on the shared version axis, so series measured in fewer versions still line up
+            x = [version_order.index(version) for version in times.index]
+
+            # --- Plot 1: Every query across the versions ---
+            for j, query_id in enumerate(times.columns):
+                ax1.plot(x, times[query_id], marker="o", color=color, alpha=0.5,
+                         label=series_name if j == 0 else None)
+
+            # --- Plot 2: Total over the queries every version measured ---
+            complete = times.dropna(axis=1)
+            ax2.plot(x, complete.sum(axis=1), marker="o", color=color,
+                     label=f"{series_name} ({complete.shape[1]} queries)")
+
+        ax1.set_title(f"Query Time per Query across Versions for {json_name}")
+        ax1.set_ylabel("Query Time (Seconds)")
+        ax2.set_title(f"Total Query Time across Versions for {json_name}")
+        ax2.set_ylabel("Total Query Time (Seconds)")
+        for ax in (ax1, ax2):
+            ax.set_xticks(range(len(version_order)), version_order, rotation=45)
+            ax.set_xlabel("Engine Version (Date)")
+            ax.grid(True, alpha=0.4)
+            ax.legend(fontsize=8)
+
+        plt.tight_layout()
+        save_path = os.path.join(result_dir_path, f"{json_name}_versions.png")
+        save_figure(save_path)
+        print(f"Generated: {save_path}")
+        plt.close(fig)
+
+
+# Run with: python src/speed/benchmark_history.py
+#
+# Keeps the results of every benchmark generation in one SQLite file instead of folders like optimal/old ... old_6.
+#
+# Tables (every run is tagged with ENGINE, ENGINE_VERSION, MACHINE and DATE in "runs"):
+#   query_times    JSON,CUTOFF,QUERY_ID,QUERY_TEXT,MODE,QUERY_TIME_SECONDS,REPETITIONS   (CUTOFF=-1 without cutoff)
+#   lut_builds     JSON,CUTOFF,BUILD_TIME_SECONDS,COLLECTION_TIME_SECONDS,SIZE_IN_BYTES,REPETITIONS
+#   serde_builds   JSON,BUILD_TIME_SECONDS,REPETITIONS
+# import_csv(...) reads the .csv files as written by the benchmarks (and run_benchmark.py).
+#
+# time_series(db_path, "crossref1_(551MB)", 3, cutoff=1024, engine="rq-lut") answers "how did query 3 on crossref1 at
+# cutoff 1024 develop" from the index, plot_versions(...) draws the query times of every JSON across the versions.
+#
+# Output in "result_dir_path":
+#   <JSON>_versions.png
+if __name__ == "__main__":
+    # Input
+    db_path = "res/data/speed/history.sqlite"
+    machine = "server"
+    # Oldest generation first, the folders under optimal/ have no date
+    imports = [
+        # (kind, csv_path, engine, engine_version, mode)
+        ("query_times", "res/data/speed/server/optimal/old_5/rq-legacy_time.csv", "rq-legacy", "old_5", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_5/rq-lut_time.csv", "rq-lut", "old_5", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_4/rq-legacy_time.csv", "rq-legacy", "old_4", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_4/rq-lut_time.csv", "rq-lut", "old_4", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_3/rq-legacy_time.csv", "rq-legacy", "old_3", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_3/rq-lut_time.csv", "rq-lut", "old_3", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_2/rq-legacy_time.csv", "rq-legacy", "old_2", "count"),
+        ("query_times", "res/data/speed/server/optimal/old_2/rq-lut_time.csv", "rq-lut", "old_2", "count"),
+        ("query_times", "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv", "rq-legacy",
+         "current", "count"),
+        ("query_times", "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv", "rq-lut",
+         "current", "count"),
+        ("query_times", "res/data/speed/server/rq_legacy/query_node/rq_legacy_time_node_repetitions=20.csv",
+         "rq-legacy", "current", "node"),
+        ("query_times", "res/data/speed/server/rq_lut/query_node/rq_lut_time_node_repetitions=20.csv", "rq-lut",
+         "current", "node"),
+        ("lut_builds", "res/data/speed/server/lut_build_speed_and_size/build_repetitions=20.csv", "rq-lut", "current",
+         None),
+        ("serde_builds", "res/data/speed/server/serde/serde_build_repetitions=3.csv", "serde", "current", None),
+    ]
+    result_dir_path = "res/plots/speed/server/history"
+
+    for kind, csv_path, engine, engine_version, mode in imports:
+        import_csv(db_path, kind, csv_path, engine, engine_version, machine, mode=mode)
+
+    plot_versions(db_path, [("rq-legacy", -1), ("rq-lut", 0), ("rq-lut", 1024)], result_dir_path)
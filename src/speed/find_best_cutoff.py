@@ -1,20 +1,25 @@
 import os
+import sys
 import pandas as pd
 
+import validate_timings
 
-def plot_per_json(rq_legacy_time: str, rq_lut_time: str, percent_threshold: float, result_dir_path: str):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_cache import cached, read_csv  # noqa: E402
+from profiling import profiled  # noqa: E402
+
+
+@cached
+def load_times(rq_legacy_time: str, rq_lut_time: str) -> tuple:
     """
-    Compare baseline query runtimes with LUT (cutoff) runtimes to evaluate performance per JSON.
-    Saves one CSV per JSON.
+    Normalized rq-legacy and rq-lut query times, cached so both summaries read the files only once.
     """
-    legacy_df = pd.read_csv(rq_legacy_time)
-    lut_df = pd.read_csv(rq_lut_time)
+    legacy_df = read_csv(rq_legacy_time)
+    lut_df = read_csv(rq_lut_time)
 
-    # Ensure QUERY_ID columns are strings
     legacy_df["QUERY_ID"] = legacy_df["QUERY_ID"].astype(str)
     lut_df["QUERY_ID"] = lut_df["QUERY_ID"].astype(str)
 
-    # Ensure numeric
     legacy_df["QUERY_TIME_SECONDS"] = pd.to_numeric(legacy_df["QUERY_TIME_SECONDS"], errors="coerce")
     lut_df["QUERY_TIME_SECONDS"] = pd.to_numeric(lut_df["QUERY_TIME_SECONDS"], errors="coerce")
     lut_df["CUTOFF"] = pd.to_numeric(lut_df["CUTOFF"], errors="coerce")
@@ -24,6 +29,17 @@ def plot_per_json(rq_legacy_time: str, rq_lut_time: str, percent_threshold: floa
     legacy_df["JSON"] = legacy_df["JSON"].astype(str).str.strip()
     lut_df["JSON"] = lut_df["JSON"].astype(str).str.strip()
 
+    return legacy_df, lut_df
+
+
+@profiled
+def plot_per_json(rq_legacy_time: str, rq_lut_time: str, percent_threshold: float, result_dir_path: str):
+    """
+    Compare baseline query runtimes with LUT (cutoff) runtimes to evaluate performance per JSON.
+    Saves one CSV per JSON.
+    """
+    legacy_df, lut_df = load_times(rq_legacy_time, rq_lut_time)
+
     os.makedirs(result_dir_path, exist_ok=True)
 
     # Process each JSON separately
@@ -72,24 +88,12 @@ def plot_per_json(rq_legacy_time: str, rq_lut_time: str, percent_threshold: floa
         print(f"JSON: {json_name}, total baseline query time: {total_time:.6f} seconds")
 
 
+@profiled
 def plot_combined_summary(rq_legacy_time: str, rq_lut_time: str, percent_threshold: float, result_dir_path: str):
     """
     Original behavior: combine all JSONs into a single summary CSV.
     """
-    legacy_df = pd.read_csv(rq_legacy_time)
-    lut_df = pd.read_csv(rq_lut_time)
-
-    legacy_df["QUERY_ID"] = legacy_df["QUERY_ID"].astype(str)
-    lut_df["QUERY_ID"] = lut_df["QUERY_ID"].astype(str)
-
-    legacy_df["QUERY_TIME_SECONDS"] = pd.to_numeric(legacy_df["QUERY_TIME_SECONDS"], errors="coerce")
-    lut_df["QUERY_TIME_SECONDS"] = pd.to_numeric(lut_df["QUERY_TIME_SECONDS"], errors="coerce")
-    lut_df["CUTOFF"] = pd.to_numeric(lut_df["CUTOFF"], errors="coerce")
-    lut_df = lut_df.dropna(subset=["CUTOFF"])
-    lut_df["CUTOFF"] = lut_df["CUTOFF"].astype(int)
-
-    legacy_df["JSON"] = legacy_df["JSON"].astype(str).str.strip()
-    lut_df["JSON"] = lut_df["JSON"].astype(str).str.strip()
+    legacy_df, lut_df = load_times(rq_legacy_time, rq_lut_time)
 
     merged_df = lut_df.merge(
         legacy_df[["JSON", "QUERY_ID", "QUERY_TIME_SECONDS"]],
@@ -138,6 +142,12 @@ if __name__ == "__main__":
     result_dir_path = "res/plots/speed/server/find_best_cutoff"
     percent_threshold = 1.03
 
+    # Quarantine queries with broken timings (unparsable, non-positive, divergent duplicates) before they decide the
+    # cutoff; outliers stay in, they are listed in validation/validation_report.csv
+    clean_csvs = validate_timings.run({"rq-legacy": rq_legacy_time, "rq-lut": rq_lut_time},
+                                      os.path.join(result_dir_path, "validation"))
+    rq_legacy_time, rq_lut_time = clean_csvs["rq-legacy"], clean_csvs["rq-lut"]
+
     # Choose one:
     plot_per_json(rq_legacy_time, rq_lut_time, percent_threshold, result_dir_path)
     plot_combined_summary(rq_legacy_time, rq_lut_time, percent_threshold, result_dir_path)
@@ -0,0 +1,146 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+
+def evaluate_workload(build_csv: str, query_csv: str, workload_csv: str) -> pd.DataFrame:
+    """
+    Compute the total time of every engine option per JSON for the given workload:
+    BUILD_TIME_SECONDS + sum(COUNT * AVERAGE_TIME) over all queries of the workload.
+    An option that misses a time for one of the workload queries of a JSON gets no total for that JSON.
+    """
+    build_df = pd.read_csv(build_csv)
+    query_df = pd.read_csv(query_csv)
+    workload_df = pd.read_csv(workload_csv)
+
+    for df in [build_df, query_df, workload_df]:
+        df["JSON"] = df["JSON"].astype(str).str.strip()
+    query_df["QUERY_ID"] = query_df["QUERY_ID"].astype(str)
+    workload_df["QUERY_ID"] = workload_df["QUERY_ID"].astype(str)
+    workload_df = workload_df.groupby(["JSON", "QUERY_ID"], as_index=False)["COUNT"].sum()
+
+    # (JSON, QUERY_ID) x ALGORITHM matrix of average query times, aligned to the workload rows
+    times = query_df.pivot_table(index=["JSON", "QUERY_ID"], columns="ALGORITHM", values="AVERAGE_TIME",
+                                 aggfunc="mean")
+    workload_index = pd.MultiIndex.from_frame(workload_df[["JSON", "QUERY_ID"]])
+    times = times.reindex(workload_index)
+
+    missing = times.isna().all(axis=1)
+    if missing.any():
+        print(f"Warning: no query times for {missing.sum()} workload entries, e.g. {list(times.index[missing][:3])}")
+
+    weighted = times.to_numpy() * workload_df["COUNT"].to_numpy()[:, np.newaxis]
+    weighted = pd.DataFrame(weighted, index=times.index, columns=times.columns)
+    # min_count makes sure an option with a missing query time does not look artificially cheap
+    query_totals = weighted.groupby(level="JSON").sum(min_count=1)
+    has_all_queries = times.notna().groupby(level="JSON").all()
+    query_totals = query_totals.where(has_all_queries)
+
+    builds = build_df.pivot_table(index="JSON", columns="ALGORITHM", values="BUILD_TIME_SECONDS", aggfunc="mean")
+    builds = builds.reindex(index=query_totals.index, columns=query_totals.columns)
+
+    result = pd.DataFrame({
+        "BUILD_TIME_SECONDS": builds.stack(future_stack=True),
+        "QUERY_TIME_SECONDS": query_totals.stack(future_stack=True),
+    }).reset_index()
+    result = result.dropna(subset=["BUILD_TIME_SECONDS", "QUERY_TIME_SECONDS"])
+    result["TOTAL_TIME_SECONDS"] = result["BUILD_TIME_SECONDS"] + result["QUERY_TIME_SECONDS"]
+
+    best = result.groupby("JSON")["TOTAL_TIME_SECONDS"].transform("min")
+    result["BEHIND_SECONDS"] = result["TOTAL_TIME_SECONDS"] - best
+    result["BEHIND_FACTOR"] = result["TOTAL_TIME_SECONDS"] / best
+    result["RANK"] = result.groupby("JSON")["TOTAL_TIME_SECONDS"].rank(method="min").astype(int)
+
+    return result.sort_values(["JSON", "RANK"]).reset_index(drop=True)
+
+
+def plot(result: pd.DataFrame, result_dir_path: str) -> None:
+    for json_name, group in result.groupby("JSON"):
+        group = group.sort_values("TOTAL_TIME_SECONDS", ascending=False)
+
+        fig, ax = plt.subplots(figsize=(10, max(4, 0.5 * len(group) + 2)))
+        ax.barh(group["ALGORITHM"], group["BUILD_TIME_SECONDS"], color="skyblue", label="Build")
+        ax.barh(group["ALGORITHM"], group["QUERY_TIME_SECONDS"], left=group["BUILD_TIME_SECONDS"],
+                color="navy", label="Queries")
+
+        for _, row in group.iterrows():
+            label = "best" if row["RANK"] == 1 else f"+{row['BEHIND_SECONDS']:.2f}s (x{row['BEHIND_FACTOR']:.2f})"
+            ax.text(row["TOTAL_TIME_SECONDS"], row["ALGORITHM"], f" {label}", va="center", fontsize=10)
+
+        ax.set_xlabel("Total Time for the Workload (s)")
+        ax.set_title(f"Workload Total Time per Engine for {json_name}")
+        ax.grid(True, axis="x", linestyle="--", alpha=0.7)
+        ax.legend(loc="lower right")
+
+        plt.tight_layout()
+        save_path = os.path.join(result_dir_path, f"{json_name}_workload.png")
+        save_figure(save_path)
+        print(f"Generated: {save_path}")
+        plt.close(fig)
+
+
+@profiled
+def find_best_engine(input_dir_path: str, workload_csv: str, result_dir_path: str) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    result = evaluate_workload(f"{input_dir_path}/build.csv", f"{input_dir_path}/query.csv", workload_csv)
+    if result.empty:
+        print("No engine option covers the workload.")
+        return
+
+    result_csv_path = os.path.join(result_dir_path, "workload_all_engines.csv")
+    result.to_csv(result_csv_path, index=False)
+
+    best = result[result["RANK"] == 1]
+    runner_up = result[result["RANK"] == 2].set_index("JSON")["BEHIND_SECONDS"]
+    best = best.assign(RUNNER_UP_BEHIND_SECONDS=best["JSON"].map(runner_up))
+    best_csv_path = os.path.join(result_dir_path, "workload_best_engine.csv")
+    best.to_csv(best_csv_path, index=False)
+
+    print(best[["JSON", "ALGORITHM", "TOTAL_TIME_SECONDS", "RUNNER_UP_BEHIND_SECONDS"]])
+    print(f"Saved all options -> {result_csv_path}")
+    print(f"Saved best engine per JSON -> {best_csv_path}")
+
+    plot(result, result_dir_path)
+
+
+# Run with: python src/speed/find_best_engine.py
+#
+# Picks the fastest engine per JSON for a mix of queries instead of a single query repeated x times (see
+# plot_final.py).
+#
+# "input_dir_path" is the folder holding the build.csv and query.csv created by plot_final.construct_input_csvs:
+#   JSON,ALGORITHM,BUILD_TIME_SECONDS
+#   bestbuy_large_record_(1GB),rq-lut-cutoff-0,0.532
+#   bestbuy_large_record_(1GB),rq-legacy,0.0
+#   ...
+#   JSON,ALGORITHM,QUERY_ID,QUERY_TEXT,AVERAGE_TIME
+#   bestbuy_large_record_(1GB),SERDE,1,$..freeShipping,0.1345
+#   ...
+# "workload_csv" describes the expected traffic per JSON:
+#   JSON,QUERY_ID,COUNT
+#   bestbuy_large_record_(1GB),1,500
+#   bestbuy_large_record_(1GB),2,20
+#   ...
+#
+# The total time of an engine is its build time (once) plus the sum of COUNT * AVERAGE_TIME over the workload.
+# Engines that miss a query of the workload are not considered for that JSON.
+#
+# Output in "result_dir_path":
+#   workload_all_engines.csv   total time, BEHIND_SECONDS / BEHIND_FACTOR and RANK of every option per JSON
+#   workload_best_engine.csv   the winner per JSON and how far the runner-up is behind
+#   <JSON>_workload.png        stacked build + query time per engine
+if __name__ == "__main__":
+    # Input
+    input_dir_path = "res/plots/speed/server/final"
+    workload_csv = "res/data/speed/server/workload/workload.csv"
+    result_dir_path = "res/plots/speed/server/best_engine"
+
+    find_best_engine(input_dir_path, workload_csv, result_dir_path)
@@ -0,0 +1,134 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plan_repetitions import BASELINE_ENGINE, KEY_COLUMNS, load_samples
+from rank_speedups import config_label
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+PERCENTILES = [50, 90, 99]
+
+STAT_COLUMNS = ["MEAN_SECONDS"] + [f"P{p}_SECONDS" for p in PERCENTILES] + ["MAX_SECONDS"]
+
+
+def compute_percentiles(samples: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean, P50/P90/P99 and max of the repetitions per (JSON, ENGINE, CUTOFF, QUERY_ID), all keys in one groupby.
+    TAIL_RATIO = P99 / P50 tells how far the slow repetitions are off the typical one.
+    """
+    grouped = samples.groupby(KEY_COLUMNS)["QUERY_TIME_SECONDS"]
+    stats = grouped.quantile([p / 100 for p in PERCENTILES]).unstack()
+    stats.columns = [f"P{p}_SECONDS" for p in PERCENTILES]
+    stats.insert(0, "MEAN_SECONDS", grouped.mean())
+    stats["MAX_SECONDS"] = grouped.max()
+    stats["REPETITIONS"] = grouped.size()
+    stats["TAIL_RATIO"] = stats["P99_SECONDS"] / stats["P50_SECONDS"]
+    return stats.reset_index()
+
+
+def load_percentiles(samples_csv: str) -> pd.DataFrame:
+    return compute_percentiles(load_samples(samples_csv))
+
+
+def tail_speedups(percentiles: pd.DataFrame, baseline_engine: str = BASELINE_ENGINE) -> pd.DataFrame:
+    """
+    Speedup over the baseline engine of every statistic, e.g. P99_SPEEDUP = baseline P99 / engine P99. An engine whose
+    P99_SPEEDUP is below its MEAN_SPEEDUP loses part of its advantage in the tail.
+    """
+    baseline = percentiles[percentiles["ENGINE"] == baseline_engine]
+    others = percentiles[percentiles["ENGINE"] != baseline_engine]
+    merged = others.merge(baseline[["JSON", "QUERY_ID"] + STAT_COLUMNS], on=["JSON", "QUERY_ID"],
+                          suffixes=("", "_BASELINE"))
+
+    speedups = merged[KEY_COLUMNS].copy()
+    for column in STAT_COLUMNS:
+        speedups[column.replace("_SECONDS", "_SPEEDUP")] = merged[f"{column}_BASELINE"] / merged[column]
+    return speedups
+
+
+def plot_tail_speedups(speedups: pd.DataFrame, save_path: str) -> None:
+    """
+    Mean speedup against P99 speedup per query, one color per engine and cutoff. Points below the diagonal keep less
+    of their advantage in the tail.
+    """
+    fig, ax = plt.subplots(figsize=(9, 8))
+    for (engine, cutoff), group in speedups.groupby(["ENGINE", "CUTOFF"]):
+        label = config_label(engine, cutoff)
+        ax.scatter(group["MEAN_SPEEDUP"], group["P99_SPEEDUP"], alpha=0.7, label=label)
+
+    limits = speedups[["MEAN_SPEEDUP", "P99_SPEEDUP"]].to_numpy()
+    limits = limits[np.isfinite(limits) & (limits > 0)]
+    low, high = limits.min() / 1.2, limits.max() * 1.2
+    ax.plot([low, high], [low, high], color="black", linestyle="--", label="Same speedup in the tail")
+    ax.axhline(y=1, color="red", linestyle=":", label="rq-legacy")
+    ax.set_xscale("log", base=2)
+    ax.set_yscale("log", base=2)
+    ax.set_xlim(low, high)
+    ax.set_ylim(low, high)
+    ax.set_xlabel("Speedup of the Mean over rq-legacy")
+    ax.set_ylabel("Speedup of the P99 over rq-legacy")
+    ax.set_title("Does the Mean Speedup Hold in the Tail?")
+    ax.legend(fontsize=8)
+    ax.grid(True, alpha=0.4)
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot(samples_csv: str, result_dir_path: str, baseline_engine: str = BASELINE_ENGINE) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    percentiles = load_percentiles(samples_csv)
+    percentiles_csv_path = os.path.join(result_dir_path, "latency_percentiles.csv")
+    percentiles.to_csv(percentiles_csv_path, index=False)
+    print(f"Saved percentiles -> {percentiles_csv_path}")
+
+    speedups = tail_speedups(percentiles, baseline_engine)
+    speedups_csv_path = os.path.join(result_dir_path, "tail_speedups.csv")
+    speedups.to_csv(speedups_csv_path, index=False)
+    print(speedups.groupby(["ENGINE", "CUTOFF"])[["MEAN_SPEEDUP", "P99_SPEEDUP", "MAX_SPEEDUP"]].median())
+    print(f"Saved tail speedups -> {speedups_csv_path}")
+
+    if not speedups.empty:
+        plot_tail_speedups(speedups, os.path.join(result_dir_path, "tail_speedups.png"))
+
+
+# Run with: python src/speed/latency_percentiles.py
+#
+# The timing .csv files only hold the mean over all repetitions. This reads the per repetition samples (the samples
+# file of run_benchmark.py, see plan_repetitions.py for the format):
+#   JSON,ENGINE,CUTOFF,QUERY_ID,REPETITION,QUERY_TIME_SECONDS
+#   bestbuy_large_record_(1GB),rq-lut,256,1,1,0.4441
+#   ...
+# With 20 repetitions P99 is close to the max, run more repetitions for a stable tail.
+#
+# Output in "result_dir_path":
+#   latency_percentiles.csv   MEAN/P50/P90/P99/MAX_SECONDS, REPETITIONS and TAIL_RATIO per key
+#   tail_speedups.csv         speedup over "baseline_engine" of every statistic per query
+#   tail_speedups.png         mean speedup against P99 speedup
+# plus the percentile variants plot_optimal.plot_percentiles (into "optimal") and plot_final.plot_percentiles
+# (into "final", needs the build.csv of plot_final.py).
+if __name__ == "__main__":
+    # Imported here, both plot modules import this one
+    from plot_final import plot_percentiles as plot_final_percentiles
+    from plot_optimal import plot_percentiles as plot_optimal_percentiles
+
+    # Input
+    samples_csv = "res/data/speed/server/samples/query_samples_repetitions=20.csv"
+    counter_folder = "res/data/analysis/query"
+    final_dir_path = "res/plots/speed/server/final"
+    result_dir_path = "res/plots/speed/server/latency_percentiles"
+
+    plot(samples_csv, result_dir_path)
+    plot_optimal_percentiles(samples_csv, counter_folder, [0, 1024], os.path.join(result_dir_path, "optimal"))
+    if os.path.exists(os.path.join(final_dir_path, "build.csv")):
+        plot_final_percentiles(samples_csv, final_dir_path, os.path.join(result_dir_path, "final"), ["0", "1024"])
@@ -0,0 +1,276 @@
+import math
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_cutoff_pareto import load_builds, load_query_totals
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# Gaussian process on x = log2(cutoff + 1): one length scale is one doubling of the cutoff
+LENGTH_SCALE = 1.5
+# Noise variance relative to the variance of the measured query times
+NOISE = 1e-2
+
+EI_COLUMNS = ["PROPOSAL_RANK", "CUTOFF", "PREDICTED_QUERY_TIME_SECONDS", "PREDICTED_STD_SECONDS",
+              "EXPECTED_IMPROVEMENT_SECONDS"]
+
+_erf = np.vectorize(math.erf)
+
+
+def to_x(cutoffs) -> np.ndarray:
+    return np.log2(np.asarray(cutoffs, dtype=float) + 1)
+
+
+def candidate_cutoffs(cutoffs: np.ndarray, times: np.ndarray, steps_per_doubling: int = 4,
+                      doublings_beyond: int = 2) -> np.ndarray:
+    """
+    Integer cutoffs spaced evenly in log2 from the best measured cutoff to its measured neighbours (or up to
+    "doublings_beyond" doublings past it if it is at the edge of the measured range). Candidates closer than half a
+    step to any measured cutoff would only repeat that measurement and are left out.
+    """
+    order = np.argsort(cutoffs)
+    x, times = to_x(cutoffs)[order], np.asarray(times)[order]
+    best = int(np.argmin(times))
+    low = x[best - 1] if best > 0 else max(x[best] - doublings_beyond, 0)
+    high = x[best + 1] if best < len(x) - 1 else x[best] + doublings_beyond
+
+    # Anchored at the best cutoff, so the grid does not land right beside it
+    step = 1 / steps_per_doubling
+    grid = np.concatenate([np.arange(x[best], low - 1e-9, -step), np.arange(x[best], high + 1e-9, step)])
+    candidates = np.unique(np.round(2 ** grid - 1).astype(int))
+    distance = np.abs(to_x(candidates)[:, np.newaxis] - x[np.newaxis, :]).min(axis=1)
+    return candidates[distance >= step / 2]
+
+
+def fit_gaussian_process(x: np.ndarray, y: np.ndarray):
+    """
+    Return a function giving the posterior mean and standard deviation of the query time at new x.
+    """
+    y_mean, y_std = y.mean(), y.std() if y.std() > 0 else 1.0
+    y_scaled = (y - y_mean) / y_std
+
+    def kernel(a, b):
+        return np.exp(-0.5 * ((a[:, np.newaxis] - b[np.newaxis, :]) / LENGTH_SCALE) ** 2)
+
+    k_xx = kernel(x, x) + NOISE * np.eye(len(x))
+    cholesky = np.linalg.cholesky(k_xx)
+    alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, y_scaled))
+
+    def predict(x_new):
+        k_new = kernel(np.asarray(x_new, dtype=float), x)
+        mean = k_new @ alpha
+        v = np.linalg.solve(cholesky, k_new.T)
+        variance = np.clip(1 - (v ** 2).sum(axis=0), 1e-12, None)
+        return mean * y_std + y_mean, np.sqrt(variance) * y_std
+
+    return predict
+
+
+def expected_improvement(mean: np.ndarray, std: np.ndarray, best: float) -> np.ndarray:
+    improvement = best - mean
+    z = improvement / std
+    cdf = 0.5 * (1 + _erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return improvement * cdf + std * pdf
+
+
+def propose_expected_improvement(cutoffs: np.ndarray, times: np.ndarray, candidates: np.ndarray,
+                                 num_proposals: int) -> pd.DataFrame:
+    """
+    Pick the candidate with the largest expected improvement over the best measured time, pretend it was measured at
+    its predicted mean and repeat, so the proposals of one batch do not pile up at the same spot.
+    """
+    x, y = to_x(cutoffs), np.asarray(times, dtype=float)
+    candidates = candidates.copy()
+    proposals = []
+
+    for rank in range(1, num_proposals + 1):
+        if len(candidates) == 0:
+            break
+        predict = fit_gaussian_process(x, y)
+        mean, std = predict(to_x(candidates))
+        gains = expected_improvement(mean, std, y.min())
+        best = int(np.argmax(gains))
+
+        proposals.append({
+            "PROPOSAL_RANK": rank,
+            "CUTOFF": candidates[best],
+            "PREDICTED_QUERY_TIME_SECONDS": mean[best],
+            "PREDICTED_STD_SECONDS": std[best],
+            "EXPECTED_IMPROVEMENT_SECONDS": gains[best],
+        })
+        x = np.append(x, to_x(candidates[best]))
+        y = np.append(y, mean[best])
+        candidates = np.delete(candidates, best)
+
+    return pd.DataFrame(proposals, columns=EI_COLUMNS)
+
+
+def propose_bisection(cutoffs: np.ndarray, times: np.ndarray, num_proposals: int) -> pd.DataFrame:
+    """
+    Geometric midpoints between the best measured cutoff and its measured neighbours, or the next doubling / halving
+    if the best cutoff is at the edge of the measured range.
+    """
+    order = np.argsort(cutoffs)
+    cutoffs, times = np.asarray(cutoffs)[order], np.asarray(times)[order]
+    best = int(np.argmin(times))
+
+    proposals = []
+    for neighbour in [best - 1, best + 1]:
+        if 0 <= neighbour < len(cutoffs):
+            midpoint = int(round(2 ** ((to_x(cutoffs[best]) + to_x(cutoffs[neighbour])) / 2) - 1))
+        elif neighbour > best:
+            midpoint = int(max(cutoffs[best], 1) * 2)
+        else:
+            midpoint = int(cutoffs[best] // 2)
+        if midpoint not in cutoffs and midpoint not in [p["CUTOFF"] for p in proposals]:
+            proposals.append({"PROPOSAL_RANK": len(proposals) + 1, "CUTOFF": midpoint})
+
+    return pd.DataFrame(proposals[:num_proposals], columns=["PROPOSAL_RANK", "CUTOFF"])
+
+
+def size_model(builds: pd.DataFrame):
+    """
+    Interpolate log(SIZE_IN_BYTES) linearly over log2(cutoff + 1), clamped at the measured range.
+    """
+    builds = builds.sort_values("CUTOFF")
+    x, log_size = to_x(builds["CUTOFF"]), np.log(builds["SIZE_IN_BYTES"].astype(float))
+    return lambda cutoffs: np.exp(np.interp(to_x(cutoffs), x, log_size))
+
+
+def plan_one(totals: pd.DataFrame, builds: pd.DataFrame, method: str, num_proposals: int,
+             max_lut_bytes: float) -> pd.DataFrame:
+    cutoffs = totals["CUTOFF"].to_numpy()
+    times = totals["TOTAL_QUERY_TIME_SECONDS"].to_numpy()
+    predict_size = size_model(builds) if not builds.empty else None
+
+    proposals = None
+    if method == "ei" and len(cutoffs) >= 3:
+        candidates = candidate_cutoffs(cutoffs, times)
+        if predict_size is not None and max_lut_bytes is not None:
+            candidates = candidates[predict_size(candidates) <= max_lut_bytes]
+        # No candidates left (optimum among the densely measured cutoffs or all too large): bisect instead
+        if len(candidates) > 0:
+            proposals = propose_expected_improvement(cutoffs, times, candidates, num_proposals)
+    if proposals is None:
+        proposals = propose_bisection(cutoffs, times, num_proposals)
+        if predict_size is not None and max_lut_bytes is not None and not proposals.empty:
+            proposals = proposals[predict_size(proposals["CUTOFF"]) <= max_lut_bytes].reset_index(drop=True)
+            proposals["PROPOSAL_RANK"] = np.arange(1, len(proposals) + 1)
+
+    if predict_size is not None and not proposals.empty:
+        proposals["PREDICTED_SIZE_IN_BYTES"] = predict_size(proposals["CUTOFF"])
+    proposals.insert(1, "BEST_MEASURED_CUTOFF", cutoffs[np.argmin(times)])
+    proposals.insert(2, "BEST_MEASURED_QUERY_TIME_SECONDS", times.min())
+    return proposals
+
+
+def plot_plan(totals: pd.DataFrame, builds: pd.DataFrame, proposals: pd.DataFrame, title: str, save_path: str) -> None:
+    fig, ax1 = plt.subplots(figsize=(12, 7))
+    cutoffs = totals["CUTOFF"].to_numpy()
+    times = totals["TOTAL_QUERY_TIME_SECONDS"].to_numpy()
+
+    x_plot = np.linspace(0, to_x(max(cutoffs.max(), proposals["CUTOFF"].max() if not proposals.empty else 0)) + 1,
+                         300)
+    if len(cutoffs) >= 3:
+        mean, std = fit_gaussian_process(to_x(cutoffs), times)(x_plot)
+        ax1.plot(x_plot, mean, color="navy", label="Model")
+        ax1.fill_between(x_plot, mean - 2 * std, mean + 2 * std, color="navy", alpha=0.15, label="±2σ")
+    ax1.scatter(to_x(cutoffs), times, color="black", zorder=3, label="Measured")
+    for cutoff in proposals["CUTOFF"]:
+        ax1.axvline(x=to_x(cutoff), color="red", linestyle="--", alpha=0.7)
+    ax1.plot([], [], color="red", linestyle="--", label="Proposed")
+
+    if not builds.empty:
+        ax2 = ax1.twinx()
+        ax2.plot(to_x(builds["CUTOFF"]), builds["SIZE_IN_BYTES"] / (1024 * 1024), color="seagreen", marker="s",
+                 linestyle=":", label="LUT size")
+        ax2.set_yscale("log")
+        ax2.set_ylabel("LUT Size (MB)", color="seagreen")
+
+    ticks = np.unique(np.concatenate([cutoffs, proposals["CUTOFF"].to_numpy()]))
+    ax1.set_xticks(to_x(ticks), ticks.astype(str), rotation=90)
+    ax1.set_xlabel("Cutoff (log scale)")
+    ax1.set_ylabel("Total Query Time (seconds)")
+    ax1.set_title(title)
+    ax1.grid(True, alpha=0.4)
+    ax1.legend(loc="upper left")
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plan(distance_cutoff_dir: str, rq_legacy_time: str, rq_lut_time: str, result_dir_path: str, method: str = "ei",
+         num_proposals: int = 3, max_lut_bytes: float = None) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    builds = load_builds(distance_cutoff_dir)
+    totals = load_query_totals(rq_legacy_time, rq_lut_time)
+    if totals.empty:
+        print("No measured cutoffs.")
+        return
+
+    # The corpus only over cutoffs measured for every JSON, otherwise the sums are not comparable
+    num_jsons = totals["JSON"].nunique()
+    complete = totals.groupby("CUTOFF").filter(lambda group: group["JSON"].nunique() == num_jsons)
+    corpus_totals = complete.groupby("CUTOFF", as_index=False)["TOTAL_QUERY_TIME_SECONDS"].sum().assign(JSON="corpus")
+    corpus_builds = builds[builds["CUTOFF"].isin(corpus_totals["CUTOFF"])].groupby(
+        "CUTOFF", as_index=False)["SIZE_IN_BYTES"].sum().assign(JSON="corpus")
+    totals = pd.concat([totals, corpus_totals], ignore_index=True)
+    builds = pd.concat([builds, corpus_builds], ignore_index=True)
+
+    all_proposals = []
+    for json_name, json_totals in totals.groupby("JSON"):
+        json_totals = json_totals.sort_values("CUTOFF")
+        json_builds = builds[builds["JSON"] == json_name]
+        # A LUT size budget is given per JSON, the corpus sums all LUTs
+        budget = max_lut_bytes * num_jsons if json_name == "corpus" and max_lut_bytes is not None else max_lut_bytes
+        proposals = plan_one(json_totals, json_builds, method, num_proposals, budget)
+        proposals.insert(0, "JSON", json_name)
+        all_proposals.append(proposals)
+
+        plot_plan(json_totals, json_builds, proposals, f"Next cutoffs to measure for {json_name} ({method})",
+                  os.path.join(result_dir_path, f"{json_name}_next_cutoffs.png"))
+
+    proposals = pd.concat(all_proposals, ignore_index=True)
+    proposals_csv_path = os.path.join(result_dir_path, "next_cutoffs.csv")
+    proposals.to_csv(proposals_csv_path, index=False)
+    print(proposals)
+    print(f"Saved proposals -> {proposals_csv_path}")
+
+
+# Run with: python src/speed/plan_cutoff_sweep.py
+#
+# Proposes the next cutoffs to benchmark instead of sweeping a dense hand-picked list.
+#
+# Input (see plot_cutoff_pareto.py):
+#   "distance_cutoff_dir"  one subfolder per measured cutoff with a build.csv: JSON,BUILD_TIME_SECONDS,SIZE_IN_BYTES
+#   "rq_legacy_time"       JSON,QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS
+#   "rq_lut_time"          JSON,CUTOFF,QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS
+#
+# The total query time over all queries is modelled per JSON (and for the corpus) as a function of log2(cutoff + 1):
+#   "ei"      Gaussian process, the proposals maximize the expected improvement over the best measured cutoff among
+#             the cutoffs between its measured neighbours (needs three measured cutoffs, falls back to bisection)
+#   "bisect"  geometric midpoints between the best measured cutoff and its measured neighbours
+# The LUT size is interpolated from the builds; candidates whose LUT exceeds "max_lut_bytes" (per JSON) are skipped.
+#
+# Output in "result_dir_path":
+#   next_cutoffs.csv                 proposed cutoffs per JSON with the predicted query time and LUT size
+#   <JSON>_next_cutoffs.png          model, measured cutoffs and proposals
+if __name__ == "__main__":
+    # Input
+    distance_cutoff_dir = "res/data/speed/server/distance_cutoff"
+    rq_legacy_time = "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv"
+    rq_lut_time = "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv"
+    result_dir_path = "res/plots/speed/server/next_cutoffs"
+
+    plan(distance_cutoff_dir, rq_legacy_time, rq_lut_time, result_dir_path)
@@ -0,0 +1,276 @@
+import functools
+import math
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+KEY_COLUMNS = ["JSON", "ENGINE", "CUTOFF", "QUERY_ID"]
+
+BASELINE_ENGINE = "rq-legacy"
+
+# np.trapz is called np.trapezoid since numpy 2.0
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+def t_quantile(p: float, degrees_of_freedom) -> np.ndarray:
+    """
+    Student t quantile for every entry of "degrees_of_freedom", found by bisection on the numerically integrated
+    density (no scipy here).
+    """
+    df = np.asarray(degrees_of_freedom, dtype=float)
+    quantiles = np.full(df.shape, np.nan)
+    for value in np.unique(df[np.isfinite(df) & (df >= 1)]):
+        quantiles[df == value] = _t_quantile(p, float(value))
+    return quantiles
+
+
+@functools.lru_cache(maxsize=None)
+def _t_quantile(p: float, df: float) -> float:
+    log_norm = math.lgamma((df + 1) / 2) - math.lgamma(df / 2) - 0.5 * math.log(df * math.pi)
+
+    def cdf(x: float) -> float:
+        grid = np.linspace(0, x, 2001)
+        density = np.exp(log_norm - (df + 1) / 2 * np.log1p(grid ** 2 / df))
+        return 0.5 + _trapezoid(density, grid)
+
+    low, high = 0.0, 1.0
+    while cdf(high) < p:
+        high *= 2
+    for _ in range(60):
+        middle = (low + high) / 2
+        low, high = (middle, high) if cdf(middle) < p else (low, middle)
+    return (low + high) / 2
+
+
+class RepetitionPlanner:
+    """
+    Decides per (JSON, ENGINE, CUTOFF, QUERY_ID) when enough repetitions are collected while the samples stream in.
+
+    rule="ci"        stop once the confidence interval of the mean is narrower than "relative_width" of the mean
+    rule="baseline"  stop once the confidence interval of the mean lies completely above or below the mean of the
+                     baseline engine for the same (JSON, QUERY_ID), i.e. faster or slower is decided; the baseline
+                     itself uses the "ci" rule. The confidence level is split over all "max_repetitions" looks.
+                     The baseline mean comes from set_baseline(...) or from baseline samples added to this planner.
+    """
+
+    def __init__(self, rule: str = "ci", relative_width: float = 0.02, confidence: float = 0.95,
+                 min_repetitions: int = 3, max_repetitions: int = 20):
+        self.rule = rule
+        self.relative_width = relative_width
+        self.confidence = confidence
+        self.min_repetitions = min_repetitions
+        self.max_repetitions = max_repetitions
+        # Running count, mean and sum of squared deviations (Welford) per key
+        self.state = {}
+        # Baseline mean per (JSON, QUERY_ID) of an already finished baseline run
+        self.baseline_means = {}
+
+    def set_baseline(self, json_name: str, query_id, seconds: float) -> None:
+        self.baseline_means[(json_name, str(query_id))] = seconds
+
+    def _alpha(self) -> float:
+        alpha = 1 - self.confidence
+        return alpha / self.max_repetitions if self.rule == "baseline" else alpha
+
+    def _interval(self, count: int, mean: float, m2: float):
+        if count < 2:
+            return -np.inf, np.inf
+        half_width = float(t_quantile(1 - self._alpha() / 2, count - 1)) * math.sqrt(m2 / (count - 1) / count)
+        return mean - half_width, mean + half_width
+
+    def add(self, json_name: str, engine: str, cutoff, query_id, seconds: float) -> bool:
+        """
+        Record one repetition, returns True once the key needs no further repetitions.
+        """
+        key = (json_name, engine, cutoff, str(query_id))
+        count, mean, m2 = self.state.get(key, (0, 0.0, 0.0))
+        count += 1
+        delta = seconds - mean
+        mean += delta / count
+        m2 += delta * (seconds - mean)
+        self.state[key] = (count, mean, m2)
+        return self.done(key)
+
+    def done(self, key: tuple) -> bool:
+        count, mean, m2 = self.state.get(key, (0, 0.0, 0.0))
+        if count >= self.max_repetitions:
+            return True
+        if count < self.min_repetitions:
+            return False
+
+        low, high = self._interval(count, mean, m2)
+        json_name, engine, _, query_id = key
+        if self.rule == "baseline" and engine != BASELINE_ENGINE:
+            baselines = [state[1] for (j, e, _, q), state in self.state.items()
+                         if j == json_name and e == BASELINE_ENGINE and q == query_id]
+            baseline_mean = self.baseline_means.get((json_name, query_id), baselines[0] if baselines else None)
+            if baseline_mean is not None:
+                return high < baseline_mean or low > baseline_mean
+        return (high - low) / 2 <= self.relative_width * abs(mean)
+
+    def status(self) -> pd.DataFrame:
+        rows = []
+        for key, (count, mean, m2) in self.state.items():
+            low, high = self._interval(count, mean, m2)
+            rows.append({**dict(zip(KEY_COLUMNS, key)), "REPETITIONS": count, "MEAN_SECONDS": mean,
+                         "CI_LOW_SECONDS": low, "CI_HIGH_SECONDS": high, "DONE": self.done(key)})
+        return pd.DataFrame(rows)
+
+
+def replay(samples: pd.DataFrame, rule: str, relative_width: float, confidence: float, min_repetitions: int,
+           max_repetitions: int) -> pd.DataFrame:
+    """
+    Apply the stopping rule of RepetitionPlanner to already collected per repetition samples, vectorized over all
+    keys: running mean and variance per key in REPETITION order and the first repetition at which the rule holds.
+    """
+    samples = samples.sort_values(KEY_COLUMNS + ["REPETITION"]).reset_index(drop=True)
+    groups = samples.groupby(KEY_COLUMNS, sort=False)["QUERY_TIME_SECONDS"]
+
+    count = groups.cumcount() + 1
+    running_sum = groups.cumsum()
+    running_sum_sq = (samples["QUERY_TIME_SECONDS"] ** 2).groupby([samples[c] for c in KEY_COLUMNS]).cumsum()
+    mean = running_sum / count
+    variance = ((running_sum_sq - count * mean ** 2) / (count - 1)).clip(lower=0)
+
+    alpha = (1 - confidence) / max_repetitions if rule == "baseline" else 1 - confidence
+    with np.errstate(divide="ignore", invalid="ignore"):
+        half_width = t_quantile(1 - alpha / 2, count - 1) * np.sqrt(variance / count)
+    half_width = half_width.where(count >= 2, np.inf)
+
+    stop = (half_width <= relative_width * mean.abs())
+    if rule == "baseline":
+        full_means = samples.groupby(KEY_COLUMNS)["QUERY_TIME_SECONDS"].mean().rename("BASELINE_MEAN").reset_index()
+        baseline = full_means[full_means["ENGINE"] == BASELINE_ENGINE][["JSON", "QUERY_ID", "BASELINE_MEAN"]]
+        baseline_mean = samples[["JSON", "QUERY_ID"]].merge(baseline, on=["JSON", "QUERY_ID"], how="left")[
+            "BASELINE_MEAN"].to_numpy()
+        decided = (mean + half_width < baseline_mean) | (mean - half_width > baseline_mean)
+        has_baseline = (samples["ENGINE"] != BASELINE_ENGINE) & ~np.isnan(baseline_mean)
+        stop = stop.where(~has_baseline, decided)
+    stop = (stop & (count >= min_repetitions)) | (count >= max_repetitions)
+
+    samples["STOP"] = stop
+    samples["RUNNING_MEAN"] = mean
+    samples["COUNT"] = count
+    summary = samples.groupby(KEY_COLUMNS).agg(
+        REPETITIONS=("COUNT", "max"),
+        FULL_MEAN_SECONDS=("QUERY_TIME_SECONDS", "mean"),
+    ).reset_index()
+    first_stop = samples[samples["STOP"]].groupby(KEY_COLUMNS).agg(
+        STOP_AT=("COUNT", "min"),
+    ).reset_index()
+    mean_at_stop = samples.merge(first_stop, left_on=KEY_COLUMNS + ["COUNT"], right_on=KEY_COLUMNS + ["STOP_AT"])[
+        KEY_COLUMNS + ["STOP_AT", "RUNNING_MEAN"]].rename(columns={"RUNNING_MEAN": "MEAN_AT_STOP_SECONDS"})
+
+    summary = summary.merge(mean_at_stop, on=KEY_COLUMNS, how="left")
+    # Keys that never met the rule within the collected samples use all of them
+    summary["STOP_AT"] = summary["STOP_AT"].fillna(summary["REPETITIONS"]).astype(int)
+    summary["MEAN_AT_STOP_SECONDS"] = summary["MEAN_AT_STOP_SECONDS"].fillna(summary["FULL_MEAN_SECONDS"])
+    summary["SAVED_REPETITIONS"] = summary["REPETITIONS"] - summary["STOP_AT"]
+    summary["RELATIVE_ERROR"] = (summary["MEAN_AT_STOP_SECONDS"] / summary["FULL_MEAN_SECONDS"] - 1).abs()
+    return summary
+
+
+def load_samples(samples_csv: str) -> pd.DataFrame:
+    df = pd.read_csv(samples_csv)
+    df["JSON"] = df["JSON"].astype(str).str.strip()
+    df["QUERY_ID"] = df["QUERY_ID"].astype(str)
+    df["ENGINE"] = df["ENGINE"].astype(str).str.strip()
+    if "CUTOFF" not in df.columns:
+        df["CUTOFF"] = -1
+    df["CUTOFF"] = pd.to_numeric(df["CUTOFF"], errors="coerce").fillna(-1).astype(int)
+    df["QUERY_TIME_SECONDS"] = pd.to_numeric(df["QUERY_TIME_SECONDS"], errors="coerce")
+    return df.dropna(subset=["QUERY_TIME_SECONDS"])
+
+
+@profiled
+def plot(samples_csv: str, result_dir_path: str, rule: str = "ci", relative_width: float = 0.02,
+         confidence: float = 0.95, min_repetitions: int = 3) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    samples = load_samples(samples_csv)
+    max_repetitions = int(samples.groupby(KEY_COLUMNS).size().max())
+    plan_df = replay(samples, rule, relative_width, confidence, min_repetitions, max_repetitions)
+
+    plan_csv_path = os.path.join(result_dir_path, f"repetition_plan_{rule}.csv")
+    plan_df.to_csv(plan_csv_path, index=False)
+    print(f"Saved repetition plan -> {plan_csv_path}")
+
+    summary = plan_df.groupby("ENGINE").agg(
+        KEYS=("STOP_AT", "size"),
+        REPETITIONS=("REPETITIONS", "sum"),
+        NEEDED=("STOP_AT", "sum"),
+        MEDIAN_STOP_AT=("STOP_AT", "median"),
+        MAX_RELATIVE_ERROR=("RELATIVE_ERROR", "max"),
+    ).reset_index()
+    summary["SAVED_PERCENT"] = (1 - summary["NEEDED"] / summary["REPETITIONS"]) * 100
+    summary_csv_path = os.path.join(result_dir_path, f"repetition_savings_{rule}.csv")
+    summary.to_csv(summary_csv_path, index=False)
+    print(summary)
+    print(f"Saved savings summary -> {summary_csv_path}")
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
+
+    # --- Plot 1: Distribution of the repetitions needed per engine ---
+    engines = sorted(plan_df["ENGINE"].unique())
+    bins = np.arange(0.5, max_repetitions + 1.5)
+    ax1.hist([plan_df.loc[plan_df["ENGINE"] == engine, "STOP_AT"] for engine in engines], bins=bins, label=engines)
+    ax1.axvline(x=max_repetitions, color="red", linestyle="--", label=f"Fixed ({max_repetitions})")
+    ax1.set_xlabel("Repetitions Needed")
+    ax1.set_ylabel("Number of (JSON, Query, Cutoff)")
+    ax1.set_title(f"Repetitions Needed with the '{rule}' Rule")
+    ax1.legend()
+    ax1.grid(True, axis="y", alpha=0.4)
+
+    # --- Plot 2: Error of the early mean against the saved repetitions ---
+    for engine in engines:
+        engine_df = plan_df[plan_df["ENGINE"] == engine]
+        ax2.scatter(engine_df["SAVED_REPETITIONS"], engine_df["RELATIVE_ERROR"] * 100, alpha=0.6, label=engine)
+    ax2.set_xlabel("Saved Repetitions")
+    ax2.set_ylabel("Deviation of the Early Mean from the Full Mean (%)")
+    ax2.set_title("Cost of Stopping Early")
+    ax2.legend()
+    ax2.grid(True, alpha=0.4)
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, f"repetition_plan_{rule}.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+# Run with: python src/speed/plan_repetitions.py
+#
+# Tells per (JSON, ENGINE, CUTOFF, QUERY_ID) after how many repetitions the timing is good enough instead of always
+# running a fixed number.
+#
+# While benchmarking, feed every repetition into a RepetitionPlanner and stop once add(...) returns True:
+#   planner = RepetitionPlanner(rule="ci", relative_width=0.02)
+#   while not planner.add(json_name, "rq-lut", 256, query_id, run_once()):
+#       pass
+#
+# The timing .csv files only hold the mean over all repetitions, so the savings are computed from per repetition
+# samples, one row per repetition:
+#   JSON,ENGINE,CUTOFF,QUERY_ID,REPETITION,QUERY_TIME_SECONDS
+#   bestbuy_large_record_(1GB),rq-lut,256,1,1,0.4441
+#   bestbuy_large_record_(1GB),rq-lut,256,1,2,0.4398
+#   ...
+# (CUTOFF is optional, use -1 for engines without one.)
+#
+# Output in "result_dir_path":
+#   repetition_plan_<rule>.csv      STOP_AT, SAVED_REPETITIONS and the deviation of the early mean per key
+#   repetition_savings_<rule>.csv   repetitions needed and saved per engine
+#   repetition_plan_<rule>.png
+if __name__ == "__main__":
+    # Input (no samples are recorded in res/data yet, point this to a samples .csv in the format above)
+    samples_csv = "res/data/speed/server/samples/query_samples_repetitions=20.csv"
+    result_dir_path = "res/plots/speed/server/repetition_plan"
+
+    plot(samples_csv, result_dir_path, rule="ci")
+    plot(samples_csv, result_dir_path, rule="baseline")
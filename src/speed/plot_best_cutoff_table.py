@@ -1,8 +1,14 @@
 import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
 
+
+@profiled
 def plot_positive_negative(csv_path: str, result_dir: str):
     # Ensure result directory exists
     os.makedirs(result_dir, exist_ok=True)
@@ -39,7 +45,7 @@ def plot_positive_negative(csv_path: str, result_dir: str):
 
     # Save figure to result directory
     output_path = os.path.join(result_dir, "positive_negative_plot.png")
-    plt.savefig(output_path, dpi=300, bbox_inches="tight")
+    save_figure(output_path, dpi=300, bbox_inches="tight")
     print(f"Plot saved to: {output_path}")
 
 
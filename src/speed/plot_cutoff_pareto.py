@@ -0,0 +1,212 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from plot_distance_cutoff_sizes import extract_size
+from plot_lut_strategy_pareto import pareto_mask
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# Objectives that are minimized when looking for the non-dominated cutoffs
+PARETO_OBJECTIVES = ["SIZE_IN_BYTES", "BUILD_TIME_SECONDS", "TOTAL_QUERY_TIME_SECONDS"]
+
+
+def normalize_json_names(df: pd.DataFrame) -> pd.DataFrame:
+    df["JSON"] = df["JSON"].astype(str).str.strip().str.removesuffix(".json")
+    return df
+
+
+def load_builds(distance_cutoff_dir: str) -> pd.DataFrame:
+    """
+    Read distance_cutoff/<cutoff>/build.csv for every numeric cutoff subfolder.
+    """
+    all_data = []
+
+    for entry in os.listdir(distance_cutoff_dir):
+        build_csv_path = os.path.join(distance_cutoff_dir, entry, "build.csv")
+        if not entry.isdigit() or not os.path.exists(build_csv_path):
+            continue
+
+        df = pd.read_csv(build_csv_path)
+        df["CUTOFF"] = int(entry)
+        all_data.append(df[["JSON", "CUTOFF", "BUILD_TIME_SECONDS", "SIZE_IN_BYTES"]])
+
+    if not all_data:
+        return pd.DataFrame(columns=["JSON", "CUTOFF", "BUILD_TIME_SECONDS", "SIZE_IN_BYTES"])
+
+    return normalize_json_names(pd.concat(all_data, ignore_index=True))
+
+
+def load_query_totals(rq_legacy_time: str, rq_lut_time: str) -> pd.DataFrame:
+    """
+    Sum the query times per (JSON, CUTOFF), only over queries that also have a rq-legacy time so the totals can be
+    compared with the baseline.
+    """
+    legacy_df = normalize_json_names(pd.read_csv(rq_legacy_time))
+    lut_df = normalize_json_names(pd.read_csv(rq_lut_time))
+
+    legacy_df["QUERY_ID"] = legacy_df["QUERY_ID"].astype(str)
+    lut_df["QUERY_ID"] = lut_df["QUERY_ID"].astype(str)
+
+    legacy_df["QUERY_TIME_SECONDS"] = pd.to_numeric(legacy_df["QUERY_TIME_SECONDS"], errors="coerce")
+    lut_df["QUERY_TIME_SECONDS"] = pd.to_numeric(lut_df["QUERY_TIME_SECONDS"], errors="coerce")
+    lut_df["CUTOFF"] = pd.to_numeric(lut_df["CUTOFF"], errors="coerce")
+    lut_df = lut_df.dropna(subset=["CUTOFF"])
+    lut_df["CUTOFF"] = lut_df["CUTOFF"].astype(int)
+
+    legacy_df = legacy_df.drop_duplicates(subset=["JSON", "QUERY_ID"])
+    merged = lut_df.merge(
+        legacy_df[["JSON", "QUERY_ID", "QUERY_TIME_SECONDS"]],
+        on=["JSON", "QUERY_ID"],
+        suffixes=("_cutoff", "_baseline")
+    )
+
+    totals = merged.groupby(["JSON", "CUTOFF"]).agg(
+        TOTAL_QUERY_TIME_SECONDS=("QUERY_TIME_SECONDS_cutoff", "sum"),
+        BASELINE_QUERY_TIME_SECONDS=("QUERY_TIME_SECONDS_baseline", "sum"),
+        NUM_QUERIES=("QUERY_ID", "nunique"),
+    ).reset_index()
+    return totals
+
+
+def explore(builds: pd.DataFrame, totals: pd.DataFrame, speedup_fraction: float) -> pd.DataFrame:
+    """
+    Join builds and query totals into one row per (JSON, CUTOFF), mark the non-dominated cutoffs and the smallest LUT
+    that keeps "speedup_fraction" of the best speedup of its JSON.
+    """
+    table = builds.merge(totals, on=["JSON", "CUTOFF"], how="inner")
+    table = table.sort_values(["JSON", "CUTOFF"]).reset_index(drop=True)
+
+    table["SAVED_SECONDS"] = table["BASELINE_QUERY_TIME_SECONDS"] - table["TOTAL_QUERY_TIME_SECONDS"]
+    best_saved = table.groupby("JSON")["SAVED_SECONDS"].transform("max")
+    table["SPEEDUP_KEPT"] = table["SAVED_SECONDS"] / best_saved
+
+    table["PARETO"] = False
+    for _, group in table.groupby("JSON"):
+        table.loc[group.index, "PARETO"] = pareto_mask(group[PARETO_OBJECTIVES].to_numpy())
+
+    table["RECOMMENDED"] = False
+    candidates = table[(table["SPEEDUP_KEPT"] >= speedup_fraction) & (best_saved > 0)]
+    recommended = candidates.sort_values(["SIZE_IN_BYTES", "CUTOFF"]).groupby("JSON").head(1).index
+    table.loc[recommended, "RECOMMENDED"] = True
+
+    return table
+
+
+def summarize_corpus(table: pd.DataFrame, speedup_fraction: float) -> pd.DataFrame:
+    """
+    Sum the three axes over all JSONs. Only cutoffs measured for every JSON are kept, otherwise the sums are not
+    comparable.
+    """
+    num_jsons = table["JSON"].nunique()
+    complete = table.groupby("CUTOFF").filter(lambda group: group["JSON"].nunique() == num_jsons)
+    corpus = complete.groupby("CUTOFF")[[
+        "SIZE_IN_BYTES", "BUILD_TIME_SECONDS", "TOTAL_QUERY_TIME_SECONDS", "BASELINE_QUERY_TIME_SECONDS"
+    ]].sum().reset_index()
+    corpus.insert(0, "JSON", "corpus")
+    return explore(corpus[["JSON", "CUTOFF", "BUILD_TIME_SECONDS", "SIZE_IN_BYTES"]],
+                   corpus[["JSON", "CUTOFF", "TOTAL_QUERY_TIME_SECONDS", "BASELINE_QUERY_TIME_SECONDS"]],
+                   speedup_fraction)
+
+
+def plot_frontier(group: pd.DataFrame, title: str, save_path: str) -> None:
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    size_mb = group["SIZE_IN_BYTES"] / (1024 * 1024)
+    points = ax.scatter(size_mb, group["TOTAL_QUERY_TIME_SECONDS"], c=group["BUILD_TIME_SECONDS"],
+                        cmap="viridis", s=80, zorder=3)
+    fig.colorbar(points, ax=ax, label="Build Time (seconds)")
+
+    front = group[group["PARETO"]].sort_values("SIZE_IN_BYTES")
+    ax.plot(front["SIZE_IN_BYTES"] / (1024 * 1024), front["TOTAL_QUERY_TIME_SECONDS"],
+            color="red", linestyle="--", label="Non-dominated cutoffs", zorder=2)
+
+    recommended = group[group["RECOMMENDED"]]
+    ax.scatter(recommended["SIZE_IN_BYTES"] / (1024 * 1024), recommended["TOTAL_QUERY_TIME_SECONDS"],
+               s=300, facecolors="none", edgecolors="red", linewidths=2, label="Recommended", zorder=4)
+
+    baseline = group["BASELINE_QUERY_TIME_SECONDS"].iloc[0]
+    ax.axhline(y=baseline, color="gray", linestyle=":", label="rq-legacy")
+
+    for _, row in group.iterrows():
+        ax.annotate(str(row["CUTOFF"]), (row["SIZE_IN_BYTES"] / (1024 * 1024), row["TOTAL_QUERY_TIME_SECONDS"]),
+                    fontsize=9, xytext=(5, 5), textcoords="offset points")
+
+    ax.set_xscale("log")
+    ax.set_xlabel("LUT Size (MB)")
+    ax.set_ylabel("Total Query Time (seconds)")
+    ax.set_title(title)
+    ax.grid(True, which="both", alpha=0.4)
+    ax.legend()
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot_all(distance_cutoff_dir: str, rq_legacy_time: str, rq_lut_time: str, speedup_fraction: float,
+             result_dir_path: str) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    builds = load_builds(distance_cutoff_dir)
+    totals = load_query_totals(rq_legacy_time, rq_lut_time)
+    table = explore(builds, totals, speedup_fraction)
+    if table.empty:
+        print("No data available to plot.")
+        return
+
+    table_csv_path = os.path.join(result_dir_path, "cutoff_pareto.csv")
+    table.to_csv(table_csv_path, index=False)
+    print(f"Saved per JSON table -> {table_csv_path}")
+
+    corpus = summarize_corpus(table, speedup_fraction)
+    corpus_csv_path = os.path.join(result_dir_path, "cutoff_pareto_corpus.csv")
+    corpus.to_csv(corpus_csv_path, index=False)
+    print(corpus)
+    print(f"Saved corpus table -> {corpus_csv_path}")
+
+    json_names = sorted(table["JSON"].unique(), key=extract_size)
+    for json_name in json_names:
+        group = table[table["JSON"] == json_name]
+        plot_frontier(group, f"Cutoff trade-off for {json_name}",
+                      os.path.join(result_dir_path, f"{json_name}_pareto.png"))
+
+    if not corpus.empty:
+        plot_frontier(corpus, "Cutoff trade-off for the whole corpus",
+                      os.path.join(result_dir_path, "corpus_pareto.png"))
+
+
+# Run with: python src/speed/plot_cutoff_pareto.py
+#
+# Combines LUT size, LUT build time and total query time per (JSON, cutoff) to find the non-dominated cutoffs.
+#
+# "distance_cutoff_dir" holds one subfolder per cutoff with a build.csv (see plot_distance_cutoff_sizes.py):
+#   JSON,BUILD_TIME_SECONDS,SIZE_IN_BYTES
+#   bestbuy_large_record_(1GB),0.5320961592000001,16103794
+#   ...
+# "rq_legacy_time" and "rq_lut_time" are the same query time .csv files used by find_best_cutoff.py:
+#   JSON,QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS
+#   JSON,CUTOFF,QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS
+#
+# "speedup_fraction" defines the recommended cutoff: the one with the smallest LUT whose saved query time relative to
+# rq-legacy is at least this fraction of the best saved query time of that JSON.
+#
+# Output in "result_dir_path":
+#   cutoff_pareto.csv         one row per (JSON, CUTOFF) with the PARETO and RECOMMENDED flags
+#   cutoff_pareto_corpus.csv  the same over the sum of all JSONs
+#   <JSON>_pareto.png, corpus_pareto.png   size vs. query time, colored by build time
+if __name__ == "__main__":
+    # Input
+    distance_cutoff_dir = "res/data/speed/server/distance_cutoff"
+    rq_legacy_time = "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv"
+    rq_lut_time = "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv"
+    result_dir_path = "res/plots/speed/server/cutoff_pareto"
+    speedup_fraction = 0.95
+
+    plot_all(distance_cutoff_dir, rq_legacy_time, rq_lut_time, speedup_fraction, result_dir_path)
@@ -1,4 +1,5 @@
 import os
+import sys
 import re
 
 import matplotlib.pyplot as plt
@@ -6,6 +7,10 @@ import matplotlib.ticker as mtick
 import pandas as pd
 import seaborn as sns
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
 # Custom color palette
 PLOT_COLORS = [
     'red', 'skyblue', 'blue', 'orange', 'green',
@@ -26,6 +31,7 @@ def extract_size(json_name: str) -> float:
     return size * 1024 if unit == "GB" else size
 
 
+@profiled
 def plot_build(data_dir_path: str, result_dir: str, cutoffs):
     os.makedirs(result_dir, exist_ok=True)
 
@@ -83,7 +89,7 @@ def plot_build(data_dir_path: str, result_dir: str, cutoffs):
     plt.title("Build Time per JSON File by Cutoff")
     plt.tight_layout(rect=[0, 0, 0.85, 1])
     ax.legend(title="Cutoff", bbox_to_anchor=(1.02, 1), loc="upper left", borderaxespad=0)
-    plt.savefig(build_time_png_path)
+    save_figure(build_time_png_path)
     print(f"Generated {build_time_png_path}")
     plt.close()
 
@@ -102,7 +108,7 @@ def plot_build(data_dir_path: str, result_dir: str, cutoffs):
     plt.title("LUT Size in MB per JSON File by Cutoff")
     plt.tight_layout(rect=[0, 0, 0.85, 1])
     ax.legend(title="Cutoff", bbox_to_anchor=(1.02, 1), loc="upper left", borderaxespad=0)
-    plt.savefig(size_png_path)
+    save_figure(size_png_path)
     print(f"Generated {size_png_path}")
     plt.close()
 
@@ -141,7 +147,7 @@ def plot_build(data_dir_path: str, result_dir: str, cutoffs):
     ax2.set_xticklabels(ax2.get_xticklabels(), rotation=45, ha="right")
 
     plt.tight_layout(rect=[0, 0, 0.85, 1])
-    plt.savefig(combined_png_path)
+    save_figure(combined_png_path)
     print(f"Generated {combined_png_path}")
     plt.close()
 
@@ -1,9 +1,18 @@
 import os
-import pandas as pd
+import sys
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 
+from rank_speedups import aggregate
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_cache import load_counter, load_query_times  # noqa: E402
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
 
+
+@profiled
 def plot(
         rq_legacy_time_csv: str,
         rq_legacy_empty_list_opt_off_time_csv: str,
@@ -11,52 +20,189 @@ def plot(
         result_dir: str,
         second_label_name: str
 ):
-    legacy_data = pd.read_csv(rq_legacy_time_csv)
-    legacy_data_2 = pd.read_csv(rq_legacy_empty_list_opt_off_time_csv)
-
-    # Convert QUERY_ID to string type
-    legacy_data['QUERY_ID'] = legacy_data['QUERY_ID'].astype(str)
-    legacy_data_2['QUERY_ID'] = legacy_data_2['QUERY_ID'].astype(str)
+    # QUERY_ID as string, cached across the plot functions of one run
+    legacy_data = load_query_times(rq_legacy_time_csv)
+    legacy_data_2 = load_query_times(rq_legacy_empty_list_opt_off_time_csv)
 
-    # Ensure result directories exist
+    # Ensure result directory exists
     os.makedirs(result_dir, exist_ok=True)
-    short_dir = os.path.join(result_dir, "short")
-    os.makedirs(short_dir, exist_ok=True)
 
     # Plot for each JSON file
     for json_name, group in legacy_data.groupby('JSON'):
-        fig, ax = plt.subplots(2, 1, figsize=(10, 12))  # 2 rows, 1 column
-
         # Load corresponding group from legacy_data_2
         group_2 = legacy_data_2[legacy_data_2['JSON'] == json_name]
 
-        # --- Plot 2: Skip Percentages ---
         counter_file = os.path.join(counter_folder, f"{json_name}.csv")
-        if os.path.exists(counter_file):
-            counter_data = pd.read_csv(counter_file)
-            counter_data['QUERY_ID'] = counter_data['QUERY_ID'].astype(str)
-            counter_data_sorted = counter_data.sort_values(by='SKIP_PERCENTAGE', ascending=True)
+        counter_data_sorted = load_counter(counter_file) if os.path.exists(counter_file) else None
+        if counter_data_sorted is not None:
             sorted_query_ids = counter_data_sorted['QUERY_ID'].values
-
-            ax[1].bar(counter_data_sorted['QUERY_ID'], counter_data_sorted['SKIP_PERCENTAGE'])
-            ax[1].set_title(f'Skip Percentage per Query ID for {json_name}')
-            ax[1].set_xlabel('Query ID')
-            ax[1].set_ylabel('Skip Percentage')
-            ax[1].tick_params(axis='x', rotation=45)
-            ax[1].grid(True)
         else:
             sorted_query_ids = group['QUERY_ID'].unique()
 
-        # --- Plot 1: Query Times ---
-        group_sorted = group.drop_duplicates(subset=['QUERY_ID']).set_index('QUERY_ID').reindex(sorted_query_ids).reset_index()
-        group_2_sorted = group_2.drop_duplicates(subset=['QUERY_ID']).set_index('QUERY_ID').reindex(sorted_query_ids).reset_index()
+        group_sorted = group.drop_duplicates(subset=['QUERY_ID']).set_index('QUERY_ID').reindex(sorted_query_ids)
+        group_2_sorted = group_2.drop_duplicates(subset=['QUERY_ID']).set_index('QUERY_ID').reindex(sorted_query_ids)
+        _plot_pair(json_name, group_sorted['QUERY_TIME_SECONDS'], group_2_sorted['QUERY_TIME_SECONDS'],
+                   counter_data_sorted, result_dir, second_label_name)
+
+
+def _plot_pair(json_name: str, legacy_times: pd.Series, other_times: pd.Series, counter_data_sorted, result_dir: str,
+               second_label_name: str):
+    """
+    The combined (query times + skip percentages) and the short (query times only) figure of rq-legacy against one
+    other configuration for one JSON. Both time series are indexed by QUERY_ID in plot order.
+    """
+    short_dir = os.path.join(result_dir, "short")
+    os.makedirs(short_dir, exist_ok=True)
+
+    fig, ax = plt.subplots(2, 1, figsize=(10, 12))  # 2 rows, 1 column
+
+    # --- Plot 2: Skip Percentages ---
+    if counter_data_sorted is not None:
+        ax[1].bar(counter_data_sorted['QUERY_ID'], counter_data_sorted['SKIP_PERCENTAGE'])
+        ax[1].set_title(f'Skip Percentage per Query ID for {json_name}')
+        ax[1].set_xlabel('Query ID')
+        ax[1].set_ylabel('Skip Percentage')
+        ax[1].tick_params(axis='x', rotation=45)
+        ax[1].grid(True)
+
+    # --- Plot 1: Query Times ---
+    ax[0].plot(legacy_times.index, legacy_times.values,
+               marker='o', linestyle=':', color='red', label='rq-legacy')
+
+    ax[0].plot(other_times.index, other_times.values,
+               marker='o', linestyle=':', color='blue', label=second_label_name)
+
+    ax[0].set_title(f'Query Time Comparison for {json_name}')
+    ax[0].set_xlabel('QUERY_ID')
+    ax[0].set_ylabel('Query Time (Seconds)')
+    ax[0].tick_params(axis='x', rotation=45)
+    ax[0].grid(True)
+    ax[0].legend()
+
+    # --- Save the combined figure ---
+    plt.tight_layout()
+    plot_filename = os.path.join(result_dir, f"{json_name}_combined_plot.png")
+    save_figure(plot_filename)
+    print(f"Generated: {plot_filename}")
+    plt.close(fig)
+
+    # --- Save only Plot 1 (short version) ---
+    fig_short, ax_short = plt.subplots(figsize=(10, 6))
+
+    ax_short.plot(legacy_times.index, legacy_times.values,
+                  marker='o', linestyle=':', color='red', label='rq-legacy')
+    ax_short.plot(other_times.index, other_times.values,
+                  marker='o', linestyle=':', color='blue', label=second_label_name)
+
+    ax_short.set_title(f'Query Time Comparison for {json_name}')
+    ax_short.set_xlabel('QUERY_ID')
+    ax_short.set_ylabel('Query Time (Seconds)')
+    ax_short.tick_params(axis='x', rotation=45)
+    ax_short.grid(True)
+    ax_short.legend()
+
+    plt.tight_layout()
+    short_filename = os.path.join(short_dir, f"{json_name}_short_plot.png")
+    save_figure(short_filename)
+    print(f"Generated: {short_filename}")
+    plt.close(fig_short)
+
+
+VARIANT_COLORS = ['blue', 'darkorange', 'seagreen', 'purple', 'saddlebrown', 'teal', 'olive', 'magenta']
+
+
+def align_variants(rq_legacy_time_csv: str, variant_csvs: dict, baseline_label: str) -> pd.DataFrame:
+    """
+    One row per (JSON, QUERY_ID) and one column per variant (the baseline first). "variant_csvs" maps a label to a
+    query time .csv, or to (.csv, cutoff) for files with a CUTOFF column.
+    """
+    frames = [load_query_times(rq_legacy_time_csv).assign(VARIANT=baseline_label)]
+    for label, source in variant_csvs.items():
+        csv_path, cutoff = source if isinstance(source, tuple) else (source, None)
+        variant_df = load_query_times(csv_path)
+        if cutoff is not None:
+            variant_df = variant_df[pd.to_numeric(variant_df['CUTOFF'], errors='coerce') == cutoff]
+        frames.append(variant_df.assign(VARIANT=label))
+
+    all_times = pd.concat(frames, ignore_index=True)
+    all_times['JSON'] = all_times['JSON'].astype(str).str.strip()
+    all_times['QUERY_TIME_SECONDS'] = pd.to_numeric(all_times['QUERY_TIME_SECONDS'], errors='coerce')
+    all_times = all_times.drop_duplicates(subset=['JSON', 'QUERY_ID', 'VARIANT'])
+
+    times = all_times.pivot(index=['JSON', 'QUERY_ID'], columns='VARIANT', values='QUERY_TIME_SECONDS')
+    return times.reindex(columns=[baseline_label] + list(variant_csvs))
 
-        ax[0].plot(group_sorted['QUERY_ID'], group_sorted['QUERY_TIME_SECONDS'],
-                   marker='o', linestyle=':', color='red', label='rq-legacy')
 
-        ax[0].plot(group_2_sorted['QUERY_ID'], group_2_sorted['QUERY_TIME_SECONDS'],
-                   marker='o', linestyle=':', color='blue', label=second_label_name)
+def summarize_speedups(times: pd.DataFrame, baseline_label: str) -> pd.DataFrame:
+    """
+    Speedup (baseline time / variant time) per variant, per JSON and over all JSONs ("ALL"), summarized with
+    rank_speedups.aggregate.
+    """
+    variants = [column for column in times.columns if column != baseline_label]
+    speedups = times[variants].rdiv(times[baseline_label], axis=0)
+    long = speedups.stack().rename('SPEEDUP').reset_index()
+    long = long[np.isfinite(long['SPEEDUP']) & (long['SPEEDUP'] > 0)]
+    long = pd.concat([long, long.assign(JSON='ALL')], ignore_index=True)
+    long['LOG_SPEEDUP'] = np.log(long['SPEEDUP'])
+    return aggregate(long, ['VARIANT', 'JSON'])
 
+
+@profiled
+def plot_variants(
+        rq_legacy_time_csv: str,
+        variant_csvs: dict,
+        counter_folder: str,
+        result_dir: str,
+        baseline_label: str = 'rq-legacy',
+        pairwise_dirs: dict = None
+):
+    """
+    Compare any number of engine variants with rq-legacy in one pass: the times of all variants and their time
+    relative to rq-legacy per JSON, plus a summary table of the speedups. "pairwise_dirs" maps a variant label to a
+    folder that also gets the two-line figures of plot(...) for that variant, drawn from the same aligned times.
+    """
+    os.makedirs(result_dir, exist_ok=True)
+    pairwise_dirs = pairwise_dirs or {}
+
+    times = align_variants(rq_legacy_time_csv, variant_csvs, baseline_label)
+    relative = times.div(times[baseline_label], axis=0)
+
+    summary = summarize_speedups(times, baseline_label)
+    summary_file = os.path.join(result_dir, 'variant_speedups.csv')
+    summary.to_csv(summary_file, index=False)
+    print(summary[summary['JSON'] == 'ALL'])
+    print(f"Saved speedup summary -> {summary_file}")
+
+    colors = {baseline_label: 'red'}
+    colors.update({label: VARIANT_COLORS[i % len(VARIANT_COLORS)] for i, label in enumerate(variant_csvs)})
+
+    for json_name, json_times in times.groupby(level='JSON'):
+        json_times = json_times.droplevel('JSON')
+        json_relative = relative.loc[json_name]
+
+        fig, ax = plt.subplots(3, 1, figsize=(10, 16))
+
+        # --- Plot 3: Skip Percentages ---
+        counter_file = os.path.join(counter_folder, f"{json_name}.csv")
+        counter_data_sorted = load_counter(counter_file) if os.path.exists(counter_file) else None
+        if counter_data_sorted is not None:
+            sorted_query_ids = counter_data_sorted['QUERY_ID'].values
+
+            ax[2].bar(counter_data_sorted['QUERY_ID'], counter_data_sorted['SKIP_PERCENTAGE'])
+            ax[2].set_title(f'Skip Percentage per Query ID for {json_name}')
+            ax[2].set_xlabel('Query ID')
+            ax[2].set_ylabel('Skip Percentage')
+            ax[2].tick_params(axis='x', rotation=45)
+            ax[2].grid(True)
+        else:
+            sorted_query_ids = json_times.index.values
+        json_times = json_times.reindex(sorted_query_ids)
+        json_relative = json_relative.reindex(sorted_query_ids)
+
+        # --- Plot 1: Query Times of all variants ---
+        for label in json_times.columns:
+            ax[0].plot(json_times.index, json_times[label], marker='o', linestyle=':', color=colors[label],
+                       label=label)
         ax[0].set_title(f'Query Time Comparison for {json_name}')
         ax[0].set_xlabel('QUERY_ID')
         ax[0].set_ylabel('Query Time (Seconds)')
@@ -64,33 +210,27 @@ def plot(
         ax[0].grid(True)
         ax[0].legend()
 
-        # --- Save the combined figure ---
+        # --- Plot 2: Time relative to the baseline ---
+        ax[1].axhline(y=1, color=colors[baseline_label], linestyle='--', label=baseline_label)
+        for label in variant_csvs:
+            ax[1].plot(json_relative.index, json_relative[label], marker='o', linestyle=':', color=colors[label],
+                       label=label)
+        ax[1].set_title(f'Query Time relative to {baseline_label} for {json_name} (below 1 = faster)')
+        ax[1].set_xlabel('QUERY_ID')
+        ax[1].set_ylabel(f'Query Time / {baseline_label}')
+        ax[1].tick_params(axis='x', rotation=45)
+        ax[1].grid(True)
+        ax[1].legend()
+
         plt.tight_layout()
-        plot_filename = os.path.join(result_dir, f"{json_name}_combined_plot.png")
-        plt.savefig(plot_filename)
+        plot_filename = os.path.join(result_dir, f"{json_name}_variants.png")
+        save_figure(plot_filename)
         print(f"Generated: {plot_filename}")
         plt.close(fig)
 
-        # --- Save only Plot 1 (short version) ---
-        fig_short, ax_short = plt.subplots(figsize=(10, 6))
+        for label, pair_dir in pairwise_dirs.items():
+            _plot_pair(json_name, json_times[baseline_label], json_times[label], counter_data_sorted, pair_dir, label)
 
-        ax_short.plot(group_sorted['QUERY_ID'], group_sorted['QUERY_TIME_SECONDS'],
-                      marker='o', linestyle=':', color='red', label='rq-legacy')
-        ax_short.plot(group_2_sorted['QUERY_ID'], group_2_sorted['QUERY_TIME_SECONDS'],
-                      marker='o', linestyle=':', color='blue', label=second_label_name)
-
-        ax_short.set_title(f'Query Time Comparison for {json_name}')
-        ax_short.set_xlabel('QUERY_ID')
-        ax_short.set_ylabel('Query Time (Seconds)')
-        ax_short.tick_params(axis='x', rotation=45)
-        ax_short.grid(True)
-        ax_short.legend()
-
-        plt.tight_layout()
-        short_filename = os.path.join(short_dir, f"{json_name}_short_plot.png")
-        plt.savefig(short_filename)
-        print(f"Generated: {short_filename}")
-        plt.close(fig_short)
 
 # Run with: python src/speed/plot_empty_list_opt.py
 #
@@ -140,19 +280,34 @@ def plot(
 # This allows direct comparison of rq-legacy vs. another configuration
 # (e.g., empty-list optimization off, LUT disabled, etc.) in terms of
 # query time and skip behavior.
+#
+# plot_variants(...) compares any number of configurations in one pass:
+#   - variant_csvs:
+#       Maps a legend label to a query time CSV of the same format, or to
+#       (CSV, cutoff) for CSV files with a CUTOFF column (e.g. rq-lut).
+#
+#   - pairwise_dirs:
+#       Maps a variant label to a folder for the <JSON>_combined_plot.png (and
+#       short/) figures of plot(...), written in the same pass.
+#
+#   For each JSON one PNG file <JSON>_variants.png with the query times of all
+#   variants, their query time relative to rq-legacy and the skip percentages,
+#   plus variant_speedups.csv with the speedup over rq-legacy per variant and
+#   JSON ("ALL" = over all JSONs):
+#       VARIANT,JSON,QUERIES,GEOMEAN_SPEEDUP,MIN_SPEEDUP,FASTER_SHARE,P10_SPEEDUP,P50_SPEEDUP,P90_SPEEDUP
 if __name__ == "__main__":
     # INPUT
     rq_legacy_time_csv = "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv"
-    rq_legacy_empty_list_opt_off_time_csv = "res/data/speed/server/rq_legacy_empty_list_opt_off/rq_legacy_empty_list_opt_off_time_repetitions=20.csv"
-    result_dir = "res/plots/speed/server/empty_list_opt"
+    variant_csvs = {
+        "rq_legacy_empty_list_off": "res/data/speed/server/rq_legacy_empty_list_opt_off/rq_legacy_empty_list_opt_off_time_repetitions=20.csv",
+        "rq_lut_no_lut": "res/data/speed/server/rq_lut_no_lut/query_count/rq_lut_no_lut_time_repetitions=20.csv",
+    }
     counter_folder = "res/data/analysis/query"
+    # The pairwise figures of plot(...) for the README, drawn in the same pass
+    pairwise_dirs = {
+        "rq_legacy_empty_list_off": "res/plots/speed/server/empty_list_opt",
+        "rq_lut_no_lut": "res/plots/speed/server/rq_lut_no_lut",
+    }
 
-    print("Processing: rq_legacy_empty_list_opt_off")
-    plot(rq_legacy_time_csv, rq_legacy_empty_list_opt_off_time_csv, counter_folder, result_dir, "rq_legacy_empty_list_off")
-
-    # INPUT
-    rq_lut_no_lut_time_csv = "res/data/speed/server/rq_lut_no_lut/query_count/rq_lut_no_lut_time_repetitions=20.csv"
-    result_dir = "res/plots/speed/server/rq_lut_no_lut"
-
-    print("Processing: rq_lut_no_lut")
-    plot(rq_legacy_time_csv, rq_lut_no_lut_time_csv, counter_folder, result_dir, "rq_lut_no_lut")
+    plot_variants(rq_legacy_time_csv, variant_csvs, counter_folder, "res/plots/speed/server/variants",
+                  pairwise_dirs=pairwise_dirs)
@@ -1,10 +1,19 @@
 import os
+import sys
 
 import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 
+from latency_percentiles import compute_percentiles
+from plan_repetitions import load_samples
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+
+@profiled
 def construct_input_csvs(
         serde_build_csv_path: str,
         rq_lut_build_csv_path: str,
@@ -92,6 +101,7 @@ def construct_input_csvs(
     print("Generated build.csv and query.csv ✅")
 
 
+@profiled
 def plot(input_dir_path: str, result_dir_path: str, omit_labels: bool = False):
     os.makedirs(result_dir_path, exist_ok=True)
 
@@ -163,12 +173,86 @@ def plot(input_dir_path: str, result_dir_path: str, omit_labels: bool = False):
             plt.grid(True)
             plt.tight_layout()
             save_path = f'{result_dir_path}/{json_file}_query_{query_id}.png'
-            plt.savefig(save_path)
+            save_figure(save_path)
             print(f"Generated: {save_path}")
             plt.close()
 
     print("Done generating plots!")
 
+
+def algorithm_name(engine: str, cutoff: int) -> str:
+    """
+    ALGORITHM of build.csv / query.csv for an ENGINE and CUTOFF of the per repetition samples.
+    """
+    if engine.lower() == "serde":
+        return "SERDE"
+    return engine if cutoff < 0 else f"{engine}-cutoff-{cutoff}"
+
+
+@profiled
+def plot_percentiles(samples_csv: str, input_dir_path: str, result_dir_path: str, cutoffs, omit_labels: bool = False):
+    """
+    Tail variant of plot(): per JSON and query a box plot of the repetitions per algorithm, next to the cumulative time
+    with the P50 per repetition as line and the P99 per repetition as upper edge of the band.
+    """
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    samples = load_samples(samples_csv)
+    samples = samples[(samples["CUTOFF"] < 0) | samples["CUTOFF"].astype(str).isin(cutoffs)]
+    samples["ALGORITHM"] = [algorithm_name(engine, cutoff)
+                            for engine, cutoff in zip(samples["ENGINE"], samples["CUTOFF"])]
+    percentiles = compute_percentiles(samples)
+    percentiles["ALGORITHM"] = [algorithm_name(engine, cutoff)
+                                for engine, cutoff in zip(percentiles["ENGINE"], percentiles["CUTOFF"])]
+
+    build_df = pd.read_csv(f"{input_dir_path}/build.csv")
+    build_times = build_df.groupby(["JSON", "ALGORITHM"])["BUILD_TIME_SECONDS"].mean()
+
+    x = np.arange(0, 100)
+    for (json_file, query_id), query_samples in samples.groupby(["JSON", "QUERY_ID"]):
+        query_percentiles = percentiles[(percentiles["JSON"] == json_file) & (percentiles["QUERY_ID"] == query_id)]
+        algorithms = list(query_percentiles["ALGORITHM"])
+
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 8))
+
+        # --- Plot 1: Repetitions per algorithm ---
+        ax1.boxplot([query_samples.loc[query_samples["ALGORITHM"] == algorithm, "QUERY_TIME_SECONDS"]
+                     for algorithm in algorithms], whis=(1, 99))
+        ax1.set_xticks(range(1, len(algorithms) + 1), algorithms if not omit_labels else [""] * len(algorithms),
+                       rotation=20)
+        ax1.grid(True, axis="y")
+
+        # --- Plot 2: Cumulative time, P50 line and P99 band ---
+        for i, row in enumerate(query_percentiles.itertuples(index=False)):
+            color = f"C{i}"
+            build_time = build_times.get((json_file, row.ALGORITHM), 0.0)
+            ax2.plot(x, build_time + row.P50_SECONDS * x, color=color, label=row.ALGORITHM)
+            ax2.fill_between(x, build_time + row.P50_SECONDS * x, build_time + row.P99_SECONDS * x, color=color,
+                             alpha=0.2)
+        ax2.set_xlim(0, 100)
+        ax2.set_ylim(bottom=0)
+        ax2.grid(True)
+
+        if not omit_labels:
+            query_text = query_samples["QUERY_TEXT"].iloc[0] if "QUERY_TEXT" in query_samples else ""
+            fig.suptitle(f"{json_file}\nQ:{query_id}= {query_text}", fontsize=20)
+            ax1.set_ylabel("Query Time per Repetition (s), whiskers P1 - P99", fontsize=14)
+            ax2.set_xlabel("Repetitions", fontsize=16)
+            ax2.set_ylabel("Cumulative Time (s), band up to P99", fontsize=16)
+            ax2.legend(fontsize=14)
+        else:
+            ax1.set_yticks([])
+            ax2.set_xticks([])
+            ax2.set_yticks([])
+
+        plt.tight_layout()
+        save_path = f"{result_dir_path}/{json_file}_query_{query_id}_percentiles.png"
+        save_figure(save_path)
+        print(f"Generated: {save_path}")
+        plt.close(fig)
+
+    print("Done generating percentile plots!")
+
 # Run with: python src/speed/plot_final.py
 #
 # Entry point for generating build/query CSVs and plots.
@@ -217,6 +301,9 @@ def plot(input_dir_path: str, result_dir_path: str, omit_labels: bool = False):
 #   Which cutoff values to keep from the RQ-LUT CSVs, e.g. ["0", "1024"].
 # output_dir : str
 #   Directory where build.csv, query.csv, and plots will be written.
+#
+# plot_percentiles(...) draws the tail variant from per repetition samples (see latency_percentiles.py, ENGINE serde,
+# rq-legacy and rq-lut with CUTOFF) and the build.csv written above; latency_percentiles.py runs it.
 if __name__ == "__main__":
     # Input
     serde_build_csv_path = "res/data/speed/server/serde/serde_build_repetitions=3.csv"
@@ -2,8 +2,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
 
+
+@profiled
 def plot(build_csv: str, output_dir: str = "plots"):
     # Read data
     build_df = pd.read_csv(build_csv)
@@ -73,7 +79,7 @@ def plot(build_csv: str, output_dir: str = "plots"):
             "(", "").replace(")", "").replace("/", "_")
         filepath = os.path.join(output_dir, f"{safe_name}.png")
         print(f"Saved to {filepath}")
-        plt.savefig(filepath, dpi=150)
+        save_figure(filepath, dpi=150)
         plt.close(fig)
 
 
@@ -1,8 +1,13 @@
 import os
+import sys
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
 # Colors for the lines in the line plots
 PLOT_COLORS = [
     'red', 'skyblue', 'blue', 'orange', 'green',
@@ -22,6 +27,7 @@ def to_pretty_name(column_name: str, column_suffix: str) -> str:
     return res
 
 
+@profiled
 def plot_all(file_path: str, result_dir_path: str) -> None:
     os.makedirs(result_dir_path, exist_ok=True)
 
@@ -124,7 +130,7 @@ def plot_all(file_path: str, result_dir_path: str) -> None:
 
     plt.subplots_adjust(right=0.75)
     save_path = os.path.join(result_dir_path, f"{file_base_name}_plot.png")
-    plt.savefig(save_path)
+    save_figure(save_path)
     print(f"Generated: {save_path}")
 
 
@@ -0,0 +1,249 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_lut_construction import PLOT_COLORS
+from plot_lut_strategy_pareto import load_runs, to_candidates
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+METRICS = ["BUILD", "QUERY", "HEAP"]
+
+AXIS_LABELS = {
+    "BUILD": "Build time in seconds",
+    "QUERY": "Sum of query time in seconds",
+    "HEAP": "Heap size in bytes",
+}
+
+# Two-sided 95% band under a normal approximation of the prediction error
+Z_95 = 1.96
+
+GB = 1024 ** 3
+
+
+def _design_matrix(num_keys: np.ndarray, model: str) -> np.ndarray:
+    num_keys = np.asarray(num_keys, dtype=float)
+    if model == "linear":
+        feature = num_keys
+    elif model == "nlogn":
+        feature = num_keys * np.log2(np.maximum(num_keys, 2))
+    else:
+        raise ValueError(f"Unknown model: {model}")
+    return np.column_stack([feature, np.ones_like(feature)])
+
+
+def fit_model(num_keys: np.ndarray, values: np.ndarray, model: str):
+    """
+    Ordinary least squares fit of "values" against num_keys with the given model ("linear": a * n + b,
+    "nlogn": a * n * log2(n) + b). Returns None if there are not enough points to fit two parameters.
+    """
+    X = _design_matrix(num_keys, model)
+    y = np.asarray(values, dtype=float)
+    if len(y) < 2:
+        return None
+
+    coefficients, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+    if rank < 2:
+        return None
+
+    residuals = y - X @ coefficients
+    ss_res = float(residuals @ residuals)
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    degrees_of_freedom = max(len(y) - 2, 1)
+
+    return {
+        "MODEL": model,
+        "SLOPE": coefficients[0],
+        "INTERCEPT": coefficients[1],
+        "R2": 1 - ss_res / ss_tot if ss_tot > 0 else 1.0,
+        "RESIDUAL_STD": np.sqrt(ss_res / degrees_of_freedom),
+        "NUM_POINTS": len(y),
+        # Kept for the prediction intervals
+        "XTX_INV": np.linalg.pinv(X.T @ X),
+    }
+
+
+def predict(fit: dict, num_keys: np.ndarray):
+    """
+    Return the prediction and the half width of the 95% prediction band for the given num_keys.
+    """
+    X = _design_matrix(num_keys, fit["MODEL"])
+    prediction = X @ np.array([fit["SLOPE"], fit["INTERCEPT"]])
+    leverage = np.einsum("ij,jk,ik->i", X, fit["XTX_INV"], X)
+    half_width = Z_95 * fit["RESIDUAL_STD"] * np.sqrt(1 + leverage)
+    return prediction, half_width
+
+
+def fit_keys_per_byte(candidates: pd.DataFrame) -> float:
+    """
+    Least squares slope through the origin of num_keys against input_size_bytes over all measured datasets. Used to
+    translate target input sizes into expected key counts.
+    """
+    datasets = candidates.drop_duplicates(subset=["DATASET"])
+    sizes = datasets["INPUT_SIZE_BYTES"].to_numpy(dtype=float)
+    keys = datasets["NUM_KEYS"].to_numpy(dtype=float)
+    return float(sizes @ keys / (sizes @ sizes))
+
+
+def fit_all(candidates: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fit every (VARIANT, METRIC) with the linear and the n log n model. The same variant measured in several runs is
+    pooled into one fit, that is what gives us the widest range of input sizes.
+    """
+    fits = []
+    for variant, group in candidates.groupby("VARIANT"):
+        for metric in METRICS:
+            for model in ["linear", "nlogn"]:
+                fit = fit_model(group["NUM_KEYS"].to_numpy(), group[metric].to_numpy(), model)
+                if fit is None:
+                    continue
+                fit["VARIANT"] = variant
+                fit["METRIC"] = metric
+                fits.append(fit)
+
+    if not fits:
+        return pd.DataFrame()
+
+    fits_df = pd.DataFrame(fits)
+    # Prefer the model with the better goodness of fit per (VARIANT, METRIC)
+    fits_df["BEST"] = fits_df["R2"] == fits_df.groupby(["VARIANT", "METRIC"])["R2"].transform("max")
+    fits_df["BEST"] &= ~fits_df.duplicated(subset=["VARIANT", "METRIC", "BEST"])
+    return fits_df
+
+
+def extrapolate(fits_df: pd.DataFrame, keys_per_byte: float, target_sizes_bytes, ram_budget_bytes: float):
+    target_sizes_bytes = np.asarray(target_sizes_bytes, dtype=float)
+    target_keys = target_sizes_bytes * keys_per_byte
+
+    predictions = []
+    for _, fit in fits_df[fits_df["BEST"]].iterrows():
+        prediction, half_width = predict(fit, target_keys)
+        predictions.append(pd.DataFrame({
+            "VARIANT": fit["VARIANT"],
+            "METRIC": fit["METRIC"],
+            "MODEL": fit["MODEL"],
+            "TARGET_SIZE_BYTES": target_sizes_bytes,
+            "TARGET_NUM_KEYS": target_keys,
+            "PREDICTION": prediction,
+            "LOWER": prediction - half_width,
+            "UPPER": prediction + half_width,
+        }))
+
+    if not predictions:
+        return pd.DataFrame()
+
+    predictions_df = pd.concat(predictions, ignore_index=True)
+    # Only decided for the heap rows, and only if even the upper end of the band stays below the budget
+    heap = predictions_df["METRIC"] == "HEAP"
+    predictions_df["FITS_IN_RAM"] = (predictions_df["UPPER"] <= ram_budget_bytes).where(heap)
+    return predictions_df
+
+
+def plot_predictions(candidates: pd.DataFrame, fits_df: pd.DataFrame, keys_per_byte: float, target_sizes_bytes,
+                     ram_budget_bytes: float, result_dir_path: str) -> None:
+    max_size = max(max(target_sizes_bytes), candidates["INPUT_SIZE_BYTES"].max())
+    min_size = candidates["INPUT_SIZE_BYTES"].min()
+    sizes = np.geomspace(min_size, max_size, 200)
+    best_fits = fits_df[fits_df["BEST"]]
+
+    fig, axes = plt.subplots(len(METRICS), 1, figsize=(14, 18))
+
+    for ax, metric in zip(axes, METRICS):
+        for i, (variant, group) in enumerate(candidates.groupby("VARIANT")):
+            color = PLOT_COLORS[i % len(PLOT_COLORS)]
+            fit = best_fits[(best_fits["VARIANT"] == variant) & (best_fits["METRIC"] == metric)]
+
+            ax.scatter(group["INPUT_SIZE_BYTES"] / GB, group[metric], color=color, marker="o")
+            if fit.empty:
+                continue
+
+            fit = fit.iloc[0]
+            prediction, half_width = predict(fit, sizes * keys_per_byte)
+            ax.plot(sizes / GB, prediction, color=color, alpha=0.8,
+                    label=f"{variant} ({fit['MODEL']}, R²={fit['R2']:.3f})")
+            ax.fill_between(sizes / GB, np.maximum(prediction - half_width, 0), prediction + half_width,
+                            color=color, alpha=0.15)
+
+        for target in target_sizes_bytes:
+            ax.axvline(x=target / GB, color="gray", linestyle="--", linewidth=1)
+
+        if metric == "HEAP":
+            ax.axhline(y=ram_budget_bytes, color="red", linestyle="--", linewidth=2, label="RAM budget")
+
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("Input size in GB", fontweight="bold")
+        ax.set_ylabel(AXIS_LABELS[metric], fontweight="bold")
+        ax.grid(True, which="both", alpha=0.4)
+        ax.legend(fontsize=8, loc="upper left")
+
+    axes[0].set_title("Extrapolated LUT build time, query time and heap (95% prediction bands)", fontweight="bold")
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, "lut_scaling.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot_all(lut_construction_dir: str, result_dir_path: str, target_sizes_bytes, ram_budget_bytes: float) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    tidy_df = load_runs(lut_construction_dir)
+    if tidy_df.empty:
+        print("No data available to plot.")
+        return
+
+    candidates = to_candidates(tidy_df)
+    keys_per_byte = fit_keys_per_byte(candidates)
+    print(f"Keys per input byte: {keys_per_byte:.6f}")
+
+    fits_df = fit_all(candidates)
+    if fits_df.empty:
+        print("Not enough data points to fit any strategy.")
+        return
+
+    fits_csv_path = os.path.join(result_dir_path, "fits.csv")
+    fits_df.drop(columns="XTX_INV").to_csv(fits_csv_path, index=False)
+    print(f"Saved fits -> {fits_csv_path}")
+
+    predictions_df = extrapolate(fits_df, keys_per_byte, target_sizes_bytes, ram_budget_bytes)
+    predictions_csv_path = os.path.join(result_dir_path, "predictions.csv")
+    predictions_df.to_csv(predictions_csv_path, index=False)
+    print(predictions_df[predictions_df["METRIC"] == "HEAP"])
+    print(f"Saved predictions -> {predictions_csv_path}")
+
+    plot_predictions(candidates, fits_df, keys_per_byte, target_sizes_bytes, ram_budget_bytes, result_dir_path)
+
+
+# Run with: python src/speed/plot_lut_scaling.py
+#
+# Fits BUILD, QUERY and HEAP of every LUT strategy against num_keys and extrapolates them to input sizes far beyond
+# the measured 100 MB, 1 GB and 25 GB runs.
+#
+# "lut_construction_dir" is the same folder as for plot_lut_strategy_pareto.py: one subfolder per run holding a
+# result.csv with the structure expected by plot_lut_construction.py.
+#
+# Per strategy and metric a linear (a * n + b) and an n log n (a * n * log2(n) + b) model are fitted, the one with the
+# higher R² is used for the predictions. Target input sizes are translated into key counts with the keys per byte
+# ratio of all measured datasets. The bands are 95% prediction intervals of the least squares fit (normal
+# approximation), so with only a few measured points they are rather optimistic.
+#
+# Output in "result_dir_path":
+#   fits.csv         slope, intercept, R² and residual std per (VARIANT, METRIC, MODEL), BEST marks the chosen model
+#   predictions.csv  prediction and band per (VARIANT, METRIC, TARGET_SIZE_BYTES), FITS_IN_RAM for the heap rows
+#   lut_scaling.png  measured points, fitted curves and bands over the input size
+if __name__ == "__main__":
+    # Input
+    lut_construction_dir = "res/data/speed/server/lut_construction"
+    result_dir_path = "res/plots/speed/server/lut_scaling"
+    target_sizes_bytes = [100 * GB, 1024 * GB]
+    ram_budget_bytes = 256 * GB
+
+    plot_all(lut_construction_dir, result_dir_path, target_sizes_bytes, ram_budget_bytes)
@@ -0,0 +1,254 @@
+import os
+import sys
+import re
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# Matches the strategy columns of a lut_construction result.csv, e.g.
+#   "hash_map_double_BUILD"  or  "#2048_λ=5:phf_group_HEAP"
+STRATEGY_COLUMN_PATTERN = re.compile(
+    r"^(?:#(?P<buckets>\d+)_λ=(?P<lambda>[\d.]+):)?(?P<strategy>.+)_(?P<metric>BUILD|QUERY|HEAP)$"
+)
+
+# Objectives that are minimized when looking for the Pareto front (all values are per key)
+PARETO_OBJECTIVES = ["BUILD_PER_KEY", "QUERY_PER_KEY", "HEAP_PER_KEY"]
+
+TIDY_COLUMNS = [
+    "RUN", "DATASET", "INPUT_SIZE_BYTES", "NUM_KEYS", "VARIANT", "STRATEGY", "BUCKETS", "LAMBDA", "METRIC", "VALUE",
+]
+
+AXIS_LABELS = {
+    "BUILD_PER_KEY": "Build time in seconds per key",
+    "QUERY_PER_KEY": "Query time in seconds per key",
+    "HEAP_PER_KEY": "Heap size in bytes per key",
+}
+
+
+def parse_strategy_column(column_name: str):
+    """
+    Split a strategy column name into its parts. Returns None for columns that are no strategy columns
+    (name, input_size_bytes, num_keys, ...).
+    """
+    match = STRATEGY_COLUMN_PATTERN.match(column_name)
+    if not match:
+        return None
+
+    buckets = match.group("buckets")
+    lambda_value = match.group("lambda")
+    return {
+        "VARIANT": column_name.removesuffix(f"_{match.group('metric')}"),
+        "STRATEGY": match.group("strategy"),
+        "BUCKETS": int(buckets) if buckets is not None else np.nan,
+        "LAMBDA": float(lambda_value) if lambda_value is not None else np.nan,
+        "METRIC": match.group("metric"),
+    }
+
+
+def load_runs(lut_construction_dir: str) -> pd.DataFrame:
+    """
+    Read the result.csv of every run directory below lut_construction_dir into one tidy DataFrame with the columns
+    RUN, DATASET, INPUT_SIZE_BYTES, NUM_KEYS, VARIANT, STRATEGY, BUCKETS, LAMBDA, METRIC, VALUE.
+    """
+    all_data = []
+
+    for run in sorted(os.listdir(lut_construction_dir)):
+        result_csv_path = os.path.join(lut_construction_dir, run, "result.csv")
+        if not os.path.exists(result_csv_path):
+            print(f"Warning: {result_csv_path} not found, skipping...")
+            continue
+
+        df = pd.read_csv(result_csv_path)
+        # The rows end with a trailing comma which results in an unnamed empty column
+        df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
+
+        strategy_columns = [col for col in df.columns if parse_strategy_column(col) is not None]
+        tidy = df.melt(
+            id_vars=["name", "input_size_bytes", "num_keys"],
+            value_vars=strategy_columns,
+            var_name="COLUMN",
+            value_name="VALUE",
+        )
+        parsed = pd.DataFrame([parse_strategy_column(col) for col in strategy_columns], index=strategy_columns)
+        tidy = tidy.join(parsed, on="COLUMN").drop(columns="COLUMN")
+        tidy = tidy.rename(columns={
+            "name": "DATASET",
+            "input_size_bytes": "INPUT_SIZE_BYTES",
+            "num_keys": "NUM_KEYS",
+        })
+        tidy.insert(0, "RUN", run)
+        all_data.append(tidy[TIDY_COLUMNS])
+
+    if not all_data:
+        return pd.DataFrame(columns=TIDY_COLUMNS)
+
+    tidy_df = pd.concat(all_data, ignore_index=True)
+    tidy_df["DATASET"] = tidy_df["DATASET"].astype(str).str.strip()
+    tidy_df["VALUE"] = pd.to_numeric(tidy_df["VALUE"], errors="coerce")
+    return tidy_df
+
+
+def to_candidates(tidy_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivot the tidy records into one row per (RUN, DATASET, VARIANT) with BUILD, QUERY and HEAP next to each other and
+    add the per key values. The same variant measured in two runs is treated as two different candidates.
+    """
+    id_columns = ["RUN", "DATASET", "INPUT_SIZE_BYTES", "NUM_KEYS", "VARIANT", "STRATEGY", "BUCKETS", "LAMBDA"]
+    candidates = tidy_df.pivot_table(
+        index=id_columns, columns="METRIC", values="VALUE", aggfunc="mean", dropna=False
+    ).reset_index()
+    candidates.columns.name = None
+    candidates = candidates.dropna(subset=["BUILD", "QUERY", "HEAP"])
+
+    candidates["CANDIDATE"] = candidates["RUN"] + ": " + candidates["VARIANT"]
+    for metric in ["BUILD", "QUERY", "HEAP"]:
+        candidates[f"{metric}_PER_KEY"] = candidates[metric] / candidates["NUM_KEYS"]
+
+    return candidates.reset_index(drop=True)
+
+
+def pareto_mask(values: np.ndarray) -> np.ndarray:
+    """
+    Return a boolean mask marking the rows of "values" (n points x m objectives, smaller is better) that are not
+    dominated by any other row.
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+
+    # dominated_by[i, j] is True if row j dominates row i
+    less_equal = (values[np.newaxis, :, :] <= values[:, np.newaxis, :]).all(axis=2)
+    strictly_less = (values[np.newaxis, :, :] < values[:, np.newaxis, :]).any(axis=2)
+    dominated_by = less_equal & strictly_less
+    return ~dominated_by.any(axis=1)
+
+
+def compute_pareto_per_dataset(candidates: pd.DataFrame, objectives=None) -> pd.DataFrame:
+    objectives = objectives or PARETO_OBJECTIVES
+
+    result = candidates.copy()
+    result["PARETO"] = False
+    for _, group in result.groupby("DATASET"):
+        result.loc[group.index, "PARETO"] = pareto_mask(group[objectives].to_numpy())
+    return result
+
+
+def summarize_fleet(candidates: pd.DataFrame, objectives=None) -> pd.DataFrame:
+    """
+    Rank the candidates over all datasets. Every objective is normalized to the best value measured on the same
+    dataset, so large and small datasets weigh the same. The per-candidate ratios are aggregated with the geometric
+    mean and a fleet-wide Pareto front is computed on top of them.
+    """
+    objectives = objectives or PARETO_OBJECTIVES
+
+    normalized = candidates.copy()
+    for objective in objectives:
+        best = normalized.groupby("DATASET")[objective].transform("min")
+        normalized[f"{objective}_RATIO"] = normalized[objective] / best
+
+    ratio_columns = [f"{objective}_RATIO" for objective in objectives]
+    log_ratios = np.log(normalized[ratio_columns])
+    summary = log_ratios.groupby(normalized["VARIANT"])[ratio_columns].mean().apply(np.exp)
+    summary["NUM_DATASETS"] = normalized.groupby("VARIANT")["DATASET"].nunique()
+    summary["NUM_PARETO"] = normalized[normalized["PARETO"]].groupby("VARIANT")["DATASET"].nunique()
+    summary["NUM_PARETO"] = summary["NUM_PARETO"].fillna(0).astype(int)
+    summary = summary.reset_index()
+
+    summary["FLEET_PARETO"] = pareto_mask(summary[ratio_columns].to_numpy())
+    summary = summary.sort_values(
+        by=["FLEET_PARETO", "NUM_PARETO", "NUM_DATASETS"],
+        ascending=[False, False, False]
+    )
+    return summary
+
+
+def plot_fronts(candidates: pd.DataFrame, result_dir_path: str) -> None:
+    projections = [
+        ("BUILD_PER_KEY", "QUERY_PER_KEY"),
+        ("BUILD_PER_KEY", "HEAP_PER_KEY"),
+        ("QUERY_PER_KEY", "HEAP_PER_KEY"),
+    ]
+
+    for dataset, group in candidates.groupby("DATASET"):
+        fig, axes = plt.subplots(1, 3, figsize=(20, 6))
+        front = group[group["PARETO"]]
+        dominated = group[~group["PARETO"]]
+
+        for ax, (x_column, y_column) in zip(axes, projections):
+            ax.scatter(dominated[x_column], dominated[y_column], color="lightgray", label="Dominated")
+            ax.scatter(front[x_column], front[y_column], color="red", label="Pareto-optimal")
+            for _, row in front.iterrows():
+                ax.annotate(row["CANDIDATE"], (row[x_column], row[y_column]),
+                            fontsize=8, xytext=(4, 4), textcoords="offset points")
+
+            ax.set_xlabel(AXIS_LABELS[x_column])
+            ax.set_ylabel(AXIS_LABELS[y_column])
+            ax.grid(True)
+
+        axes[0].legend()
+        fig.suptitle(f"LUT strategies for {dataset} (num_keys = {group['NUM_KEYS'].iloc[0]})", fontweight="bold")
+
+        plt.tight_layout()
+        save_path = os.path.join(result_dir_path, f"{dataset}_pareto.png")
+        save_figure(save_path)
+        print(f"Generated: {save_path}")
+        plt.close(fig)
+
+
+@profiled
+def plot_all(lut_construction_dir: str, result_dir_path: str) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    tidy_df = load_runs(lut_construction_dir)
+    if tidy_df.empty:
+        print("No data available to plot.")
+        return
+
+    tidy_csv_path = os.path.join(result_dir_path, "strategies_tidy.csv")
+    tidy_df.to_csv(tidy_csv_path, index=False)
+    print(f"Saved tidy records -> {tidy_csv_path}")
+
+    candidates = compute_pareto_per_dataset(to_candidates(tidy_df))
+    candidates_csv_path = os.path.join(result_dir_path, "strategies_pareto.csv")
+    candidates.to_csv(candidates_csv_path, index=False)
+    print(f"Saved per dataset Pareto fronts -> {candidates_csv_path}")
+
+    summary = summarize_fleet(candidates)
+    summary_csv_path = os.path.join(result_dir_path, "fleet_summary.csv")
+    summary.to_csv(summary_csv_path, index=False)
+    print(summary)
+    print(f"Saved fleet summary -> {summary_csv_path}")
+
+    plot_fronts(candidates, result_dir_path)
+
+
+# Run with: python src/speed/plot_lut_strategy_pareto.py
+#
+# Compares the LUT implementations of all lut_construction runs at once instead of one result.csv at a time (see
+# plot_lut_construction.py).
+#
+# "lut_construction_dir" is the folder holding one subfolder per run ("100 MB naive", "1 GB group", ...). Every run
+# folder contains a result.csv with the same structure as expected by plot_lut_construction.py:
+#   name,input_size_bytes,num_keys,hash_map_double_BUILD,hash_map_double_QUERY,hash_map_double_HEAP,#2048_λ=1:phf_group_BUILD,...
+#   bestbuy_large_record_(1GB),1044619305,6799457,0.7701935596666667,0.611544818,142606436,0.9796494743333334,...
+#   ...
+#
+# The strategy columns are parsed into (RUN, DATASET, STRATEGY, BUCKETS, LAMBDA, METRIC) records. Per dataset the
+# Pareto-optimal strategies regarding build time, query time and heap bytes (all per key) are computed. A fleet
+# summary normalizes every value to the best one of its dataset and aggregates them with the geometric mean.
+#
+# Output in "result_dir_path":
+#   strategies_tidy.csv     all parsed records
+#   strategies_pareto.csv   one row per (RUN, DATASET, VARIANT) with the PARETO flag
+#   fleet_summary.csv       per variant ratios to the best strategy, NUM_PARETO and the fleet-wide FLEET_PARETO flag
+#   <DATASET>_pareto.png    the three 2D projections of the Pareto front per dataset
+if __name__ == "__main__":
+    # Input
+    lut_construction_dir = "res/data/speed/server/lut_construction"
+    result_dir_path = "res/plots/speed/server/lut_strategy_pareto"
+
+    plot_all(lut_construction_dir, result_dir_path)
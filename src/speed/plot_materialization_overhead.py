@@ -0,0 +1,206 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_query_feature_attribution import load_counters
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+KEY_COLUMNS = ["JSON", "ENGINE", "CUTOFF", "QUERY_ID"]
+
+PLOT_COLORS = ["royalblue", "darkorange", "seagreen", "crimson", "purple", "saddlebrown"]
+
+# Node time spent above this share in materializing the results counts as output bound
+OUTPUT_BOUND_SHARE = 0.5
+
+
+def _load(csv_path: str, engine: str, column: str, scale: float, name: str) -> pd.DataFrame:
+    df = pd.read_csv(csv_path)
+    if column not in df.columns:
+        raise ValueError(f"{csv_path} has no {column} column")
+    df["JSON"] = df["JSON"].astype(str).str.strip()
+    df["QUERY_ID"] = df["QUERY_ID"].astype(str)
+    df["ENGINE"] = engine
+    if "CUTOFF" not in df.columns:
+        df["CUTOFF"] = -1
+    df["CUTOFF"] = pd.to_numeric(df["CUTOFF"], errors="coerce").fillna(-1).astype(int)
+    df[name] = pd.to_numeric(df[column], errors="coerce") / scale
+    return df.dropna(subset=[name]).groupby(KEY_COLUMNS, as_index=False)[name].mean()
+
+
+def load_times(csv_path: str, engine: str) -> pd.DataFrame:
+    """
+    Query times (QUERY_TIME_SECONDS) of one engine, with CUTOFF=-1 for engines without a cutoff. Skip time files are
+    rejected, the time spent skipping is no query time.
+    """
+    return _load(csv_path, engine, "QUERY_TIME_SECONDS", 1, "TIME_SECONDS")
+
+
+def load_skip_times(csv_path: str, engine: str) -> pd.DataFrame:
+    """
+    SKIP_TIME_NANO_SECONDS of the instrumented build in seconds, the mean over duplicated rows.
+    """
+    return _load(csv_path, engine, "SKIP_TIME_NANO_SECONDS", 1e9, "SKIP_SECONDS")
+
+
+def join_modes(engine_csvs: dict, counter_folder: str, skip_csvs: dict = None) -> pd.DataFrame:
+    """
+    One row per (JSON, ENGINE, CUTOFF, QUERY_ID) with the COUNT and NODE time, the materialization overhead
+    (NODE - COUNT) absolute, as share of the NODE time and per returned result. "skip_csvs" maps an engine to the skip
+    times of its NODE run, reported separately as SKIP_SHARE_OF_NODE (skipping is not output handling).
+    """
+    count_df = pd.concat([load_times(count_csv, engine) for engine, (count_csv, _) in engine_csvs.items()],
+                         ignore_index=True)
+    node_df = pd.concat([load_times(node_csv, engine) for engine, (_, node_csv) in engine_csvs.items()],
+                        ignore_index=True)
+    table = count_df.merge(node_df, on=KEY_COLUMNS, suffixes=("_COUNT", "_NODE"))
+    table = table.rename(columns={"TIME_SECONDS_COUNT": "COUNT_TIME_SECONDS", "TIME_SECONDS_NODE": "NODE_TIME_SECONDS"})
+
+    counters = load_counters(counter_folder, table["JSON"].unique())
+    table = table.merge(counters[["JSON", "QUERY_ID", "COUNT_RESULT"]], on=["JSON", "QUERY_ID"], how="left")
+    table["COUNT_RESULT"] = pd.to_numeric(table["COUNT_RESULT"], errors="coerce")
+
+    table["OVERHEAD_SECONDS"] = table["NODE_TIME_SECONDS"] - table["COUNT_TIME_SECONDS"]
+    table["OVERHEAD_SHARE"] = table["OVERHEAD_SECONDS"] / table["NODE_TIME_SECONDS"]
+    table["OVERHEAD_PER_RESULT_NANOS"] = table["OVERHEAD_SECONDS"] * 1e9 / table["COUNT_RESULT"].where(
+        table["COUNT_RESULT"] > 0)
+    table["OUTPUT_BOUND"] = table["OVERHEAD_SHARE"] > OUTPUT_BOUND_SHARE
+
+    if skip_csvs:
+        skip_df = pd.concat([load_skip_times(skip_csv, engine) for engine, skip_csv in skip_csvs.items()],
+                            ignore_index=True)
+        table = table.merge(skip_df, on=KEY_COLUMNS, how="left")
+        table["SKIP_SHARE_OF_NODE"] = table["SKIP_SECONDS"] / table["NODE_TIME_SECONDS"]
+    return table.sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+
+def fit_per_result_cost(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Least squares fit OVERHEAD_SECONDS = FIXED_SECONDS + NANOS_PER_RESULT * COUNT_RESULT / 1e9 per engine, i.e. the
+    marginal cost of materializing one more result.
+    """
+    rows = []
+    for engine, engine_df in table.dropna(subset=["COUNT_RESULT", "OVERHEAD_SECONDS"]).groupby("ENGINE"):
+        row = {"ENGINE": engine, "NUM_QUERIES": len(engine_df),
+               "OUTPUT_BOUND_QUERIES": int(engine_df["OUTPUT_BOUND"].sum()),
+               "MEDIAN_OVERHEAD_SHARE": engine_df["OVERHEAD_SHARE"].median()}
+        if engine_df["COUNT_RESULT"].nunique() >= 2:
+            slope, intercept = np.polyfit(engine_df["COUNT_RESULT"], engine_df["OVERHEAD_SECONDS"], 1)
+            predicted = intercept + slope * engine_df["COUNT_RESULT"]
+            residual = ((engine_df["OVERHEAD_SECONDS"] - predicted) ** 2).sum()
+            total = ((engine_df["OVERHEAD_SECONDS"] - engine_df["OVERHEAD_SECONDS"].mean()) ** 2).sum()
+            row.update({"FIXED_SECONDS": intercept, "NANOS_PER_RESULT": slope * 1e9,
+                        "R2": 1 - residual / total if total > 0 else np.nan})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def plot_overhead(table: pd.DataFrame, fits: pd.DataFrame, save_path: str) -> None:
+    data = table.dropna(subset=["COUNT_RESULT"])
+    data = data[data["COUNT_RESULT"] > 0]
+    fits = fits.set_index("ENGINE")
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 7))
+    for i, (engine, engine_df) in enumerate(data.groupby("ENGINE")):
+        color = PLOT_COLORS[i % len(PLOT_COLORS)]
+
+        # --- Plot 1: Absolute overhead over the result cardinality ---
+        ax1.scatter(engine_df["COUNT_RESULT"], engine_df["OVERHEAD_SECONDS"], color=color, alpha=0.6, label=engine)
+        if engine in fits.index and pd.notna(fits.loc[engine].get("NANOS_PER_RESULT", np.nan)):
+            x = np.geomspace(engine_df["COUNT_RESULT"].min(), engine_df["COUNT_RESULT"].max(), 100)
+            fit = fits.loc[engine]
+            ax1.plot(x, fit["FIXED_SECONDS"] + fit["NANOS_PER_RESULT"] * x / 1e9, color=color, linestyle="--",
+                     label=f"{engine}: {fit['NANOS_PER_RESULT']:.1f} ns/result")
+
+        # --- Plot 2: Share of the NODE time spent on materialization ---
+        ax2.scatter(engine_df["COUNT_RESULT"], engine_df["OVERHEAD_SHARE"] * 100, color=color, alpha=0.6,
+                    label=engine)
+        if "SKIP_SHARE_OF_NODE" in engine_df.columns and engine_df["SKIP_SHARE_OF_NODE"].notna().any():
+            ax2.scatter(engine_df["COUNT_RESULT"], engine_df["SKIP_SHARE_OF_NODE"] * 100, facecolors="none",
+                        edgecolors=color, label=f"{engine} skip share")
+
+    ax1.set_xscale("log")
+    ax1.axhline(y=0, color="black", linewidth=0.8)
+    ax1.set_xlabel("Result Cardinality (COUNT_RESULT)")
+    ax1.set_ylabel("NODE - COUNT Query Time (seconds)")
+    ax1.set_title("Materialization Overhead")
+    ax1.legend(fontsize=8)
+    ax1.grid(True, alpha=0.4)
+
+    ax2.set_xscale("log")
+    ax2.axhline(y=OUTPUT_BOUND_SHARE * 100, color="red", linestyle=":", label="Output bound")
+    ax2.set_xlabel("Result Cardinality (COUNT_RESULT)")
+    ax2.set_ylabel("Share of the NODE Time (%)")
+    ax2.set_title("Where the NODE Time Goes")
+    ax2.legend(fontsize=8)
+    ax2.grid(True, alpha=0.4)
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot(engine_csvs: dict, counter_folder: str, result_dir_path: str, skip_csvs: dict = None) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    table = join_modes(engine_csvs, counter_folder, skip_csvs)
+    table_csv_path = os.path.join(result_dir_path, "materialization_overhead.csv")
+    table.to_csv(table_csv_path, index=False)
+    print(f"Saved overhead per query -> {table_csv_path}")
+
+    fits = fit_per_result_cost(table)
+    fits_csv_path = os.path.join(result_dir_path, "materialization_cost_per_result.csv")
+    fits.to_csv(fits_csv_path, index=False)
+    print(fits)
+    print(f"Saved per-result cost -> {fits_csv_path}")
+
+    output_bound = table[table["OUTPUT_BOUND"]].sort_values("OVERHEAD_SECONDS", ascending=False)
+    print(f"{len(output_bound)} of {len(table)} (JSON, engine, cutoff, query) spend more than "
+          f"{OUTPUT_BOUND_SHARE:.0%} of the NODE time on materialization")
+
+    plot_overhead(table, fits, os.path.join(result_dir_path, "materialization_overhead.png"))
+
+
+# Run with: python src/speed/plot_materialization_overhead.py
+#
+# Puts the COUNT and NODE runs of every engine side by side. Both modes do the same skipping, so the difference
+# NODE - COUNT is the cost of materializing the results.
+#
+# "engine_csvs" maps an engine name to its (query_count, query_node) time .csv files with the usual structure
+#   JSON,[CUTOFF,]QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS,REPETITIONS
+# "counter_folder" holds one <JSON>.csv per JSON with the COUNT_RESULT per query (see plot_optimal.py).
+# Skip time files (SKIP_TIME_NANO_SECONDS) are no query times and are rejected in "engine_csvs"; pass the skip times of
+# a NODE run in "skip_csvs" to plot their share of the NODE time next to the materialization share (hollow markers).
+# rq_lut_no_lut/query_node only holds skip times, so rq-lut-no-lut has no COUNT/NODE pair.
+#
+# Output in "result_dir_path":
+#   materialization_overhead.csv          COUNT/NODE time, overhead absolute, as share and per result per query
+#                                         (SKIP_SECONDS and SKIP_SHARE_OF_NODE with "skip_csvs")
+#   materialization_cost_per_result.csv   fixed and per-result overhead per engine, number of output bound queries
+#   materialization_overhead.png
+if __name__ == "__main__":
+    # Input
+    engine_csvs = {
+        "rq-legacy": (
+            "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv",
+            "res/data/speed/server/rq_legacy/query_node/rq_legacy_time_node_repetitions=20.csv",
+        ),
+        "rq-lut": (
+            "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv",
+            "res/data/speed/server/rq_lut/query_node/rq_lut_time_node_repetitions=20.csv",
+        ),
+    }
+    skip_csvs = {
+        "rq-legacy": "res/data/speed/server/rq_legacy_skip_time/query_node/rq_legacy_skip_time_node_repetitions=20.csv",
+    }
+    counter_folder = "res/data/analysis/query"
+    result_dir_path = "res/plots/speed/server/materialization_overhead"
+
+    plot(engine_csvs, counter_folder, result_dir_path, skip_csvs)
@@ -0,0 +1,224 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_distance_cutoff_sizes import PLOT_COLORS, extract_size
+from plot_lut_strategy_pareto import load_runs
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+GB = 1024 ** 3
+
+# Streaming rq does not build anything, its heap is treated as zero
+STREAMING_ENGINE = "rq-legacy"
+
+
+def fit_heap_per_byte(input_bytes: np.ndarray, heap_bytes: np.ndarray):
+    """
+    Least squares slope through the origin of heap_bytes against input_bytes, plus the largest observed ratio as a
+    conservative alternative.
+    """
+    input_bytes = np.asarray(input_bytes, dtype=float)
+    heap_bytes = np.asarray(heap_bytes, dtype=float)
+    return {
+        "HEAP_PER_BYTE": float(input_bytes @ heap_bytes / (input_bytes @ input_bytes)),
+        "HEAP_PER_BYTE_MAX": float((heap_bytes / input_bytes).max()),
+        "NUM_POINTS": len(input_bytes),
+        "MAX_MEASURED_BYTES": float(input_bytes.max()),
+    }
+
+
+def load_json_sizes(bracket_distribution_csv: str) -> dict:
+    if bracket_distribution_csv is None or not os.path.exists(bracket_distribution_csv):
+        return {}
+    df = pd.read_csv(bracket_distribution_csv)
+    return dict(zip(df["JSON"].astype(str).str.strip(), df["SIZE_BYTES"]))
+
+
+def json_size_bytes(json_name: str, json_sizes: dict) -> float:
+    """
+    Exact size from the bracket distribution if known, otherwise the size written in the name, e.g. "(1.1GB)".
+    """
+    if json_name in json_sizes:
+        return float(json_sizes[json_name])
+    return extract_size(json_name) * 1024 * 1024
+
+
+def collect_measurements(
+        serde_btree_csv: str,
+        serde_indexmap_csv: str,
+        lut_build_csv: str,
+        lut_construction_dir: str,
+        bracket_distribution_csv: str,
+) -> pd.DataFrame:
+    """
+    Bring all heap measurements into one table with the columns ENGINE, JSON, INPUT_BYTES, HEAP_BYTES.
+    """
+    all_data = []
+
+    for engine, csv_path in [("serde BTree", serde_btree_csv), ("serde IndexMap", serde_indexmap_csv)]:
+        df = pd.read_csv(csv_path)
+        all_data.append(pd.DataFrame({
+            "ENGINE": engine,
+            "JSON": df["NAME"].astype(str).str.removesuffix(".json"),
+            "INPUT_BYTES": df["ORIGINAL_BYTES"],
+            "HEAP_BYTES": df["HEAP_BYTES"],
+        }))
+
+    json_sizes = load_json_sizes(bracket_distribution_csv)
+    lut_df = pd.read_csv(lut_build_csv)
+    lut_df["JSON"] = lut_df["JSON"].astype(str).str.strip()
+    all_data.append(pd.DataFrame({
+        "ENGINE": "rq-lut-cutoff-" + lut_df["CUTOFF"].astype(str),
+        "JSON": lut_df["JSON"],
+        "INPUT_BYTES": lut_df["JSON"].apply(json_size_bytes, json_sizes=json_sizes),
+        "HEAP_BYTES": lut_df["SIZE_IN_BYTES"],
+    }))
+
+    if lut_construction_dir is not None:
+        tidy_df = load_runs(lut_construction_dir)
+        heap_df = tidy_df[tidy_df["METRIC"] == "HEAP"]
+        all_data.append(pd.DataFrame({
+            "ENGINE": "lut " + heap_df["VARIANT"],
+            "JSON": heap_df["DATASET"],
+            "INPUT_BYTES": heap_df["INPUT_SIZE_BYTES"],
+            "HEAP_BYTES": heap_df["VALUE"],
+        }))
+
+    measurements = pd.concat(all_data, ignore_index=True)
+    measurements["INPUT_BYTES"] = pd.to_numeric(measurements["INPUT_BYTES"], errors="coerce")
+    measurements["HEAP_BYTES"] = pd.to_numeric(measurements["HEAP_BYTES"], errors="coerce")
+    measurements = measurements.dropna(subset=["INPUT_BYTES", "HEAP_BYTES"])
+    return measurements[np.isfinite(measurements["INPUT_BYTES"]) & (measurements["INPUT_BYTES"] > 0)]
+
+
+def fit_memory_model(measurements: pd.DataFrame) -> pd.DataFrame:
+    fits = []
+    for engine, group in measurements.groupby("ENGINE"):
+        fit = fit_heap_per_byte(group["INPUT_BYTES"], group["HEAP_BYTES"])
+        fit["ENGINE"] = engine
+        fits.append(fit)
+
+    fits.append({
+        "ENGINE": STREAMING_ENGINE, "HEAP_PER_BYTE": 0.0, "HEAP_PER_BYTE_MAX": 0.0,
+        "NUM_POINTS": 0, "MAX_MEASURED_BYTES": np.nan,
+    })
+    return pd.DataFrame(fits)[["ENGINE", "HEAP_PER_BYTE", "HEAP_PER_BYTE_MAX", "NUM_POINTS", "MAX_MEASURED_BYTES"]]
+
+
+def predict_peak_bytes(model: pd.DataFrame, document_bytes, input_resident: bool, conservative: bool) -> pd.DataFrame:
+    """
+    Peak memory per engine and document size. With "input_resident" the document itself is counted as well (one byte
+    per input byte), with "conservative" the largest observed heap ratio is used instead of the fitted one.
+    """
+    ratio_column = "HEAP_PER_BYTE_MAX" if conservative else "HEAP_PER_BYTE"
+    bytes_per_input_byte = model[ratio_column].to_numpy() + (1.0 if input_resident else 0.0)
+    document_bytes = np.asarray(document_bytes, dtype=float)
+
+    peak = bytes_per_input_byte[:, np.newaxis] * document_bytes[np.newaxis, :]
+    return pd.DataFrame(peak, index=model["ENGINE"], columns=document_bytes)
+
+
+def max_document_bytes(model: pd.DataFrame, ram_budget_bytes: float, input_resident: bool,
+                       conservative: bool) -> pd.Series:
+    ratio_column = "HEAP_PER_BYTE_MAX" if conservative else "HEAP_PER_BYTE"
+    bytes_per_input_byte = model[ratio_column] + (1.0 if input_resident else 0.0)
+    max_bytes = ram_budget_bytes / bytes_per_input_byte.replace(0, np.nan)
+    return pd.Series(max_bytes.fillna(np.inf).to_numpy(), index=model["ENGINE"], name="MAX_DOCUMENT_BYTES")
+
+
+@profiled
+def plot(
+        serde_btree_csv: str,
+        serde_indexmap_csv: str,
+        lut_build_csv: str,
+        lut_construction_dir: str,
+        bracket_distribution_csv: str,
+        ram_budget_bytes: float,
+        result_dir_path: str,
+        input_resident: bool = True,
+        conservative: bool = False,
+):
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    measurements = collect_measurements(serde_btree_csv, serde_indexmap_csv, lut_build_csv, lut_construction_dir,
+                                        bracket_distribution_csv)
+    model = fit_memory_model(measurements)
+    max_bytes = max_document_bytes(model, ram_budget_bytes, input_resident, conservative)
+    model["MAX_DOCUMENT_BYTES"] = max_bytes.to_numpy()
+    model = model.sort_values("MAX_DOCUMENT_BYTES", ascending=False)
+
+    model_csv_path = os.path.join(result_dir_path, "memory_model.csv")
+    model.to_csv(model_csv_path, index=False)
+    print(model)
+    print(f"Saved memory model -> {model_csv_path}")
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 14))
+
+    # --- Plot 1: Predicted peak memory over the document size ---
+    document_bytes = np.geomspace(100 * 1024 * 1024, 10 * 1024 * GB, 200)
+    peaks = predict_peak_bytes(model, document_bytes, input_resident, conservative)
+    for i, (engine, peak) in enumerate(peaks.iterrows()):
+        ax1.plot(document_bytes / GB, peak.to_numpy() / GB, color=PLOT_COLORS[i % len(PLOT_COLORS)], label=engine)
+
+    ax1.axhline(y=ram_budget_bytes / GB, color="red", linestyle="--", linewidth=2, label="RAM budget")
+    ax1.set_xscale("log")
+    ax1.set_yscale("log")
+    ax1.set_xlabel("Document Size (GB)")
+    ax1.set_ylabel("Predicted Peak Memory (GB)")
+    ax1.set_title("Predicted Peak Memory per Engine" + (" (document resident)" if input_resident else ""))
+    ax1.grid(True, which="both", alpha=0.4)
+    ax1.legend(fontsize=8, bbox_to_anchor=(1.02, 1), loc="upper left")
+
+    # --- Plot 2: Largest document under the budget ---
+    finite = model[np.isfinite(model["MAX_DOCUMENT_BYTES"])]
+    ax2.barh(finite["ENGINE"], finite["MAX_DOCUMENT_BYTES"] / GB, color="mediumpurple")
+    for engine, value in zip(finite["ENGINE"], finite["MAX_DOCUMENT_BYTES"]):
+        ax2.text(value / GB, engine, f" {value / GB:.1f} GB", va="center", fontsize=9)
+    ax2.set_xscale("log")
+    ax2.set_xlabel("Largest Document (GB)")
+    ax2.set_title(f"Largest Document per Engine under a RAM Budget of {ram_budget_bytes / GB:.0f} GB")
+    ax2.grid(True, axis="x", which="both", alpha=0.4)
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, "memory_model.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+# Run with: python src/speed/plot_memory_model.py
+#
+# Fits heap bytes per input byte for every engine and predicts the peak memory for any document size:
+#   - serde BTree / serde IndexMap from the .csv files of plot_serde_size_and_build_time.py:
+#       NAME,ORIGINAL_BYTES,PARSE_TIME_SEC,HEAP_BYTES
+#       google_map_short_(107MB).json,106896877,2.590639,739103679
+#   - rq-lut at every cutoff from the SIZE_IN_BYTES of the lut_build_speed_and_size .csv:
+#       JSON,CUTOFF,BUILD_TIME_SECONDS,COLLECTION_TIME_SECONDS,SIZE_IN_BYTES,REPETITIONS
+#     The input size is taken from "bracket_distribution_csv" (JSON,SIZE_BYTES,...) or parsed from the JSON name.
+#   - every LUT strategy of "lut_construction_dir" from its _HEAP columns (set to None to leave them out)
+#   - streaming rq-legacy with a heap of zero
+#
+# "input_resident" counts the document itself on top of the heap, "conservative" uses the largest measured ratio
+# instead of the fitted one.
+#
+# Output in "result_dir_path":
+#   memory_model.csv  HEAP_PER_BYTE, HEAP_PER_BYTE_MAX and MAX_DOCUMENT_BYTES under the budget per engine
+#   memory_model.png  predicted peak memory over the document size and the largest document per engine
+if __name__ == "__main__":
+    # Input
+    serde_btree_csv = "res/data/analysis/serde_size_and_build_time/MB_100_btree.csv"
+    serde_indexmap_csv = "res/data/analysis/serde_size_and_build_time/MB_100_indexmap.csv"
+    lut_build_csv = "res/data/speed/server/lut_build_speed_and_size/build_repetitions=20.csv"
+    lut_construction_dir = "res/data/speed/server/lut_construction"
+    bracket_distribution_csv = "res/data/analysis/bracket_distribution/bracket_distribution.csv"
+    result_dir_path = "res/plots/speed/server/memory_model"
+    ram_budget_bytes = 256 * GB
+
+    plot(serde_btree_csv, serde_indexmap_csv, lut_build_csv, lut_construction_dir, bracket_distribution_csv,
+         ram_budget_bytes, result_dir_path)
@@ -1,9 +1,18 @@
 import os
+import sys
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from latency_percentiles import load_percentiles
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_cache import load_counter, load_optimal_times, load_query_times  # noqa: E402
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+
+@profiled
 def plot(
         rq_legacy_skip_time: str,
         rq_legacy_time_csv: str,
@@ -12,27 +21,11 @@ def plot(
         cutoffs: list,
         result_dir: str,
 ):
-    legacy_skip_data = pd.read_csv(rq_legacy_skip_time)
-    legacy_data = pd.read_csv(rq_legacy_time_csv)
-    lut_data = pd.read_csv(rq_lut_time_csv)
-
-    # Convert QUERY_ID to string type to treat as categorical data
-    legacy_data['QUERY_ID'] = legacy_data['QUERY_ID'].astype(str)
-    legacy_skip_data['QUERY_ID'] = legacy_skip_data['QUERY_ID'].astype(str)
-    lut_data['QUERY_ID'] = lut_data['QUERY_ID'].astype(str)
+    # Legacy times merged with the skip times (OPTIMAL_TIME), cached across the plot functions of one run
+    merged_data = load_optimal_times(rq_legacy_time_csv, rq_legacy_skip_time)
+    lut_data = load_query_times(rq_lut_time_csv)
     lut_data['QUERY_TIME_SECONDS'] = pd.to_numeric(lut_data['QUERY_TIME_SECONDS'], errors='coerce')
 
-    # Merge the two dataframes on JSON and QUERY_ID to calculate the optimal time
-    merged_data = pd.merge(
-        legacy_data,
-        legacy_skip_data[['JSON', 'QUERY_ID', 'SKIP_TIME_NANO_SECONDS']],
-        on=['JSON', 'QUERY_ID'],
-        how='left'
-    )
-
-    # Calculate the optimal query time (OPTIMAL_TIME)
-    merged_data['OPTIMAL_TIME'] = merged_data['QUERY_TIME_SECONDS'] - (merged_data['SKIP_TIME_NANO_SECONDS'] / 1e9)
-
     # Ensure the result directory exists
     os.makedirs(result_dir, exist_ok=True)
 
@@ -48,9 +41,7 @@ def plot(
         counter_file = os.path.join(counter_folder, f"{json_name}.csv")
 
         if os.path.exists(counter_file):
-            counter_data = pd.read_csv(counter_file)
-            counter_data['QUERY_ID'] = counter_data['QUERY_ID'].astype(str)
-            counter_data_sorted = counter_data.sort_values(by='SKIP_PERCENTAGE', ascending=True)
+            counter_data_sorted = load_counter(counter_file)
 
             ax[1].bar(counter_data_sorted['QUERY_ID'], counter_data_sorted['SKIP_PERCENTAGE'])
             sorted_query_ids = counter_data_sorted['QUERY_ID'].values
@@ -104,7 +95,7 @@ def plot(
 
         plt.tight_layout()
         plot_filename = os.path.join(result_dir, f"{json_name}_count.png")
-        plt.savefig(plot_filename)
+        save_figure(plot_filename)
         print(f"Generated: {plot_filename}")
 
         # --- Save "short" version with only top plot ---
@@ -140,7 +131,7 @@ def plot(
 
         plt.tight_layout()
         short_filename = os.path.join(short_dir, f"{json_name}_count_short.png")
-        plt.savefig(short_filename)
+        save_figure(short_filename)
         print(f"Generated short plot: {short_filename}")
         plt.close(fig_short)
 
@@ -148,6 +139,69 @@ def plot(
         plt.close(fig)
 
 
+@profiled
+def plot_percentiles(
+        samples_csv: str,
+        counter_folder: str,
+        cutoffs: list,
+        result_dir: str,
+        lut_engine: str = 'rq-lut',
+):
+    """
+    Tail variant of plot(): per query the P50 as line, the P50 - P99 range as band and the max as dots, for rq-legacy
+    and every rq-lut cutoff, computed from the per repetition samples.
+    """
+    percentiles = load_percentiles(samples_csv)
+    os.makedirs(result_dir, exist_ok=True)
+
+    colors = plt.get_cmap('tab20')
+    configs = [('rq-legacy', -1, 'red', 'rq-legacy')]
+    configs += [(lut_engine, int(cutoff), colors(i % 20), f'LUT (CUTOFF={cutoff})') for i, cutoff in enumerate(cutoffs)]
+
+    for json_name, group in percentiles.groupby('JSON'):
+        fig, ax = plt.subplots(2, 1, figsize=(10, 12))
+
+        # --- Plot 2: Skip Percentages (Bar Plot), also the query order ---
+        counter_file = os.path.join(counter_folder, f"{json_name}.csv")
+        if os.path.exists(counter_file):
+            counter_data_sorted = load_counter(counter_file)
+            ax[1].bar(counter_data_sorted['QUERY_ID'], counter_data_sorted['SKIP_PERCENTAGE'])
+            sorted_query_ids = counter_data_sorted['QUERY_ID'].values
+            ax[1].set_title(f'Skip Percentage per Query ID for {json_name}')
+            ax[1].set_xlabel('Query ID')
+            ax[1].set_ylabel('Skip Percentage')
+            ax[1].tick_params(axis='x', rotation=45)
+            ax[1].grid(True)
+        else:
+            sorted_query_ids = group['QUERY_ID'].unique()
+            ax[1].set_visible(False)
+
+        # --- Plot 1: Query Time Percentiles (Line + Band) ---
+        for engine, cutoff, color, label in configs:
+            config_group = group[(group['ENGINE'] == engine) & (group['CUTOFF'] == cutoff)]
+            if config_group.empty:
+                continue
+            config_group = config_group.set_index('QUERY_ID').reindex(sorted_query_ids)
+            ax[0].plot(sorted_query_ids, config_group['P50_SECONDS'], marker='o' if cutoff < 0 else 'x',
+                       color=color, label=f'{label} P50')
+            ax[0].fill_between(sorted_query_ids, config_group['P50_SECONDS'], config_group['P99_SECONDS'],
+                               color=color, alpha=0.2, label=f'{label} P50 - P99')
+            ax[0].scatter(sorted_query_ids, config_group['MAX_SECONDS'], marker='_', s=120, color=color)
+
+        ax[0].set_title(f'Query Time Percentiles for {json_name} (dashes: max)')
+        ax[0].set_xlabel('QUERY_ID')
+        ax[0].set_ylabel('Query Time (Seconds)')
+        ax[0].tick_params(axis='x', rotation=45)
+        ax[0].grid(True)
+        ax[0].legend(fontsize=8)
+
+        plt.tight_layout()
+        plot_filename = os.path.join(result_dir, f"{json_name}_count_percentiles.png")
+        save_figure(plot_filename)
+        print(f"Generated: {plot_filename}")
+        plt.close(fig)
+
+
 # Run with: python src/speed/plot_optimal.py
 #
 # This code expects following structure for the given .csv files:
@@ -177,6 +231,9 @@ def plot(
 # that was analyzed.
 # "result_dir" is the path to the folder where the plots will be saved.
 # "cutoffs" defines which cutoff will be covered in the plots
+#
+# plot_percentiles(...) draws the same per JSON plot from per repetition samples (see latency_percentiles.py) with the
+# P50 - P99 band and the max per query instead of the mean; latency_percentiles.py runs it.
 if __name__ == "__main__":
     # Input
     rq_legacy_skip_time = "res/data/speed/server/rq_legacy_skip_time/query_count/rq_legacy_skip_time_repetitions=20.csv"
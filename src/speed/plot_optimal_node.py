@@ -1,8 +1,15 @@
 import os
+import sys
 import matplotlib.pyplot as plt
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_cache import load_counter, load_optimal_times, load_query_times  # noqa: E402
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
 
+
+@profiled
 def plot(
         rq_legacy_skip_time: str,
         rq_legacy_time_csv: str,
@@ -12,27 +19,13 @@ def plot(
         cutoffs: list,
         result_dir: str,
 ):
-    legacy_skip_df = pd.read_csv(rq_legacy_skip_time)
-    legacy_df = pd.read_csv(rq_legacy_time_csv)
-    lut_df = pd.read_csv(rq_lut_time_csv)
-    serde_df = pd.read_csv(rq_text_time_csv)  # NEW
-
-    # Convert QUERY_ID to string type
-    legacy_df['QUERY_ID'] = legacy_df['QUERY_ID'].astype(str)
-    legacy_skip_df['QUERY_ID'] = legacy_skip_df['QUERY_ID'].astype(str)
-    lut_df['QUERY_ID'] = lut_df['QUERY_ID'].astype(str)
+    # Legacy times merged with the skip times (OPTIMAL_TIME), cached across the plot functions of one run
+    merged_data = load_optimal_times(rq_legacy_time_csv, rq_legacy_skip_time)
+    lut_df = load_query_times(rq_lut_time_csv)
+    serde_df = load_query_times(rq_text_time_csv)  # NEW
+
     lut_df['CUTOFF'] = lut_df['CUTOFF'].astype(str)
     lut_df['QUERY_TIME_SECONDS'] = pd.to_numeric(lut_df['QUERY_TIME_SECONDS'], errors='coerce')
-    serde_df['QUERY_ID'] = serde_df['QUERY_ID'].astype(str)  # NEW
-
-    # Merge legacy + skip
-    merged_data = pd.merge(
-        legacy_df,
-        legacy_skip_df[['JSON', 'QUERY_ID', 'SKIP_TIME_NANO_SECONDS']],
-        on=['JSON', 'QUERY_ID'],
-        how='left'
-    )
-    merged_data['OPTIMAL_TIME'] = merged_data['QUERY_TIME_SECONDS'] - (merged_data['SKIP_TIME_NANO_SECONDS'] / 1e9)
 
     os.makedirs(result_dir, exist_ok=True)
     short_dir = os.path.join(result_dir, "short")
@@ -47,9 +40,7 @@ def plot(
         # Skip Percentage Bar Plot
         counter_file = os.path.join(counter_folder, f"{json_name}.csv")
         if os.path.exists(counter_file):
-            counter_data = pd.read_csv(counter_file)
-            counter_data['QUERY_ID'] = counter_data['QUERY_ID'].astype(str)
-            counter_data_sorted = counter_data.sort_values(by='SKIP_PERCENTAGE', ascending=True)
+            counter_data_sorted = load_counter(counter_file)
 
             ax[1].bar(counter_data_sorted['QUERY_ID'], counter_data_sorted['SKIP_PERCENTAGE'])
             sorted_query_ids = counter_data_sorted['QUERY_ID'].values
@@ -107,7 +98,7 @@ def plot(
 
         plt.tight_layout()
         plot_filename = os.path.join(result_dir, f"{json_name}_node.png")
-        plt.savefig(plot_filename)
+        save_figure(plot_filename)
         print(f"Generated: {plot_filename}")
         plt.close()
 
@@ -150,7 +141,7 @@ def plot(
 
         plt.tight_layout()
         short_filename = os.path.join(short_dir, f"{json_name}_node_short.png")
-        plt.savefig(short_filename)
+        save_figure(short_filename)
         print(f"Generated short plot: {short_filename}")
         plt.close()
 
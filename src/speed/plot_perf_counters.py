@@ -0,0 +1,243 @@
+import os
+import sys
+import re
+import subprocess
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_materialization_overhead import load_times
+from run_benchmark import build_command, load_queries
+from rank_speedups import config_label
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# perf event name -> column name
+EVENTS = {
+    "cycles": "CYCLES",
+    "instructions": "INSTRUCTIONS",
+    "cache-misses": "CACHE_MISSES",
+    "branch-misses": "BRANCH_MISSES",
+    "LLC-loads": "LLC_LOADS",
+}
+
+CUTOFF_DIR_PATTERN = re.compile(r"^cutoff=(-?\d+)$")
+PERF_FILE_PATTERN = re.compile(r"^(?P<json>.+)_query=(?P<query_id>[^_]+)\.txt$")
+
+PLOT_COLORS = ["red", "royalblue", "darkorange", "seagreen", "purple", "saddlebrown", "teal", "olive"]
+
+
+def normalize_event(event: str) -> str:
+    """
+    "cpu_core/cycles/u" -> "cycles", "cache-misses:u" -> "cache-misses".
+    """
+    event = event.strip()
+    if "/" in event:
+        event = event.split("/")[1]
+    return event.split(":")[0]
+
+
+def parse_perf_stat(path: str) -> dict:
+    """
+    Counter values of one `perf stat -x,` output file. Every line is "value,unit,event,..." (with -r the next field is
+    the variance); "<not counted>" and "<not supported>" values are skipped in the sum.
+    """
+    values = {}
+    with open(path) as file:
+        for line in file:
+            fields = line.strip().split(",")
+            if len(fields) < 3 or line.startswith("#"):
+                continue
+            column = EVENTS.get(normalize_event(fields[2]))
+            if column is None:
+                continue
+            # Hybrid CPUs report one line per core type, their counts add up
+            values.setdefault(column, []).append(pd.to_numeric(fields[0], errors="coerce"))
+    # A core type that did not run the query is "<not counted>"; NaN only if no line counted anything
+    return {column: np.nansum(counts) if not np.isnan(counts).all() else np.nan for column, counts in values.items()}
+
+
+def perf_files(perf_dir: str) -> list:
+    """
+    (ENGINE, CUTOFF, path) of every perf output below perf_dir/<engine>/[cutoff=<cutoff>/]<JSON>_query=<id>.txt,
+    CUTOFF=-1 for engines without a cutoff directory.
+    """
+    files = []
+    for engine in sorted(os.listdir(perf_dir)):
+        engine_dir = os.path.join(perf_dir, engine)
+        if not os.path.isdir(engine_dir):
+            continue
+        for name in sorted(os.listdir(engine_dir)):
+            match = CUTOFF_DIR_PATTERN.match(name)
+            if match and os.path.isdir(os.path.join(engine_dir, name)):
+                for filename in sorted(os.listdir(os.path.join(engine_dir, name))):
+                    files.append((engine, int(match.group(1)), os.path.join(engine_dir, name, filename)))
+            else:
+                files.append((engine, -1, os.path.join(engine_dir, name)))
+    return files
+
+
+def load_perf_counters(perf_dir: str) -> pd.DataFrame:
+    rows = []
+    for engine, cutoff, path in perf_files(perf_dir):
+        match = PERF_FILE_PATTERN.match(os.path.basename(path))
+        if not match:
+            continue
+        rows.append({"JSON": match.group("json"), "ENGINE": engine, "CUTOFF": cutoff,
+                     "QUERY_ID": match.group("query_id"), **parse_perf_stat(path)})
+    df = pd.DataFrame(rows, columns=["JSON", "ENGINE", "CUTOFF", "QUERY_ID"] + list(EVENTS.values()))
+    df["IPC"] = df["INSTRUCTIONS"] / df["CYCLES"]
+    return df
+
+
+def load_jump_counts(track_dir: str) -> pd.DataFrame:
+    """
+    Number of jumps per (JSON, QUERY_ID) from the <JSON>_scaled_query=<id>.csv files of the distance tracking
+    (distance,frequency,skip_type). The jumps do not depend on the cutoff, only their skip type does.
+    """
+    rows = []
+    for filename in sorted(os.listdir(track_dir)):
+        # Only the scaled files, an unscaled copy of the same query would count its jumps twice
+        match = re.match(r"^(?P<json>.+)_scaled_query=(?P<query_id>[^_]+)\.csv$", filename)
+        if not match:
+            continue
+        df = pd.read_csv(os.path.join(track_dir, filename))
+        df.columns = df.columns.str.upper()
+        rows.append({"JSON": match.group("json"), "QUERY_ID": match.group("query_id"),
+                     "JUMPS": pd.to_numeric(df["FREQUENCY"], errors="coerce").sum()})
+    return pd.DataFrame(rows, columns=["JSON", "QUERY_ID", "JUMPS"])
+
+
+def load_json_sizes(bracket_distribution_csv: str, json_names) -> pd.Series:
+    """
+    Size in bytes per JSON from the bracket distribution, falling back to the size in the name, e.g. "(1.1GB)".
+    """
+    sizes = pd.Series(np.nan, index=pd.Index(json_names, name="JSON"))
+    if bracket_distribution_csv is not None and os.path.exists(bracket_distribution_csv):
+        bracket_df = pd.read_csv(bracket_distribution_csv)
+        bracket_df["JSON"] = bracket_df["JSON"].astype(str).str.strip()
+        sizes = sizes.fillna(bracket_df.set_index("JSON")["SIZE_BYTES"].reindex(sizes.index))
+    from_name = sizes.index.to_series().str.extract(r"\(([\d.]+)([MG]B)\)")
+    from_name = pd.to_numeric(from_name[0], errors="coerce") * np.where(from_name[1] == "GB", 1024 ** 3, 1024 ** 2)
+    return sizes.fillna(from_name)
+
+
+@profiled
+def collect(executable: str, engine: str, json_paths: list, query_csv: str, cutoffs, perf_dir: str,
+            repetitions: int = 5, mode: str = "count") -> None:
+    """
+    Run every JSON x cutoff x query under `perf stat -x,` and write the output in the layout load_perf_counters reads.
+    """
+    queries = load_queries(query_csv)
+    for json_path in json_paths:
+        json_name = os.path.splitext(os.path.basename(json_path))[0]
+        for cutoff in (cutoffs if cutoffs is not None else [None]):
+            out_dir = os.path.join(perf_dir, engine) if cutoff is None else os.path.join(perf_dir, engine,
+                                                                                         f"cutoff={cutoff}")
+            os.makedirs(out_dir, exist_ok=True)
+            for query in queries.itertuples(index=False):
+                out_path = os.path.join(out_dir, f"{json_name}_query={query.QUERY_ID}.txt")
+                command = ["perf", "stat", "-x,", "-o", out_path, "-r", str(repetitions), "-e", ",".join(EVENTS),
+                           "--"] + build_command(executable, mode, query.QUERY_TEXT, json_path, cutoff)
+                subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+                print(f"Saved perf counters -> {out_path}")
+
+
+def plot_json(json_df: pd.DataFrame, json_name: str, counter_columns: list, normalizer: str, unit: str,
+              save_path: str) -> None:
+    """
+    Query time per QUERY_ID on top like plot_optimal, below one panel per counter divided by "normalizer".
+    """
+    query_ids = sorted(json_df["QUERY_ID"].unique(), key=lambda query_id: (len(query_id), query_id))
+    fig, axes = plt.subplots(len(counter_columns) + 1, 1, figsize=(10, 4 * (len(counter_columns) + 1)), sharex=True)
+
+    for i, ((engine, cutoff), group) in enumerate(json_df.groupby(["ENGINE", "CUTOFF"])):
+        group = group.set_index("QUERY_ID").reindex(query_ids)
+        label = config_label(engine, cutoff)
+        style = {"marker": "o" if cutoff < 0 else "x", "color": PLOT_COLORS[i % len(PLOT_COLORS)], "label": label}
+        axes[0].plot(query_ids, group["TIME_SECONDS"], **style)
+        for ax, column in zip(axes[1:], counter_columns):
+            ax.plot(query_ids, group[column] / group[normalizer], **style)
+
+    axes[0].set_title(f"Query Time for {json_name}")
+    axes[0].set_ylabel("Query Time (Seconds)")
+    for ax, column in zip(axes[1:], counter_columns):
+        ax.set_title(f"{column} per {unit}")
+        ax.set_ylabel(f"{column} / {unit}")
+    for ax in axes:
+        ax.grid(True)
+    axes[0].legend(fontsize=8)
+    axes[-1].set_xlabel("QUERY_ID")
+    axes[-1].tick_params(axis="x", rotation=45)
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot(perf_dir: str, engine_time_csvs: dict, track_dir: str, bracket_distribution_csv: str,
+         result_dir_path: str) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    counters = load_perf_counters(perf_dir)
+    times = pd.concat([load_times(csv_path, engine) for engine, csv_path in engine_time_csvs.items()],
+                      ignore_index=True)
+    table = counters.merge(times, on=["JSON", "ENGINE", "CUTOFF", "QUERY_ID"], how="left")
+    table = table.merge(load_jump_counts(track_dir), on=["JSON", "QUERY_ID"], how="left")
+    table["SIZE_BYTES"] = table["JSON"].map(load_json_sizes(bracket_distribution_csv, table["JSON"].unique()))
+
+    counter_columns = [column for column in EVENTS.values() if table[column].notna().any()]
+    for column in counter_columns:
+        table[f"{column}_PER_BYTE"] = table[column] / table["SIZE_BYTES"]
+        table[f"{column}_PER_JUMP"] = table[column] / table["JUMPS"].where(table["JUMPS"] > 0)
+
+    table_csv_path = os.path.join(result_dir_path, "perf_counters.csv")
+    table.to_csv(table_csv_path, index=False)
+    print(f"Saved counters with timings -> {table_csv_path}")
+
+    for json_name, json_df in table.groupby("JSON"):
+        plot_json(json_df, json_name, counter_columns, "SIZE_BYTES", "Byte",
+                  os.path.join(result_dir_path, f"{json_name}_per_byte.png"))
+        if json_df["JUMPS"].notna().any():
+            plot_json(json_df, json_name, counter_columns, "JUMPS", "Jump",
+                      os.path.join(result_dir_path, f"{json_name}_per_jump.png"))
+
+
+# Run with: python src/speed/plot_perf_counters.py
+#
+# Explains the query times of plot_optimal.py with hardware counters (cycles, instructions, cache misses, branch
+# misses, LLC loads), e.g. whether an rq-lut slowdown at a cutoff comes from cache misses in the LUT or from branch
+# mispredictions in the iterative skip.
+#
+# collect(...) runs the binary under `perf stat -x, -r <repetitions>` (Linux with perf only) and writes one file per
+# query to "perf_dir":
+#   <perf_dir>/rq-legacy/<JSON>_query=<QUERY_ID>.txt
+#   <perf_dir>/rq-lut/cutoff=<CUTOFF>/<JSON>_query=<QUERY_ID>.txt
+# with the lines of perf stat, e.g.
+#   1234567890,,cycles:u,1000000,100.00,,
+#   <not supported>,,LLC-loads:u,0,100.00,,
+#
+# "engine_time_csvs" maps the engine directory names to their query time .csv (see plot_optimal.py), "track_dir"
+# holds the distance tracking .csv files of one cutoff (the number of jumps per query does not depend on it) and
+# "bracket_distribution_csv" the size of every JSON.
+#
+# Output in "result_dir_path":
+#   perf_counters.csv                  counters, IPC, query time, counters per byte and per jump
+#   <JSON>_per_byte.png / _per_jump.png
+if __name__ == "__main__":
+    # Input
+    perf_dir = "res/data/speed/server/perf"
+    engine_time_csvs = {
+        "rq-legacy": "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv",
+        "rq-lut": "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv",
+    }
+    track_dir = "res/data/analysis/distance_distribution_per_query/track/cutoff=0"
+    bracket_distribution_csv = "res/data/analysis/bracket_distribution/bracket_distribution.csv"
+    result_dir_path = "res/plots/speed/server/perf_counters"
+
+    plot(perf_dir, engine_time_csvs, track_dir, bracket_distribution_csv, result_dir_path)
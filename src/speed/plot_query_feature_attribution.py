@@ -0,0 +1,258 @@
+import os
+import sys
+import re
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# One segment of a JSONPath query after the root "$", e.g. "..freeShipping", ".products", "[*]", "[2]", "['a b']"
+SEGMENT_PATTERN = re.compile(
+    r"(?P<descendant>\.\.)?"
+    r"(?:"
+    r"\.?(?P<wildcard>\*)"
+    r"|\.?\[(?P<bracket>[^\]]*)\]"
+    r"|\.?(?P<member>[^.\[\]]+)"
+    r")"
+)
+
+FEATURE_COLUMNS = [
+    "NUM_DESCENDANT", "NUM_WILDCARD", "NUM_INDEX", "NUM_SLICE", "NUM_MEMBER", "DEPTH",
+    "STARTS_WITH_DESCENDANT", "ENDS_WITH_MEMBER", "MIN_MEMBER_LENGTH", "LOG_RESULTS_PER_MB",
+]
+
+
+def tokenize(query_text: str) -> list:
+    """
+    Split a JSONPath query into (SEGMENT_TYPE, VALUE, DESCENDANT) tuples. SEGMENT_TYPE is one of "member",
+    "wildcard", "index" or "slice". Raises a ValueError for queries that cannot be parsed.
+    """
+    query_text = query_text.strip()
+    if not query_text.startswith("$"):
+        raise ValueError(f"JSONPath query has to start with '$': {query_text}")
+
+    tokens = []
+    position = 1
+    while position < len(query_text):
+        match = SEGMENT_PATTERN.match(query_text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Cannot parse JSONPath query at position {position}: {query_text}")
+
+        descendant = match.group("descendant") is not None
+        if match.group("wildcard") is not None:
+            tokens.append(("wildcard", "*", descendant))
+        elif match.group("member") is not None:
+            tokens.append(("member", match.group("member"), descendant))
+        else:
+            selector = match.group("bracket").strip()
+            if selector == "*":
+                tokens.append(("wildcard", "*", descendant))
+            elif re.fullmatch(r"-?\d+", selector):
+                tokens.append(("index", int(selector), descendant))
+            elif ":" in selector:
+                tokens.append(("slice", selector, descendant))
+            else:
+                tokens.append(("member", selector.strip("'\""), descendant))
+
+        position = match.end()
+
+    return tokens
+
+
+def extract_features(query_text: str) -> dict:
+    tokens = tokenize(query_text)
+    members = [value for segment_type, value, _ in tokens if segment_type == "member"]
+    return {
+        "NUM_DESCENDANT": sum(descendant for _, _, descendant in tokens),
+        "NUM_WILDCARD": sum(segment_type == "wildcard" for segment_type, _, _ in tokens),
+        "NUM_INDEX": sum(segment_type == "index" for segment_type, _, _ in tokens),
+        "NUM_SLICE": sum(segment_type == "slice" for segment_type, _, _ in tokens),
+        "NUM_MEMBER": len(members),
+        "DEPTH": len(tokens),
+        "STARTS_WITH_DESCENDANT": int(bool(tokens) and tokens[0][2]),
+        "ENDS_WITH_MEMBER": int(bool(tokens) and tokens[-1][0] == "member"),
+        # Short member names tend to occur more often in a document, long ones are usually more selective
+        "MIN_MEMBER_LENGTH": min((len(member) for member in members), default=0),
+    }
+
+
+def load_counters(counter_folder: str, json_names) -> pd.DataFrame:
+    all_data = []
+    for json_name in json_names:
+        counter_file = os.path.join(counter_folder, f"{json_name}.csv")
+        if not os.path.exists(counter_file):
+            continue
+
+        counter_data = pd.read_csv(counter_file).rename(columns={"RESULT": "COUNT_RESULT"})
+        counter_data["QUERY_ID"] = counter_data["QUERY_ID"].astype(str)
+        counter_data["JSON"] = json_name
+        all_data.append(counter_data[["JSON", "QUERY_ID", "COUNT_RESULT", "SKIP_PERCENTAGE"]])
+
+    if not all_data:
+        return pd.DataFrame(columns=["JSON", "QUERY_ID", "COUNT_RESULT", "SKIP_PERCENTAGE"])
+    return pd.concat(all_data, ignore_index=True)
+
+
+def build_feature_table(rq_legacy_time: str, rq_lut_time: str, counter_folder: str, cutoff) -> pd.DataFrame:
+    """
+    One row per (JSON, QUERY_ID) with the query features, the SPEEDUP of rq-lut over rq-legacy and the
+    SKIP_PERCENTAGE of the counter data. With cutoff=None the best cutoff of every query is used.
+    """
+    legacy_df = pd.read_csv(rq_legacy_time)
+    lut_df = pd.read_csv(rq_lut_time)
+
+    legacy_df["QUERY_ID"] = legacy_df["QUERY_ID"].astype(str)
+    lut_df["QUERY_ID"] = lut_df["QUERY_ID"].astype(str)
+    legacy_df["JSON"] = legacy_df["JSON"].astype(str).str.strip()
+    lut_df["JSON"] = lut_df["JSON"].astype(str).str.strip()
+
+    legacy_df["QUERY_TIME_SECONDS"] = pd.to_numeric(legacy_df["QUERY_TIME_SECONDS"], errors="coerce")
+    lut_df["QUERY_TIME_SECONDS"] = pd.to_numeric(lut_df["QUERY_TIME_SECONDS"], errors="coerce")
+    lut_df["CUTOFF"] = pd.to_numeric(lut_df["CUTOFF"], errors="coerce")
+    lut_df = lut_df.dropna(subset=["CUTOFF"])
+    lut_df["CUTOFF"] = lut_df["CUTOFF"].astype(int)
+
+    if cutoff is not None:
+        lut_df = lut_df[lut_df["CUTOFF"] == int(cutoff)]
+    # Keep the fastest cutoff per query
+    lut_df = lut_df.sort_values("QUERY_TIME_SECONDS").drop_duplicates(subset=["JSON", "QUERY_ID"])
+
+    legacy_df = legacy_df.drop_duplicates(subset=["JSON", "QUERY_ID"])
+    table = legacy_df[["JSON", "QUERY_ID", "QUERY_TEXT", "QUERY_TIME_SECONDS"]].merge(
+        lut_df[["JSON", "QUERY_ID", "CUTOFF", "QUERY_TIME_SECONDS"]],
+        on=["JSON", "QUERY_ID"],
+        suffixes=("_legacy", "_lut")
+    )
+    table["SPEEDUP"] = table["QUERY_TIME_SECONDS_legacy"] / table["QUERY_TIME_SECONDS_lut"]
+
+    features = []
+    for query_text in table["QUERY_TEXT"]:
+        try:
+            features.append(extract_features(query_text))
+        except ValueError as e:
+            print(f"Warning: {e}")
+            features.append({})
+    table = pd.concat([table, pd.DataFrame(features, index=table.index)], axis=1)
+
+    counters = load_counters(counter_folder, table["JSON"].unique())
+    table = table.merge(counters, on=["JSON", "QUERY_ID"], how="left")
+
+    # Result cardinality normalized by the document size, a data-driven proxy for the selectivity of the member names
+    size_mb = table["JSON"].str.extract(r"\(([\d.]+)([MG]B)\)")
+    size_mb = pd.to_numeric(size_mb[0], errors="coerce") * np.where(size_mb[1] == "GB", 1024, 1)
+    table["LOG_RESULTS_PER_MB"] = np.log10((pd.to_numeric(table["COUNT_RESULT"], errors="coerce") + 1) / size_mb)
+
+    return table
+
+
+def attribute(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rank the features by how well they predict the LUT speedup: Spearman correlation with the log speedup and the
+    coefficient of a standardized least squares fit over all features at once.
+    """
+    predictors = [column for column in FEATURE_COLUMNS + ["SKIP_PERCENTAGE"] if column in table.columns]
+    data = table[predictors + ["SPEEDUP"]].apply(pd.to_numeric, errors="coerce").dropna()
+    if len(data) < 3:
+        return pd.DataFrame(columns=["FEATURE", "SPEARMAN", "STD_COEFFICIENT"])
+
+    log_speedup = np.log(data["SPEEDUP"])
+    # Spearman correlation as Pearson correlation of the ranks, which avoids the scipy dependency
+    spearman = data[predictors].rank().corrwith(log_speedup.rank())
+
+    X = data[predictors]
+    std = X.std().replace(0, np.nan)
+    X_standardized = ((X - X.mean()) / std).fillna(0).to_numpy()
+    X_standardized = np.column_stack([X_standardized, np.ones(len(X_standardized))])
+    coefficients, _, _, _ = np.linalg.lstsq(X_standardized, log_speedup.to_numpy(), rcond=None)
+
+    residuals = log_speedup.to_numpy() - X_standardized @ coefficients
+    ss_tot = ((log_speedup - log_speedup.mean()) ** 2).sum()
+    r2 = 1 - (residuals @ residuals) / ss_tot if ss_tot > 0 else np.nan
+    print(f"R² of the standardized linear model on log speedup: {r2:.3f} ({len(data)} queries)")
+
+    result = pd.DataFrame({
+        "FEATURE": predictors,
+        "SPEARMAN": spearman.to_numpy(),
+        "STD_COEFFICIENT": coefficients[:-1],
+    })
+    return result.sort_values("SPEARMAN", key=lambda x: x.abs(), ascending=False).reset_index(drop=True)
+
+
+@profiled
+def plot(rq_legacy_time: str, rq_lut_time: str, counter_folder: str, cutoff, result_dir: str):
+    os.makedirs(result_dir, exist_ok=True)
+
+    table = build_feature_table(rq_legacy_time, rq_lut_time, counter_folder, cutoff)
+    table_csv_path = os.path.join(result_dir, "query_features.csv")
+    table.to_csv(table_csv_path, index=False)
+    print(f"Saved query features -> {table_csv_path}")
+
+    attribution = attribute(table)
+    attribution_csv_path = os.path.join(result_dir, "feature_attribution.csv")
+    attribution.to_csv(attribution_csv_path, index=False)
+    print(attribution)
+    print(f"Saved feature attribution -> {attribution_csv_path}")
+
+    fig, ax = plt.subplots(2, 1, figsize=(12, 12))
+
+    # --- Plot 1: Correlation of every feature with the speedup ---
+    colors = ["#2ecc71" if value > 0 else "#e74c3c" for value in attribution["SPEARMAN"]]
+    ax[0].barh(attribution["FEATURE"], attribution["SPEARMAN"], color=colors)
+    ax[0].invert_yaxis()
+    ax[0].set_xlabel("Spearman correlation with log(rq-legacy / rq-lut)")
+    ax[0].set_title("Query Features Predicting the LUT Speedup" +
+                    (f" (CUTOFF={cutoff})" if cutoff is not None else " (best cutoff per query)"))
+    ax[0].grid(True, axis="x")
+
+    # --- Plot 2: Skip percentage vs. speedup, with and without descendant segments ---
+    for has_descendant, color, label in [(False, "#458AF5", "no '..'"), (True, "#F5BA45", "with '..'")]:
+        subset = table[(table["NUM_DESCENDANT"] > 0) == has_descendant]
+        ax[1].scatter(subset["SKIP_PERCENTAGE"], subset["SPEEDUP"], color=color, label=label, alpha=0.8)
+    ax[1].axhline(y=1, color="gray", linestyle="--")
+    ax[1].set_yscale("log")
+    ax[1].set_xlabel("Skip Percentage")
+    ax[1].set_ylabel("Speedup rq-legacy / rq-lut")
+    ax[1].set_title("Speedup per Query over all JSONs")
+    ax[1].grid(True)
+    ax[1].legend()
+
+    plt.tight_layout()
+    plot_filename = os.path.join(result_dir, "feature_attribution.png")
+    save_figure(plot_filename)
+    print(f"Generated: {plot_filename}")
+    plt.close(fig)
+
+
+# Run with: python src/speed/plot_query_feature_attribution.py
+#
+# Extracts features from the QUERY_TEXT of every query with a small JSONPath tokenizer and relates them to the
+# rq-lut speedup, to predict whether the LUT helps a new query before running it.
+#
+# Features per query: number of descendant (..) segments, wildcards, index and slice selectors, member names, depth,
+# whether it starts with a descendant or ends with a member name, the length of the shortest member name, and
+# LOG_RESULTS_PER_MB (result count of the counter data per MB of the JSON) as selectivity proxy.
+#
+# "rq_legacy_time" and "rq_lut_time" are the query time .csv files used by find_best_cutoff.py.
+# "counter_folder" holds one <JSON>.csv per JSON with the skip-counter information (see plot_optimal.py):
+#   QUERY_ID,QUERY_TEXT,COUNT_RESULT,SKIP_PERCENTAGE
+#   1,$..freeShipping,230089,0
+#   ...
+# "cutoff" selects the rq-lut cutoff to compare with, None uses the fastest cutoff per query.
+#
+# Output in "result_dir":
+#   query_features.csv       features, speedup and skip percentage per (JSON, QUERY_ID)
+#   feature_attribution.csv  Spearman correlation and standardized linear coefficient per feature
+#   feature_attribution.png
+if __name__ == "__main__":
+    # Input
+    rq_legacy_time = "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv"
+    rq_lut_time = "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv"
+    counter_folder = "res/data/analysis/query"
+    result_dir = "res/plots/speed/server/query_feature_attribution"
+    cutoff = 1024
+
+    plot(rq_legacy_time, rq_lut_time, counter_folder, cutoff, result_dir)
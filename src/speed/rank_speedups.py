@@ -0,0 +1,171 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from plot_materialization_overhead import load_times
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+CONFIG_COLUMNS = ["ENGINE", "CUTOFF"]
+
+PERCENTILES = [10, 50, 90]
+
+
+def compute_speedups(rq_legacy_time: str, engine_time_csvs: dict) -> pd.DataFrame:
+    """
+    Speedup over rq-legacy (rq-legacy time / engine time) of every (JSON, QUERY_ID) for every engine and cutoff, in
+    one merge over all time tables.
+    """
+    baseline = load_times(rq_legacy_time, "rq-legacy")[["JSON", "QUERY_ID", "TIME_SECONDS"]]
+    times = pd.concat([load_times(csv_path, engine) for engine, csv_path in engine_time_csvs.items()],
+                      ignore_index=True)
+    speedups = times.merge(baseline, on=["JSON", "QUERY_ID"], suffixes=("", "_BASELINE"))
+    speedups["SPEEDUP"] = speedups["TIME_SECONDS_BASELINE"] / speedups["TIME_SECONDS"]
+    speedups = speedups[np.isfinite(speedups["SPEEDUP"]) & (speedups["SPEEDUP"] > 0)].copy()
+    speedups["LOG_SPEEDUP"] = np.log(speedups["SPEEDUP"])
+    return speedups
+
+
+def aggregate(speedups: pd.DataFrame, group_columns: list) -> pd.DataFrame:
+    """
+    Geometric mean, percentiles and share of faster queries of the speedup per group. Every query counts the same,
+    no matter how long it runs.
+    """
+    grouped = speedups.groupby(group_columns)
+    summary = grouped.agg(
+        QUERIES=("SPEEDUP", "size"),
+        GEOMEAN_SPEEDUP=("LOG_SPEEDUP", "mean"),
+        MIN_SPEEDUP=("SPEEDUP", "min"),
+        FASTER_SHARE=("SPEEDUP", lambda speedup: (speedup > 1).mean()),
+    )
+    summary["GEOMEAN_SPEEDUP"] = np.exp(summary["GEOMEAN_SPEEDUP"])
+    percentiles = grouped["SPEEDUP"].quantile([p / 100 for p in PERCENTILES]).unstack()
+    percentiles.columns = [f"P{p}_SPEEDUP" for p in PERCENTILES]
+    return summary.join(percentiles).reset_index()
+
+
+def rank(speedups: pd.DataFrame) -> tuple:
+    """
+    Per JSON and corpus-wide summaries per (ENGINE, CUTOFF). The corpus ranking uses the geometric mean over the
+    per-JSON geometric means, so a JSON with many queries does not count more than one with few.
+    """
+    per_json = aggregate(speedups, CONFIG_COLUMNS + ["JSON"])
+    corpus = aggregate(speedups, CONFIG_COLUMNS)
+
+    balanced = per_json.groupby(CONFIG_COLUMNS).agg(
+        JSONS=("JSON", "size"),
+        JSON_BALANCED_GEOMEAN=("GEOMEAN_SPEEDUP", lambda geomean: np.exp(np.log(geomean).mean())),
+        WORST_JSON_GEOMEAN=("GEOMEAN_SPEEDUP", "min"),
+    ).reset_index()
+    corpus = corpus.merge(balanced, on=CONFIG_COLUMNS)
+    corpus = corpus.sort_values(["JSON_BALANCED_GEOMEAN", "P10_SPEEDUP"], ascending=False).reset_index(drop=True)
+    corpus.insert(0, "RANK", np.arange(1, len(corpus) + 1))
+    return per_json, corpus
+
+
+def config_label(engine: str, cutoff: int) -> str:
+    return engine if cutoff < 0 else f"{engine} (CUTOFF={cutoff})"
+
+
+def plot_ranking(corpus: pd.DataFrame, save_path: str, top: int) -> None:
+    shown = corpus.head(top).iloc[::-1]
+    labels = [config_label(engine, cutoff) for engine, cutoff in zip(shown["ENGINE"], shown["CUTOFF"])]
+    y = np.arange(len(shown))
+
+    fig, ax = plt.subplots(figsize=(12, max(4, 0.45 * len(shown) + 2)))
+    ax.barh(y, shown["JSON_BALANCED_GEOMEAN"], color="royalblue", alpha=0.8, label="Geometric mean (JSON balanced)")
+    ax.errorbar(shown["P50_SPEEDUP"], y, xerr=[shown["P50_SPEEDUP"] - shown["P10_SPEEDUP"],
+                                               shown["P90_SPEEDUP"] - shown["P50_SPEEDUP"]],
+                fmt="o", color="black", capsize=3, label="Median with P10 - P90")
+    ax.axvline(x=1, color="red", linestyle="--", label="rq-legacy")
+    ax.set_xscale("log", base=2)
+    ax.get_xaxis().set_major_formatter(plt.ScalarFormatter())
+    ax.set_yticks(y, labels)
+    ax.set_xlabel("Speedup over rq-legacy (per query, log scale)")
+    ax.set_title(f"Top {len(shown)} Engines and Cutoffs by Per-Query Speedup")
+    ax.legend(loc="lower right")
+    ax.grid(True, axis="x", alpha=0.4)
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+def plot_json_heatmap(per_json: pd.DataFrame, engine: str, save_path: str) -> None:
+    """
+    Geometric mean speedup per JSON and cutoff of one engine, log color scale centered on 1 (= rq-legacy).
+    """
+    grid = per_json[per_json["ENGINE"] == engine].pivot(index="JSON", columns="CUTOFF", values="GEOMEAN_SPEEDUP")
+    if grid.empty:
+        return
+    limit = max(np.abs(np.log2(grid.to_numpy()[np.isfinite(grid.to_numpy())])).max(), 0.1)
+
+    fig, ax = plt.subplots(figsize=(max(8, 0.7 * grid.shape[1] + 4), max(4, 0.5 * grid.shape[0] + 2)))
+    image = ax.imshow(np.log2(grid.to_numpy()), cmap="RdYlGn", vmin=-limit, vmax=limit, aspect="auto")
+    fig.colorbar(image, ax=ax, label="log2 Geometric Mean Speedup over rq-legacy")
+    for (i, j), value in np.ndenumerate(grid.to_numpy()):
+        if np.isfinite(value):
+            ax.text(j, i, f"{value:.2f}", ha="center", va="center", fontsize=8)
+    ax.set_xticks(range(grid.shape[1]), grid.columns, rotation=45)
+    ax.set_yticks(range(grid.shape[0]), grid.index)
+    ax.set_xlabel("Cutoff")
+    ax.set_title(f"Per-Query Geometric Mean Speedup of {engine} per JSON")
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def plot(rq_legacy_time: str, engine_time_csvs: dict, result_dir_path: str, top: int = 20) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    speedups = compute_speedups(rq_legacy_time, engine_time_csvs)
+    per_json, corpus = rank(speedups)
+
+    per_json_csv_path = os.path.join(result_dir_path, "speedup_per_json.csv")
+    per_json.to_csv(per_json_csv_path, index=False)
+    print(f"Saved per JSON speedups -> {per_json_csv_path}")
+
+    ranking_csv_path = os.path.join(result_dir_path, "speedup_ranking.csv")
+    corpus.to_csv(ranking_csv_path, index=False)
+    print(corpus.head(top))
+    print(f"Saved ranking -> {ranking_csv_path}")
+
+    plot_ranking(corpus, os.path.join(result_dir_path, "speedup_ranking.png"), top)
+    for engine in engine_time_csvs:
+        if (per_json.loc[per_json["ENGINE"] == engine, "CUTOFF"] >= 0).any():
+            plot_json_heatmap(per_json, engine, os.path.join(result_dir_path, f"{engine}_speedup_per_json.png"))
+
+
+# Run with: python src/speed/rank_speedups.py
+#
+# Ranks engines and cutoffs by the speedup of every single query over rq-legacy instead of summed seconds
+# (find_best_cutoff.py), so the slow queries on the largest JSONs do not decide alone.
+#
+# "rq_legacy_time" is the baseline, "engine_time_csvs" maps an engine name to its query time .csv
+#   JSON,[CUTOFF,]QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS,REPETITIONS
+# (engines without CUTOFF column get CUTOFF=-1).
+#
+# Output in "result_dir_path":
+#   speedup_per_json.csv   per (ENGINE, CUTOFF, JSON): geometric mean, P10/P50/P90, min speedup, share of faster queries
+#   speedup_ranking.csv    the same corpus-wide plus the geometric mean over the per-JSON geometric means
+#                          (JSON_BALANCED_GEOMEAN, the rank order) and the worst JSON
+#   speedup_ranking.png, <engine>_speedup_per_json.png (per JSON x cutoff heatmap for engines with cutoffs)
+if __name__ == "__main__":
+    # Input
+    rq_legacy_time = "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv"
+    engine_time_csvs = {
+        "rq-lut": "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv",
+        "rq-lut-no-lut": "res/data/speed/server/rq_lut_no_lut/query_count/rq_lut_no_lut_time_repetitions=20.csv",
+    }
+    result_dir_path = "res/plots/speed/server/speedup_ranking"
+
+    plot(rq_legacy_time, engine_time_csvs, result_dir_path)
@@ -0,0 +1,245 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# Structural features a recommendation is based on, all standardized before measuring distances
+FEATURES = [
+    "LOG2_SIZE_BYTES",
+    "BRACKETS_PER_KB",
+    "CURLY_FRACTION",
+    "LOG2_DISTANCE_P10",
+    "LOG2_DISTANCE_P50",
+    "LOG2_DISTANCE_P90",
+    "SHARE_BELOW_64",
+    "SHARE_BELOW_1024",
+]
+
+
+def weighted_quantiles(values: np.ndarray, weights: np.ndarray, quantiles: list) -> np.ndarray:
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    positions = np.searchsorted(cumulative, np.asarray(quantiles) * cumulative[-1])
+    return values[order][np.minimum(positions, len(values) - 1)]
+
+
+def histogram_features(distances_csv: str) -> dict:
+    """
+    Shape of a distance distribution of plot_distance_distribution_per_json.py (distance,frequency).
+    """
+    df = pd.read_csv(distances_csv)
+    df.columns = df.columns.str.upper()
+    distance = np.maximum(pd.to_numeric(df["DISTANCE"], errors="coerce").to_numpy(dtype=float), 1)
+    frequency = pd.to_numeric(df["FREQUENCY"], errors="coerce").to_numpy(dtype=float)
+    valid = np.isfinite(distance) & np.isfinite(frequency) & (frequency > 0)
+    distance, frequency = distance[valid], frequency[valid]
+    if len(distance) == 0:
+        return {}
+
+    p10, p50, p90 = np.log2(weighted_quantiles(distance, frequency, [0.1, 0.5, 0.9]))
+    total = frequency.sum()
+    return {
+        "LOG2_DISTANCE_P10": p10,
+        "LOG2_DISTANCE_P50": p50,
+        "LOG2_DISTANCE_P90": p90,
+        "SHARE_BELOW_64": frequency[distance < 64].sum() / total,
+        "SHARE_BELOW_1024": frequency[distance < 1024].sum() / total,
+    }
+
+
+def load_features(bracket_distribution_csv: str, distances_dir: str) -> pd.DataFrame:
+    """
+    One row per JSON that has both its bracket statistics and its distance distribution.
+    """
+    brackets = pd.read_csv(bracket_distribution_csv)
+    brackets["JSON"] = brackets["JSON"].astype(str).str.strip()
+    brackets["LOG2_SIZE_BYTES"] = np.log2(brackets["SIZE_BYTES"])
+    brackets["BRACKETS_PER_KB"] = brackets["NUM_BRACKETS"] / brackets["SIZE_BYTES"] * 1024
+    brackets["CURLY_FRACTION"] = brackets["CURLY_PERCENT"] / (brackets["CURLY_PERCENT"] + brackets["SQUARY_PERCENT"])
+
+    rows = []
+    for filename in os.listdir(distances_dir):
+        if filename.endswith("_distances.csv"):
+            features = histogram_features(os.path.join(distances_dir, filename))
+            if features:
+                rows.append({"JSON": filename.removesuffix("_distances.csv"), **features})
+    histograms = pd.DataFrame(rows, columns=["JSON"] + FEATURES[3:])
+
+    features = brackets.merge(histograms, on="JSON", how="inner")
+    missing = set(brackets["JSON"]) ^ set(histograms["JSON"])
+    if missing:
+        print(f"Warning: no bracket statistics or no distance distribution for {sorted(missing)}")
+    return features[["JSON"] + FEATURES].dropna().reset_index(drop=True)
+
+
+def load_cutoff_scores(find_best_cutoff_dir: str) -> pd.DataFrame:
+    """
+    Read the <JSON>_summary.csv files of find_best_cutoff.plot_per_json. RANK is the row order of the summary,
+    NET_SAVED_SECONDS = SUM_POSITIVE - SUM_NEGATIVE picks the best cutoff and measures what a worse choice costs.
+    """
+    all_data = []
+    for filename in os.listdir(find_best_cutoff_dir):
+        if filename.endswith("_summary.csv") and filename != "summary_combined.csv":
+            df = pd.read_csv(os.path.join(find_best_cutoff_dir, filename))
+            df["JSON"] = filename.removesuffix("_summary.csv")
+            df["RANK"] = np.arange(1, len(df) + 1)
+            all_data.append(df)
+    if not all_data:
+        raise ValueError(f"No <JSON>_summary.csv files in {find_best_cutoff_dir}, "
+                         "run find_best_cutoff.plot_per_json first")
+
+    scores = pd.concat(all_data, ignore_index=True)
+    scores["CUTOFF"] = scores["CUTOFF"].astype(int)
+    scores["NET_SAVED_SECONDS"] = scores["SUM_POSITIVE"] - scores["SUM_NEGATIVE"]
+    return scores[["JSON", "CUTOFF", "RANK", "NET_SAVED_SECONDS"]]
+
+
+def predict_cutoffs(train: pd.DataFrame, queries: pd.DataFrame, k: int) -> pd.DataFrame:
+    """
+    Distance weighted vote of the k nearest benchmarked JSONs (standardized features) for every query JSON.
+    VOTE_SHARE is the weight of the winning cutoff among the neighbours.
+    """
+    mean = train[FEATURES].mean()
+    std = train[FEATURES].std(ddof=0).replace(0, 1)
+    train_x = ((train[FEATURES] - mean) / std).to_numpy()
+    query_x = ((queries[FEATURES] - mean) / std).to_numpy()
+
+    distances = np.sqrt(((query_x[:, np.newaxis, :] - train_x[np.newaxis, :, :]) ** 2).sum(axis=2))
+    k = min(k, len(train))
+    nearest = np.argsort(distances, axis=1)[:, :k]
+    nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+    weights = 1 / (nearest_distances + 1e-9)
+
+    cutoffs = np.sort(train["BEST_CUTOFF"].unique())
+    neighbour_cutoffs = train["BEST_CUTOFF"].to_numpy()[nearest]
+    votes = np.stack([(weights * (neighbour_cutoffs == cutoff)).sum(axis=1) for cutoff in cutoffs], axis=1)
+
+    return pd.DataFrame({
+        "JSON": queries["JSON"].to_numpy(),
+        "RECOMMENDED_CUTOFF": cutoffs[votes.argmax(axis=1)],
+        "VOTE_SHARE": votes.max(axis=1) / votes.sum(axis=1),
+        "NEAREST_JSON": train["JSON"].to_numpy()[nearest[:, 0]],
+        "NEAREST_DISTANCE": nearest_distances[:, 0],
+    })
+
+
+def leave_one_out(benchmarked: pd.DataFrame, scores: pd.DataFrame, k: int) -> pd.DataFrame:
+    """
+    Predict every benchmarked JSON from all others and compare with its measured best cutoff. REGRET_SECONDS is the
+    net saved query time lost by taking the predicted instead of the best cutoff.
+    """
+    predictions = []
+    for i in range(len(benchmarked)):
+        train = benchmarked.drop(index=benchmarked.index[i])
+        predictions.append(predict_cutoffs(train, benchmarked.iloc[[i]], k))
+    loo = pd.concat(predictions, ignore_index=True)
+    loo = loo.merge(benchmarked[["JSON", "BEST_CUTOFF"]], on="JSON")
+
+    net_saved = scores.set_index(["JSON", "CUTOFF"])["NET_SAVED_SECONDS"]
+    best_saved = net_saved.reindex(pd.MultiIndex.from_frame(loo[["JSON", "BEST_CUTOFF"]])).to_numpy()
+    predicted_saved = net_saved.reindex(pd.MultiIndex.from_frame(loo[["JSON", "RECOMMENDED_CUTOFF"]])).to_numpy()
+    loo["REGRET_SECONDS"] = best_saved - predicted_saved
+    loo["HIT"] = loo["RECOMMENDED_CUTOFF"] == loo["BEST_CUTOFF"]
+    return loo
+
+
+@profiled
+def recommend(bracket_distribution_csv: str, distances_dir: str, find_best_cutoff_dir: str, result_dir_path: str,
+              k: int = 3) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    features = load_features(bracket_distribution_csv, distances_dir)
+    scores = load_cutoff_scores(find_best_cutoff_dir)
+    # Best and regret on the same criterion, otherwise the regret can go negative
+    best = scores.loc[scores.groupby("JSON")["NET_SAVED_SECONDS"].idxmax()]
+    best = best.rename(columns={"CUTOFF": "BEST_CUTOFF"})[["JSON", "BEST_CUTOFF"]]
+
+    benchmarked = features.merge(best, on="JSON", how="inner").reset_index(drop=True)
+    new = features[~features["JSON"].isin(benchmarked["JSON"])].reset_index(drop=True)
+    if len(benchmarked) < 2:
+        print("At least two benchmarked JSONs with features are needed.")
+        return
+
+    loo = leave_one_out(benchmarked, scores, k)
+    loo_csv_path = os.path.join(result_dir_path, "cutoff_recommender_loo.csv")
+    loo.to_csv(loo_csv_path, index=False)
+    print(loo[["JSON", "BEST_CUTOFF", "RECOMMENDED_CUTOFF", "VOTE_SHARE", "REGRET_SECONDS"]])
+    print(f"Leave-one-out: {loo['HIT'].mean() * 100:.0f}% exact hits, "
+          f"median regret {loo['REGRET_SECONDS'].median():.3f} s")
+    print(f"Saved leave-one-out validation -> {loo_csv_path}")
+
+    recommendations = predict_cutoffs(benchmarked, new, k) if not new.empty else pd.DataFrame(
+        columns=["JSON", "RECOMMENDED_CUTOFF", "VOTE_SHARE", "NEAREST_JSON", "NEAREST_DISTANCE"])
+    # The leave-one-out results are the confidence of the recommendations
+    recommendations["LOO_HIT_RATE"] = loo["HIT"].mean()
+    recommendations["LOO_MEDIAN_REGRET_SECONDS"] = loo["REGRET_SECONDS"].median()
+    recommendations_csv_path = os.path.join(result_dir_path, "cutoff_recommendation.csv")
+    recommendations.to_csv(recommendations_csv_path, index=False)
+    print(recommendations)
+    print(f"Saved recommendations -> {recommendations_csv_path}")
+
+    # --- Plot: leave-one-out predicted vs. best cutoff and the regret ---
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
+
+    cutoffs = np.sort(np.union1d(loo["BEST_CUTOFF"], loo["RECOMMENDED_CUTOFF"]))
+    position = {cutoff: i for i, cutoff in enumerate(cutoffs)}
+    ax1.scatter(loo["BEST_CUTOFF"].map(position), loo["RECOMMENDED_CUTOFF"].map(position),
+                s=60 + 240 * loo["VOTE_SHARE"], c=np.where(loo["HIT"], "seagreen", "crimson"), alpha=0.7)
+    for _, row in loo.iterrows():
+        ax1.annotate(row["JSON"], (position[row["BEST_CUTOFF"]], position[row["RECOMMENDED_CUTOFF"]]),
+                     fontsize=8, xytext=(5, 5), textcoords="offset points")
+    ax1.plot([0, len(cutoffs) - 1], [0, len(cutoffs) - 1], color="gray", linestyle="--")
+    ax1.set_xticks(range(len(cutoffs)), cutoffs.astype(str), rotation=45)
+    ax1.set_yticks(range(len(cutoffs)), cutoffs.astype(str))
+    ax1.set_xlabel("Measured Best Cutoff")
+    ax1.set_ylabel("Recommended Cutoff (leave-one-out)")
+    ax1.set_title(f"Leave-one-out, {k} nearest JSONs (marker size = vote share)")
+    ax1.grid(True, alpha=0.4)
+
+    loo_sorted = loo.sort_values("REGRET_SECONDS")
+    ax2.barh(loo_sorted["JSON"], loo_sorted["REGRET_SECONDS"], color="mediumpurple")
+    ax2.set_xlabel("Net Saved Query Time Lost (seconds)")
+    ax2.set_title("Regret of the Recommended Cutoff")
+    ax2.grid(True, axis="x", alpha=0.4)
+
+    plt.tight_layout()
+    save_path = os.path.join(result_dir_path, "cutoff_recommender_loo.png")
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+# Run with: python src/speed/recommend_cutoff.py
+#
+# Recommends a cutoff for a JSON without running the rq-lut sweep, from its structure and the benchmarked JSONs with
+# the most similar structure.
+#
+# Input:
+#   "bracket_distribution_csv"  JSON,SIZE_BYTES,NUM_BRACKETS,CURLY_PERCENT,SQUARY_PERCENT
+#   "distances_dir"             <JSON>_distances.csv of plot_distance_distribution_per_json.py (distance,frequency)
+#   "find_best_cutoff_dir"      <JSON>_summary.csv of find_best_cutoff.plot_per_json, the best cutoff is the one with
+#                               the largest SUM_POSITIVE - SUM_NEGATIVE
+#
+# Features per JSON: log2 size, brackets per KB, curly fraction, 10/50/90 percentiles of log2 distance and the share of
+# distances below 64 and 1024. Every JSON with features but without a summary gets a recommendation from a distance
+# weighted vote of its "k" nearest benchmarked JSONs. Leave-one-out over the benchmarked JSONs tells how much to trust
+# it: the exact hit rate and the net saved query time lost against the measured best cutoff.
+#
+# Output in "result_dir_path":
+#   cutoff_recommendation.csv     RECOMMENDED_CUTOFF, VOTE_SHARE and NEAREST_JSON per new JSON
+#   cutoff_recommender_loo.csv    leave-one-out prediction, HIT and REGRET_SECONDS per benchmarked JSON
+#   cutoff_recommender_loo.png
+if __name__ == "__main__":
+    # Input
+    bracket_distribution_csv = "res/data/analysis/bracket_distribution/bracket_distribution.csv"
+    distances_dir = "res/data/analysis/distance_distribution_per_json"
+    find_best_cutoff_dir = "res/plots/speed/server/find_best_cutoff"
+    result_dir_path = "res/plots/speed/server/recommend_cutoff"
+
+    recommend(bracket_distribution_csv, distances_dir, find_best_cutoff_dir, result_dir_path)
@@ -0,0 +1,215 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from recommend_cutoff import load_cutoff_scores
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+# Bucket k holds the distances in [2^k, 2^(k+1))
+NUM_BUCKETS = 41
+
+
+def load_histograms(distances_dir: str) -> pd.DataFrame:
+    """
+    Normalized distance histogram over log2 buckets per JSON, one row per JSON and one column per bucket.
+    """
+    histograms = {}
+    for filename in sorted(os.listdir(distances_dir)):
+        if not filename.endswith("_distances.csv"):
+            continue
+        df = pd.read_csv(os.path.join(distances_dir, filename))
+        df.columns = df.columns.str.upper()
+        distance = np.maximum(pd.to_numeric(df["DISTANCE"], errors="coerce").fillna(1).to_numpy(dtype=float), 1)
+        frequency = pd.to_numeric(df["FREQUENCY"], errors="coerce").fillna(0).to_numpy(dtype=float)
+        bucket = np.minimum(np.floor(np.log2(distance)).astype(int), NUM_BUCKETS - 1)
+        histogram = np.bincount(bucket, weights=frequency, minlength=NUM_BUCKETS)
+        if histogram.sum() > 0:
+            histograms[filename.removesuffix("_distances.csv")] = histogram / histogram.sum()
+    return pd.DataFrame.from_dict(histograms, orient="index")
+
+
+def emd_matrix(histograms: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pairwise earth mover's distance between the histograms. On ordered buckets of width one (one doubling of the
+    distance) it is the L1 distance between the cumulative distributions.
+    """
+    cdf = np.cumsum(histograms.to_numpy(), axis=1)
+    distances = np.abs(cdf[:, np.newaxis, :] - cdf[np.newaxis, :, :]).sum(axis=2)
+    return pd.DataFrame(distances, index=histograms.index, columns=histograms.index)
+
+
+def pick_representatives(distances: pd.DataFrame, max_emd: float, benchmarked=()) -> list:
+    """
+    Greedy set cover: repeatedly take the JSON that covers (is within "max_emd" of) most of the not yet covered JSONs,
+    preferring on ties one of the "benchmarked" JSONs and then the one closest to them, until every JSON is covered.
+    """
+    within = distances.to_numpy() <= max_emd
+    is_benchmarked = distances.index.isin(list(benchmarked))
+    uncovered = np.ones(len(distances), dtype=bool)
+    representatives = []
+    while uncovered.any():
+        covered_counts = (within & uncovered[np.newaxis, :]).sum(axis=1)
+        spread = np.where(within & uncovered[np.newaxis, :], distances.to_numpy(), 0).sum(axis=1)
+        best = np.lexsort((spread, ~is_benchmarked, -covered_counts))[0]
+        representatives.append(distances.index[best])
+        uncovered &= ~within[best]
+    return representatives
+
+
+def assign_clusters(distances: pd.DataFrame, representatives: list) -> pd.DataFrame:
+    to_representatives = distances[representatives]
+    return pd.DataFrame({
+        "JSON": distances.index,
+        "REPRESENTATIVE": to_representatives.idxmin(axis=1).to_numpy(),
+        "EMD_TO_REPRESENTATIVE": to_representatives.min(axis=1).to_numpy(),
+    })
+
+
+def evaluate_subset(clusters: pd.DataFrame, scores: pd.DataFrame) -> dict:
+    """
+    Compare the best cutoff of the full corpus (largest summed net saved query time) with the one the subset finds
+    when every representative is weighted by the size of its cluster.
+    """
+    net_saved = scores.pivot_table(index="CUTOFF", columns="JSON", values="NET_SAVED_SECONDS")
+    # Only cutoffs measured for every JSON are comparable
+    net_saved = net_saved.reindex(columns=clusters["JSON"]).dropna(axis=1, how="all").dropna(axis=0)
+    if net_saved.empty:
+        return {}
+
+    weights = clusters[clusters["JSON"].isin(net_saved.columns)].groupby("REPRESENTATIVE").size()
+    weights = weights[weights.index.isin(net_saved.columns)]
+    full = net_saved.sum(axis=1)
+    if weights.empty:
+        # No representative has a find_best_cutoff summary, the subset cannot pick a cutoff
+        return {"FULL_BEST_CUTOFF": full.idxmax(), "SUBSET_BEST_CUTOFF": np.nan, "REGRET_SECONDS": np.nan,
+                "SCORE_RANK_CORRELATION": np.nan, "PER_JSON_AGREEMENT": np.nan}
+    subset = (net_saved[weights.index] * weights).sum(axis=1)
+
+    full_best, subset_best = full.idxmax(), subset.idxmax()
+    per_json_best = net_saved.idxmax()
+    representative_best = clusters.set_index("JSON")["REPRESENTATIVE"].map(per_json_best)
+    return {
+        "FULL_BEST_CUTOFF": full_best,
+        "SUBSET_BEST_CUTOFF": subset_best,
+        "REGRET_SECONDS": full[full_best] - full[subset_best],
+        "SCORE_RANK_CORRELATION": full.rank().corr(subset.rank()),
+        "PER_JSON_AGREEMENT": (representative_best.reindex(per_json_best.index) == per_json_best).mean(),
+    }
+
+
+def plot_distance_matrix(distances: pd.DataFrame, clusters: pd.DataFrame, save_path: str) -> None:
+    order = clusters.sort_values(["REPRESENTATIVE", "EMD_TO_REPRESENTATIVE"])["JSON"]
+    ordered = distances.loc[order, order]
+    is_representative = set(clusters["REPRESENTATIVE"])
+    labels = [f"* {name}" if name in is_representative else name for name in ordered.index]
+
+    fig, ax = plt.subplots(figsize=(12, 10))
+    image = ax.imshow(ordered.to_numpy(), cmap="viridis_r")
+    fig.colorbar(image, ax=ax, label="Earth Mover's Distance (log2 buckets)")
+    ax.set_xticks(range(len(labels)), labels, rotation=90)
+    ax.set_yticks(range(len(labels)), labels)
+    ax.set_title("Distance Distribution Similarity (* = representative)")
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+def plot_threshold_sweep(sweep: pd.DataFrame, num_jsons: int, save_path: str) -> None:
+    fig, ax1 = plt.subplots(figsize=(12, 7))
+    ax1.plot(sweep["MAX_EMD"], sweep["SUBSET_SIZE"], marker="o", color="navy", label="Subset size")
+    ax1.axhline(y=num_jsons, color="navy", linestyle=":", alpha=0.6)
+    ax1.set_xlabel("Max EMD to a Representative")
+    ax1.set_ylabel("JSONs to Benchmark", color="navy")
+
+    if "REGRET_SECONDS" in sweep.columns:
+        ax2 = ax1.twinx()
+        ax2.plot(sweep["MAX_EMD"], sweep["REGRET_SECONDS"], marker="s", color="crimson", label="Regret")
+        ax2.set_ylabel("Lost Net Saved Query Time of the Corpus (seconds)", color="crimson")
+
+    ax1.set_title("Corpus Reduction: Subset Size vs. Best Cutoff Regret")
+    ax1.grid(True, alpha=0.4)
+
+    plt.tight_layout()
+    save_figure(save_path)
+    print(f"Generated: {save_path}")
+    plt.close(fig)
+
+
+@profiled
+def reduce_corpus(distances_dir: str, find_best_cutoff_dir: str, max_emd: float, result_dir_path: str,
+                  sweep_max_emds=None) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+
+    histograms = load_histograms(distances_dir)
+    if len(histograms) < 2:
+        print("At least two distance distributions are needed.")
+        return
+    distances = emd_matrix(histograms)
+    distances_csv_path = os.path.join(result_dir_path, "emd_matrix.csv")
+    distances.to_csv(distances_csv_path)
+    print(f"Saved pairwise distances -> {distances_csv_path}")
+
+    scores = load_cutoff_scores(find_best_cutoff_dir) if find_best_cutoff_dir is not None else pd.DataFrame(
+        columns=["JSON", "CUTOFF", "RANK", "NET_SAVED_SECONDS"])
+
+    representatives = pick_representatives(distances, max_emd, set(scores["JSON"]))
+    clusters = assign_clusters(distances, representatives)
+    clusters_csv_path = os.path.join(result_dir_path, "corpus_clusters.csv")
+    clusters.to_csv(clusters_csv_path, index=False)
+    print(clusters)
+    print(f"{len(representatives)} of {len(distances)} JSONs cover the corpus with max EMD {max_emd}: "
+          f"{representatives}")
+    print(f"Saved clusters -> {clusters_csv_path}")
+
+    # How subset size and best cutoff regret change with the threshold
+    sweep_max_emds = sweep_max_emds if sweep_max_emds is not None else np.unique(np.append(
+        np.quantile(distances.to_numpy()[np.triu_indices(len(distances), 1)], np.linspace(0, 1, 11)), max_emd))
+    sweep = []
+    for threshold in sweep_max_emds:
+        threshold_clusters = assign_clusters(distances, pick_representatives(distances, threshold, set(scores["JSON"])))
+        sweep.append({"MAX_EMD": threshold, "SUBSET_SIZE": threshold_clusters["REPRESENTATIVE"].nunique(),
+                      **evaluate_subset(threshold_clusters, scores)})
+    sweep = pd.DataFrame(sweep)
+    sweep_csv_path = os.path.join(result_dir_path, "corpus_reduction_sweep.csv")
+    sweep.to_csv(sweep_csv_path, index=False)
+    print(sweep)
+    print(f"Saved threshold sweep -> {sweep_csv_path}")
+
+    plot_distance_matrix(distances, clusters, os.path.join(result_dir_path, "emd_matrix.png"))
+    plot_threshold_sweep(sweep, len(distances), os.path.join(result_dir_path, "corpus_reduction_sweep.png"))
+
+
+# Run with: python src/speed/reduce_corpus.py
+#
+# Finds a small subset of the benchmark JSONs with the same spread of bracket distance profiles as the whole corpus.
+#
+# "distances_dir" holds the <JSON>_distances.csv of plot_distance_distribution_per_json.py (distance,frequency). The
+# distances are grouped into log2 buckets and compared with the earth mover's distance. Representatives are picked
+# greedily until every JSON is within "max_emd" of one (an EMD of 1 moves all brackets by one doubling of distance).
+#
+# "find_best_cutoff_dir" holds the <JSON>_summary.csv of find_best_cutoff.plot_per_json (None skips the evaluation).
+# For a range of thresholds the corpus best cutoff (largest summed SUM_POSITIVE - SUM_NEGATIVE) is compared with the
+# one found on the subset when each representative counts as often as its cluster is large. On ties the greedy cover
+# prefers JSONs with a summary; if no representative has one the metrics are NaN:
+#   REGRET_SECONDS           net saved query time of the corpus lost by using the subset's best cutoff
+#   SCORE_RANK_CORRELATION   rank correlation of the cutoff scores of the subset and the corpus
+#   PER_JSON_AGREEMENT       share of JSONs whose best cutoff equals the one of their representative
+#
+# Output in "result_dir_path":
+#   emd_matrix.csv / .png, corpus_clusters.csv, corpus_reduction_sweep.csv / .png
+if __name__ == "__main__":
+    # Input
+    distances_dir = "res/data/analysis/distance_distribution_per_json"
+    find_best_cutoff_dir = "res/plots/speed/server/find_best_cutoff"
+    result_dir_path = "res/plots/speed/server/reduce_corpus"
+    max_emd = 1.0
+
+    reduce_corpus(distances_dir, find_best_cutoff_dir, max_emd, result_dir_path)
@@ -0,0 +1,190 @@
+import os
+import sys
+import multiprocessing
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from plan_repetitions import BASELINE_ENGINE, RepetitionPlanner
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+
+# Placeholders: {executable}, {mode}, {query}, {json}
+COMMAND_TEMPLATE = ["{executable}", "--result", "{mode}", "{query}", "{json}"]
+# Inserted after the executable for every cutoff of rsonpath-lut
+CUTOFF_ARGUMENTS = ["--cutoff", "{cutoff}"]
+
+
+def load_queries(query_csv: str) -> pd.DataFrame:
+    """
+    Queries to run from a .csv with at least QUERY_ID,QUERY_TEXT (e.g. the files in res/data/analysis/query).
+    """
+    df = pd.read_csv(query_csv)
+    df["QUERY_ID"] = df["QUERY_ID"].astype(str)
+    df["QUERY_TEXT"] = df["QUERY_TEXT"].astype(str).str.strip()
+    return df[["QUERY_ID", "QUERY_TEXT"]].drop_duplicates("QUERY_ID")
+
+
+def load_baseline_means(baseline_csv: str) -> dict:
+    """
+    Mean query time per (JSON, QUERY_ID) of a finished rq-legacy run (a query time .csv without CUTOFF column).
+    """
+    df = pd.read_csv(baseline_csv)
+    return dict(zip(zip(df["JSON"], df["QUERY_ID"].astype(str)), df["QUERY_TIME_SECONDS"]))
+
+
+def build_command(executable: str, mode: str, query_text: str, json_path: str, cutoff=None,
+                  command_template=None, cutoff_arguments=None) -> list:
+    template = list(command_template or COMMAND_TEMPLATE)
+    if cutoff is not None:
+        template[1:1] = cutoff_arguments or CUTOFF_ARGUMENTS
+    values = {"executable": executable, "mode": mode, "query": query_text, "json": json_path, "cutoff": cutoff}
+    command = [part.format(**values) for part in template]
+    # Python stand-ins such as stub_rsonpath.py do not need to be executable
+    if command[0].endswith(".py"):
+        command.insert(0, sys.executable)
+    return command
+
+
+def _pin_worker(cpu_queue) -> None:
+    """
+    Pool initializer: every worker process takes one CPU of the queue and stays on it.
+    """
+    os.sched_setaffinity(0, {cpu_queue.get()})
+
+
+def run_task(task: dict, repetitions: int, warmup: int, stop_rule) -> tuple:
+    """
+    Run one (JSON, CUTOFF, QUERY_ID) "warmup" times untimed and then up to "repetitions" times. With a "stop_rule"
+    (see plan_repetitions.RepetitionPlanner) it stops as soon as the rule is met. Returns the row of the timing
+    .csv and the per repetition samples.
+    """
+    for _ in range(warmup):
+        subprocess.run(task["COMMAND"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    planner = RepetitionPlanner(rule=stop_rule, max_repetitions=repetitions) if stop_rule else None
+    if planner is not None and task.get("BASELINE_SECONDS") is not None:
+        planner.set_baseline(task["JSON"], task["QUERY_ID"], task["BASELINE_SECONDS"])
+    samples = []
+    for repetition in range(1, repetitions + 1):
+        start = time.perf_counter()
+        completed = subprocess.run(task["COMMAND"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(f"{' '.join(task['COMMAND'])} failed with exit code {completed.returncode}: "
+                               f"{completed.stderr.strip()}")
+        samples.append({**{key: task[key] for key in ["JSON", "ENGINE", "CUTOFF", "QUERY_ID"]},
+                        "REPETITION": repetition, "QUERY_TIME_SECONDS": seconds})
+        if planner is not None and planner.add(task["JSON"], task["ENGINE"], task["CUTOFF"], task["QUERY_ID"],
+                                               seconds):
+            break
+
+    row = {
+        "JSON": task["JSON"],
+        "CUTOFF": task["CUTOFF"],
+        "QUERY_ID": task["QUERY_ID"],
+        "QUERY_TEXT": task["QUERY_TEXT"],
+        "QUERY_TIME_SECONDS": sum(sample["QUERY_TIME_SECONDS"] for sample in samples) / len(samples),
+        "REPETITIONS": len(samples),
+    }
+    return row, samples
+
+
+@profiled
+def run(executable: str, json_paths: list, query_csv: str, cutoffs, result_csv_path: str, engine: str = "rq",
+        mode: str = "count", repetitions: int = 20, warmup: int = 1, max_workers: int = 1, cpus=None,
+        samples_csv_path=None, stop_rule=None, baseline_csv=None, command_template=None,
+        cutoff_arguments=None) -> pd.DataFrame:
+    queries = load_queries(query_csv)
+    baseline_means = {}
+    if stop_rule == "baseline" and engine != BASELINE_ENGINE:
+        # Every task runs in its own planner, so the baseline has to come from a finished rq-legacy run
+        if baseline_csv is None:
+            raise ValueError('stop_rule="baseline" needs the query time .csv of a finished rq-legacy run '
+                             '("baseline_csv")')
+        baseline_means = load_baseline_means(baseline_csv)
+
+    tasks = []
+    for json_path in json_paths:
+        json_name = os.path.splitext(os.path.basename(json_path))[0]
+        for cutoff in (cutoffs if cutoffs is not None else [None]):
+            for query in queries.itertuples(index=False):
+                tasks.append({
+                    "JSON": json_name,
+                    "ENGINE": engine,
+                    "CUTOFF": cutoff if cutoff is not None else -1,
+                    "QUERY_ID": query.QUERY_ID,
+                    "QUERY_TEXT": query.QUERY_TEXT,
+                    "BASELINE_SECONDS": baseline_means.get((json_name, query.QUERY_ID)),
+                    "COMMAND": build_command(executable, mode, query.QUERY_TEXT, json_path, cutoff,
+                                             command_template, cutoff_arguments),
+                })
+    print(f"Running {len(tasks)} (JSON, cutoff, query) with {repetitions} repetitions on {max_workers} worker(s)")
+
+    initializer, initargs = None, ()
+    if cpus is not None:
+        # One CPU per worker, otherwise the workers would again share the pinned CPUs
+        cpus = list(cpus)
+        max_workers = min(max_workers, len(cpus))
+        cpu_queue = multiprocessing.Queue()
+        for cpu in cpus:
+            cpu_queue.put(cpu)
+        initializer, initargs = _pin_worker, (cpu_queue,)
+
+    rows, samples = [], []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs) as executor:
+        futures = [executor.submit(run_task, task, repetitions, warmup, stop_rule) for task in tasks]
+        for i, future in enumerate(futures, start=1):
+            row, task_samples = future.result()
+            rows.append(row)
+            samples.extend(task_samples)
+            print(f"[{i}/{len(tasks)}] {row['JSON']} cutoff={row['CUTOFF']} query={row['QUERY_ID']}: "
+                  f"{row['QUERY_TIME_SECONDS']:.4f}s ({row['REPETITIONS']} repetitions)")
+
+    result_df = pd.DataFrame(rows)
+    if cutoffs is None:
+        result_df = result_df.drop(columns=["CUTOFF"])
+    os.makedirs(os.path.dirname(result_csv_path) or ".", exist_ok=True)
+    result_df.to_csv(result_csv_path, index=False)
+    print(f"Saved query times -> {result_csv_path}")
+
+    if samples_csv_path is not None:
+        os.makedirs(os.path.dirname(samples_csv_path) or ".", exist_ok=True)
+        pd.DataFrame(samples).to_csv(samples_csv_path, index=False)
+        print(f"Saved samples -> {samples_csv_path}")
+    return result_df
+
+
+# Run with: python src/speed/run_benchmark.py
+#
+# Runs an rsonpath / rsonpath-lut binary over every JSON x cutoff x query and writes the query time .csv files that
+# the plot scripts read, so new measurements go straight into res/data/speed:
+#   JSON,CUTOFF,QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS,REPETITIONS     (with "cutoffs")
+#   JSON,QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS,REPETITIONS            (cutoffs=None, e.g. rq-legacy)
+# QUERY_TIME_SECONDS is the mean wall time of the process over the repetitions after "warmup" untimed runs.
+#
+# "query_csv" needs the columns QUERY_ID,QUERY_TEXT. The command line is built from COMMAND_TEMPLATE plus
+# CUTOFF_ARGUMENTS, both can be replaced per call if the binary takes its arguments differently.
+# "samples_csv_path" additionally writes every repetition (input of plan_repetitions.py) and "stop_rule" stops a
+# query early once plan_repetitions.RepetitionPlanner has enough repetitions: "ci" once the timing is precise enough,
+# "baseline" once faster or slower than rq-legacy is decided. "baseline" needs "baseline_csv", the query time .csv
+# of a finished rq-legacy run; queries missing there fall back to the "ci" rule.
+#
+# Parallel workers compete for memory bandwidth and caches, keep max_workers=1 for numbers that go into the thesis
+# plots or pin every worker to its own core with "cpus" (Linux only).
+#
+# stub_rsonpath.py stands in for the binary to try the harness without building rsonpath.
+if __name__ == "__main__":
+    # Input
+    executable = "src/speed/stub_rsonpath.py"
+    json_paths = ["res/data/json/bestbuy_large_record_(1GB).json"]
+    query_csv = "res/data/analysis/query/bestbuy_large_record_(1GB).csv"
+    cutoffs = [0, 64, 256, 1024, 4096]
+    result_csv_path = "res/data/speed/local/rq_lut/query_count/rq_lut_time_repetitions=20.csv"
+    samples_csv_path = "res/data/speed/local/rq_lut/query_count/rq_lut_samples_repetitions=20.csv"
+
+    run(executable, json_paths, query_csv, cutoffs, result_csv_path, engine="rq-lut", repetitions=20,
+        samples_csv_path=samples_csv_path)
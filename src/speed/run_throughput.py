@@ -0,0 +1,184 @@
+import os
+import sys
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from run_benchmark import build_command, load_queries
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+from save_pipeline import save_figure  # noqa: E402
+
+PLOT_COLORS = ["royalblue", "darkorange", "seagreen", "crimson", "purple", "saddlebrown"]
+
+
+def concurrency_levels(max_concurrency: int) -> list:
+    """
+    1, 2, 4, ... up to and including "max_concurrency".
+    """
+    levels = [1]
+    while levels[-1] * 2 < max_concurrency:
+        levels.append(levels[-1] * 2)
+    if levels[-1] != max_concurrency:
+        levels.append(max_concurrency)
+    return levels
+
+
+def _run_stream(commands: list, rounds: int) -> list:
+    """
+    One concurrent client: runs the queries one after another "rounds" times, returns (QUERY_ID, seconds) per run.
+    """
+    latencies = []
+    for _ in range(rounds):
+        for query_id, command in commands:
+            start = time.perf_counter()
+            completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            seconds = time.perf_counter() - start
+            if completed.returncode != 0:
+                raise RuntimeError(f"{' '.join(command)} failed with exit code {completed.returncode}: "
+                                   f"{completed.stderr.strip()}")
+            latencies.append((query_id, seconds))
+    return latencies
+
+
+def measure(commands: list, concurrency: int, rounds: int) -> tuple:
+    """
+    Start "concurrency" clients at once against the same file. Every client is a thread waiting on its own query
+    process, so the processes really run in parallel. Returns the wall time and the per query latencies per client.
+    """
+    # Clients start at different queries, otherwise all of them hit the same query at the same time
+    streams = [commands[i % len(commands):] + commands[:i % len(commands)] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(_run_stream, streams, [rounds] * concurrency))
+    return time.perf_counter() - start, results
+
+
+@profiled
+def run(engines: dict, json_paths: list, query_csv: str, max_concurrency: int, result_dir_path: str,
+        rounds: int = 3, mode: str = "count") -> pd.DataFrame:
+    """
+    "engines" maps a label to (executable, cutoff), cutoff None for engines without one.
+    """
+    os.makedirs(result_dir_path, exist_ok=True)
+    queries = load_queries(query_csv)
+
+    rows, samples = [], []
+    for json_path in json_paths:
+        json_name = os.path.splitext(os.path.basename(json_path))[0]
+        for engine, (executable, cutoff) in engines.items():
+            commands = [(query.QUERY_ID, build_command(executable, mode, query.QUERY_TEXT, json_path, cutoff))
+                        for query in queries.itertuples(index=False)]
+            # Warm the page cache so the first level does not pay for reading the file
+            _run_stream(commands[:1], 1)
+
+            for concurrency in concurrency_levels(max_concurrency):
+                wall_seconds, results = measure(commands, concurrency, rounds)
+                latencies = np.array([seconds for result in results for _, seconds in result])
+                rows.append({
+                    "JSON": json_name,
+                    "ENGINE": engine,
+                    "CUTOFF": cutoff if cutoff is not None else -1,
+                    "CONCURRENCY": concurrency,
+                    "QUERIES": len(latencies),
+                    "WALL_SECONDS": wall_seconds,
+                    "QPS": len(latencies) / wall_seconds,
+                    "LATENCY_MEAN_SECONDS": latencies.mean(),
+                    "LATENCY_P50_SECONDS": np.percentile(latencies, 50),
+                    "LATENCY_P90_SECONDS": np.percentile(latencies, 90),
+                    "LATENCY_P99_SECONDS": np.percentile(latencies, 99),
+                })
+                samples.extend({"JSON": json_name, "ENGINE": engine, "CUTOFF": rows[-1]["CUTOFF"],
+                                "CONCURRENCY": concurrency, "CLIENT": client, "QUERY_ID": query_id,
+                                "QUERY_TIME_SECONDS": seconds}
+                               for client, result in enumerate(results) for query_id, seconds in result)
+                print(f"{json_name} {engine} x{concurrency}: {rows[-1]['QPS']:.2f} queries/s, "
+                      f"p50 {rows[-1]['LATENCY_P50_SECONDS']:.4f}s, p99 {rows[-1]['LATENCY_P99_SECONDS']:.4f}s")
+
+    throughput_df = pd.DataFrame(rows)
+    throughput_csv_path = os.path.join(result_dir_path, "throughput.csv")
+    throughput_df.to_csv(throughput_csv_path, index=False)
+    print(f"Saved throughput -> {throughput_csv_path}")
+
+    samples_csv_path = os.path.join(result_dir_path, "throughput_samples.csv")
+    pd.DataFrame(samples).to_csv(samples_csv_path, index=False)
+    print(f"Saved samples -> {samples_csv_path}")
+    return throughput_df
+
+
+@profiled
+def plot(throughput_csv: str, result_dir_path: str) -> None:
+    os.makedirs(result_dir_path, exist_ok=True)
+    df = pd.read_csv(throughput_csv)
+    df["JSON"] = df["JSON"].astype(str).str.strip()
+
+    for json_name, json_df in df.groupby("JSON"):
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
+
+        for i, (engine, engine_df) in enumerate(json_df.groupby("ENGINE", sort=False)):
+            engine_df = engine_df.sort_values("CONCURRENCY")
+            color = PLOT_COLORS[i % len(PLOT_COLORS)]
+
+            # --- Plot 1: Aggregate throughput, dotted the linear scaling of a single client ---
+            ax1.plot(engine_df["CONCURRENCY"], engine_df["QPS"], marker="o", color=color, label=engine)
+            single = engine_df.iloc[0]
+            ax1.plot(engine_df["CONCURRENCY"], single["QPS"] * engine_df["CONCURRENCY"] / single["CONCURRENCY"],
+                     color=color, linestyle=":", alpha=0.6)
+
+            # --- Plot 2: Latency of a single query under load ---
+            ax2.plot(engine_df["CONCURRENCY"], engine_df["LATENCY_P50_SECONDS"], marker="o", color=color,
+                     label=f"{engine} p50")
+            ax2.plot(engine_df["CONCURRENCY"], engine_df["LATENCY_P99_SECONDS"], marker="^", color=color,
+                     linestyle="--", label=f"{engine} p99")
+
+        for ax in (ax1, ax2):
+            ax.set_xscale("log", base=2)
+            ax.set_xticks(sorted(json_df["CONCURRENCY"].unique()))
+            ax.get_xaxis().set_major_formatter(plt.ScalarFormatter())
+            ax.set_xlabel("Concurrent Queries")
+            ax.grid(True, alpha=0.4)
+            ax.legend(fontsize=8)
+        ax1.set_ylabel("Queries per Second")
+        ax1.set_title(f"Throughput Scaling for {json_name} (dotted: linear)")
+        ax2.set_ylabel("Query Latency (seconds)")
+        ax2.set_title(f"Latency under Load for {json_name}")
+
+        plt.tight_layout()
+        save_path = os.path.join(result_dir_path, f"{json_name}_throughput.png")
+        save_figure(save_path)
+        print(f"Generated: {save_path}")
+        plt.close(fig)
+
+
+# Run with: python src/speed/run_throughput.py
+#
+# All other timings run one query at a time on an idle machine. This runs 1, 2, 4, ... "max_concurrency" queries at
+# the same time against the same file to see where streaming (rq-legacy) and LUT lookups (rq-lut) saturate the memory
+# bandwidth.
+#
+# "engines" maps a label to (executable, cutoff), "query_csv" holds QUERY_ID,QUERY_TEXT. Every concurrent client runs
+# all queries "rounds" times, starting at a different query. The command line is the one of run_benchmark.py and
+# stub_rsonpath.py works as stand-in.
+#
+# Output in "result_dir_path":
+#   throughput.csv           JSON,ENGINE,CUTOFF,CONCURRENCY,QUERIES,WALL_SECONDS,QPS,LATENCY_MEAN/P50/P90/P99_SECONDS
+#   throughput_samples.csv   latency of every single query run
+#   <JSON>_throughput.png    queries per second and p50/p99 latency over the concurrency per engine
+if __name__ == "__main__":
+    # Input
+    engines = {
+        "rq-legacy": ("rsonpath", None),
+        "rq-lut (cutoff=256)": ("rsonpath-lut", 256),
+        "rq-lut (cutoff=1024)": ("rsonpath-lut", 1024),
+    }
+    json_paths = ["res/data/json/bestbuy_large_record_(1GB).json"]
+    query_csv = "res/data/analysis/query/bestbuy_large_record_(1GB).csv"
+    result_dir_path = "res/plots/speed/local/throughput"
+
+    run(engines, json_paths, query_csv, os.cpu_count(), result_dir_path)
+    plot(os.path.join(result_dir_path, "throughput.csv"), result_dir_path)
@@ -0,0 +1,34 @@
+import argparse
+import os
+import time
+
+# Seconds per byte of input, roughly a 1 GB document per second
+SECONDS_PER_BYTE = 1e-9
+
+
+def main() -> None:
+    """
+    Stand-in for the rsonpath / rsonpath-lut binary to try run_benchmark.py without building rsonpath. Accepts the
+    same arguments, sleeps in proportion to the file size (faster for cutoffs that make the LUT pay off) and prints a
+    fake result count.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--result", default="count", choices=["count", "nodes", "indices"])
+    parser.add_argument("--cutoff", type=int, default=None)
+    parser.add_argument("--seconds-per-byte", type=float, default=SECONDS_PER_BYTE)
+    parser.add_argument("query")
+    parser.add_argument("file")
+    args = parser.parse_args()
+
+    seconds = os.path.getsize(args.file) * args.seconds_per_byte
+    if args.cutoff is not None:
+        # Small cutoffs pay for many LUT lookups, large ones skip without the LUT
+        seconds *= 0.6 + 0.05 * abs((args.cutoff + 1).bit_length() - 9)
+    if args.result == "nodes":
+        seconds *= 1.2
+    time.sleep(seconds)
+    print(len(args.query))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from profiling import profiled  # noqa: E402
+
+KEY_COLUMNS = ["JSON", "ENGINE", "CUTOFF", "QUERY_ID"]
+
+CHECKS = ["NAN", "NON_POSITIVE", "DUPLICATE_DIVERGENT", "NEGATIVE_OPTIMAL", "CUTOFF_SCALE", "ROBUST_Z"]
+
+# Checks that find broken data; CUTOFF_SCALE and ROBUST_Z are statistical and may well be real regressions, they are
+# only reported by default
+DATA_ERROR_CHECKS = ["NAN", "NON_POSITIVE", "DUPLICATE_DIVERGENT", "NEGATIVE_OPTIMAL"]
+
+BASELINE_ENGINE = "rq-legacy"
+
+SKIP_ENGINE = "rq-legacy-skip"
+
+REPORT_COLUMNS = ["SOURCE", "LINE", "ENGINE", "JSON", "CUTOFF", "QUERY_ID", "RAW_VALUE"]
+
+
+def load_raw(csv_path: str, engine: str) -> tuple:
+    """
+    The .csv as written (all strings, nothing coerced) and the normalized rows the checks run on, both with the same
+    index. SECONDS comes from QUERY_TIME_SECONDS or SKIP_TIME_NANO_SECONDS; CUTOFF is -1 without a CUTOFF column.
+    """
+    raw = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    rows = pd.DataFrame({
+        "SOURCE": os.path.basename(csv_path),
+        "LINE": raw.index + 2,
+        "ENGINE": engine,
+        "JSON": raw["JSON"].str.strip(),
+        "CUTOFF": pd.to_numeric(raw["CUTOFF"], errors="coerce") if "CUTOFF" in raw.columns else -1,
+        "QUERY_ID": raw["QUERY_ID"].str.strip(),
+    }, index=raw.index)
+    if "QUERY_TIME_SECONDS" in raw.columns:
+        rows["RAW_VALUE"] = raw["QUERY_TIME_SECONDS"]
+        rows["SECONDS"] = pd.to_numeric(raw["QUERY_TIME_SECONDS"], errors="coerce")
+    else:
+        rows["RAW_VALUE"] = raw["SKIP_TIME_NANO_SECONDS"]
+        rows["SECONDS"] = pd.to_numeric(raw["SKIP_TIME_NANO_SECONDS"], errors="coerce") / 1e9
+    return raw, rows
+
+
+def _baseline_seconds(rows: pd.DataFrame, usable: pd.Series, baseline_engine: str) -> np.ndarray:
+    """
+    Median of the usable baseline times of the (JSON, QUERY_ID) of every row, NaN where the baseline misses it.
+    """
+    baseline = rows[usable & (rows["ENGINE"] == baseline_engine)].groupby(["JSON", "QUERY_ID"])["SECONDS"].median()
+    return baseline.reindex(pd.MultiIndex.from_frame(rows[["JSON", "QUERY_ID"]])).to_numpy()
+
+
+def run_checks(rows: pd.DataFrame, baseline_engine: str = BASELINE_ENGINE, duplicate_tolerance: float = 0.1,
+               cutoff_orders: float = 1.0, z_threshold: float = 3.5, min_group_size: int = 5,
+               min_mad: float = 0.01) -> pd.DataFrame:
+    """
+    One boolean column per check and one DETAIL_<check> column, aligned with "rows". All checks run on whole columns:
+      NAN                  time or CUTOFF not a number, JSON or QUERY_ID empty
+      NON_POSITIVE         time <= 0
+      DUPLICATE_DIVERGENT  same (JSON, ENGINE, CUTOFF, QUERY_ID) more than once and (max - min) / median above
+                           "duplicate_tolerance", all copies are flagged as nobody knows which one is right
+      NEGATIVE_OPTIMAL     skip time longer than the baseline query time, OPTIMAL_TIME would be negative
+      CUTOFF_SCALE         more than "cutoff_orders" orders of magnitude off the median over all cutoffs of the query
+      ROBUST_Z             |modified z-score| of log(baseline time / time) within (ENGINE, CUTOFF, JSON) above
+                           "z_threshold" (median and MAD, groups of at least "min_group_size" queries, the MAD is
+                           at least "min_mad" so timer noise on near constant speedups is not flagged)
+    """
+    flags = pd.DataFrame(False, index=rows.index, columns=CHECKS)
+    details = pd.DataFrame("", index=rows.index, columns=CHECKS)
+    seconds = rows["SECONDS"]
+
+    flags["NAN"] = seconds.isna() | rows["CUTOFF"].isna() | (rows["JSON"] == "") | (rows["QUERY_ID"] == "")
+    details["NAN"] = np.where(rows["CUTOFF"].isna(), "CUTOFF not a number", "value '" + rows["RAW_VALUE"] + "'")
+    valid = ~flags["NAN"]
+
+    flags["NON_POSITIVE"] = valid & (seconds <= 0)
+    details["NON_POSITIVE"] = "seconds=" + seconds.astype(str)
+
+    grouped = rows[valid].groupby(KEY_COLUMNS)["SECONDS"]
+    spread = (grouped.transform("max") - grouped.transform("min")) / grouped.transform("median")
+    divergent = (grouped.transform("size") > 1) & (spread > duplicate_tolerance)
+    flags["DUPLICATE_DIVERGENT"] = divergent.reindex(rows.index, fill_value=False)
+    details["DUPLICATE_DIVERGENT"] = ("copies=" + grouped.transform("size").astype(str)
+                                      + " spread=" + (spread * 100).round(1).astype(str) + "%").reindex(rows.index)
+
+    # The skip rows are flagged, not the baseline: dropping them leaves OPTIMAL_TIME empty for the query instead of
+    # removing rq-legacy from every plot
+    baseline = _baseline_seconds(rows, valid & (seconds > 0), baseline_engine)
+    skip = valid & (rows["ENGINE"] == SKIP_ENGINE)
+    flags["NEGATIVE_OPTIMAL"] = skip & (seconds > baseline)
+    details["NEGATIVE_OPTIMAL"] = "optimal=" + (baseline - seconds).round(6).astype(str) + "s"
+
+    swept = valid & (rows["CUTOFF"] >= 0) & (seconds > 0)
+    by_query = rows[swept].groupby(["ENGINE", "JSON", "QUERY_ID"])["SECONDS"]
+    orders = np.log10(rows.loc[swept, "SECONDS"] / by_query.transform("median"))
+    flags["CUTOFF_SCALE"] = ((orders.abs() > cutoff_orders) & (by_query.transform("size") >= 3)).reindex(
+        rows.index, fill_value=False)
+    details["CUTOFF_SCALE"] = ("x" + (10 ** orders).round(2).astype(str) + " of the median cutoff").reindex(rows.index)
+
+    compared = valid & ~rows["ENGINE"].isin([baseline_engine, SKIP_ENGINE]) & (seconds > 0) & (baseline > 0)
+    log_speedup = np.log(pd.Series(baseline, index=rows.index)[compared] / seconds[compared])
+    by_config = log_speedup.groupby([rows["ENGINE"], rows["CUTOFF"], rows["JSON"]])
+    deviation = log_speedup - by_config.transform("median")
+    mad = deviation.abs().groupby([rows["ENGINE"], rows["CUTOFF"], rows["JSON"]]).transform("median")
+    z = 0.6745 * deviation / mad.clip(lower=min_mad)
+    flags["ROBUST_Z"] = ((z.abs() > z_threshold) & (by_config.transform("size") >= min_group_size)).reindex(
+        rows.index, fill_value=False)
+    details["ROBUST_Z"] = ("z=" + z.round(1).astype(str) + " speedup=" + np.exp(log_speedup).round(3).astype(str)
+                           ).reindex(rows.index)
+
+    return flags.join(details.add_prefix("DETAIL_"))
+
+
+def validate(time_csvs: dict, rq_legacy_skip_time: str = None, baseline_engine: str = BASELINE_ENGINE,
+             **check_options) -> tuple:
+    """
+    Run all checks over all timing tables at once. "time_csvs" maps an engine name to its query time .csv; the skip
+    times are checked against the baseline engine. Returns the raw frames per engine, the rows with their flags and
+    the report with one line per (row, failed check).
+    """
+    sources = dict(time_csvs)
+    if rq_legacy_skip_time is not None:
+        sources[SKIP_ENGINE] = rq_legacy_skip_time
+
+    raws, all_rows = {}, []
+    for engine, csv_path in sources.items():
+        raws[engine], rows = load_raw(csv_path, engine)
+        all_rows.append(rows.rename_axis("ROW").reset_index())
+    rows = pd.concat(all_rows, ignore_index=True)
+    rows = rows.join(run_checks(rows, baseline_engine, **check_options))
+
+    report = pd.concat([
+        rows.loc[rows[check], REPORT_COLUMNS].assign(CHECK=check, DETAIL=rows.loc[rows[check], f"DETAIL_{check}"])
+        for check in CHECKS
+    ])
+    report["CUTOFF"] = report["CUTOFF"].astype("Int64")
+    return raws, rows, report.sort_values(["SOURCE", "LINE", "CHECK"]).reset_index(drop=True)
+
+
+@profiled
+def run(time_csvs: dict, result_dir_path: str, rq_legacy_skip_time: str = None, quarantine_checks: list = None,
+        baseline_engine: str = BASELINE_ENGINE, **check_options) -> dict:
+    """
+    Validate, write the report and split every table into a clean copy (same columns, suspect rows removed) and the
+    quarantined rows. A (JSON, QUERY_ID) with a query time row failing one of "quarantine_checks" is removed from
+    every table and cutoff, so the engines and cutoffs are still compared on the same queries; a failing skip row only
+    removes itself. Returns engine -> clean .csv path, to be passed to the plot scripts instead of the originals.
+    """
+    quarantine_checks = DATA_ERROR_CHECKS if quarantine_checks is None else quarantine_checks
+    clean_dir = os.path.join(result_dir_path, "clean")
+    quarantine_dir = os.path.join(result_dir_path, "quarantine")
+    os.makedirs(clean_dir, exist_ok=True)
+    os.makedirs(quarantine_dir, exist_ok=True)
+
+    raws, rows, report = validate(time_csvs, rq_legacy_skip_time, baseline_engine, **check_options)
+
+    failed = rows[quarantine_checks].any(axis=1)
+    # A bad skip time only leaves OPTIMAL_TIME empty, the query times of the query are fine
+    query_failed = failed & (rows["ENGINE"] != SKIP_ENGINE)
+    queries = pd.MultiIndex.from_frame(rows[["JSON", "QUERY_ID"]])
+    rows["QUARANTINED"] = queries.isin(queries[query_failed.to_numpy()]) | failed
+    same_query = rows.loc[rows["QUARANTINED"] & ~failed, REPORT_COLUMNS].assign(
+        CHECK="SAME_QUERY", DETAIL="another row of this query failed " + ", ".join(quarantine_checks))
+    same_query["CUTOFF"] = same_query["CUTOFF"].astype("Int64")
+    report = pd.concat([report, same_query]).sort_values(["SOURCE", "LINE", "CHECK"]).reset_index(drop=True)
+
+    report_path = os.path.join(result_dir_path, "validation_report.csv")
+    report.to_csv(report_path, index=False)
+    print(f"Saved validation report -> {report_path}")
+
+    summary = rows.groupby("ENGINE", sort=False)[CHECKS + ["QUARANTINED"]].sum()
+    summary.insert(0, "ROWS", rows.groupby("ENGINE", sort=False).size())
+    summary_path = os.path.join(result_dir_path, "validation_summary.csv")
+    summary.reset_index().to_csv(summary_path, index=False)
+    print(summary)
+    print(f"Saved validation summary -> {summary_path}")
+
+    clean_paths = {}
+    for engine, raw in raws.items():
+        engine_rows = rows[rows["ENGINE"] == engine]
+        suspect = raw.index.isin(engine_rows.loc[engine_rows["QUARANTINED"], "ROW"])
+        name = engine_rows["SOURCE"].iloc[0] if len(engine_rows) else f"{engine}.csv"
+
+        clean_paths[engine] = os.path.join(clean_dir, name)
+        raw[~suspect].to_csv(clean_paths[engine], index=False)
+        print(f"Saved {int((~suspect).sum())} clean rows -> {clean_paths[engine]}")
+        if suspect.any():
+            quarantine_path = os.path.join(quarantine_dir, name)
+            raw[suspect].to_csv(quarantine_path, index=False)
+            print(f"Saved {int(suspect.sum())} quarantined rows -> {quarantine_path}")
+    return clean_paths
+
+
+# Run with: python src/speed/validate_timings.py
+#
+# The plot scripts coerce whatever they read: unparsable times become NaN, rows with a bad CUTOFF are dropped, of
+# duplicated rows drop_duplicates keeps the first one and OPTIMAL_TIME goes negative when the skip time is longer than
+# the query time. Run this first and plot the clean copies.
+#
+# "time_csvs" maps an engine name to its query time .csv (JSON,[CUTOFF,]QUERY_ID,QUERY_TEXT,QUERY_TIME_SECONDS,...),
+# the engine "rq-legacy" is the baseline of the NEGATIVE_OPTIMAL and ROBUST_Z checks. "rq_legacy_skip_time" holds
+# JSON,QUERY_ID,QUERY_TEXT,SKIP_TIME_NANO_SECONDS. The thresholds are keyword arguments of run(...):
+# duplicate_tolerance=0.1, cutoff_orders=1.0, z_threshold=3.5, min_group_size=5, min_mad=0.01.
+# "quarantine_checks" are the checks that remove rows, by default only the data errors (NAN, NON_POSITIVE,
+# DUPLICATE_DIVERGENT, NEGATIVE_OPTIMAL): CUTOFF_SCALE and ROBUST_Z outliers may be real regressions and are only
+# listed in the report. A query with a failed query time row is removed from every table and cutoff (CHECK=SAME_QUERY
+# in the report); a failed skip time row (e.g. NEGATIVE_OPTIMAL) is removed alone.
+#
+# Output in "result_dir_path":
+#   validation_report.csv    SOURCE,LINE,ENGINE,JSON,CUTOFF,QUERY_ID,RAW_VALUE,CHECK,DETAIL per failed check
+#   validation_summary.csv   rows, failed checks and quarantined rows per engine
+#   clean/<file>.csv         the input without the quarantined queries, same columns as the input
+#   quarantine/<file>.csv    the quarantined rows
+if __name__ == "__main__":
+    # Input
+    time_csvs = {
+        "rq-legacy": "res/data/speed/server/rq_legacy/query_count/rq_legacy_time_repetitions=20.csv",
+        "rq-lut": "res/data/speed/server/rq_lut/query_count/rq_lut_time_repetitions=20.csv",
+        "rq-lut-no-lut": "res/data/speed/server/rq_lut_no_lut/query_count/rq_lut_no_lut_time_repetitions=20.csv",
+    }
+    rq_legacy_skip_time = "res/data/speed/server/rq_legacy_skip_time/query_count/rq_legacy_skip_time_repetitions=20.csv"
+    result_dir_path = "res/plots/speed/server/validation"
+
+    run(time_csvs, result_dir_path, rq_legacy_skip_time)